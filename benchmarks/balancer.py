@@ -0,0 +1,122 @@
+"""Benchmark the team balancer over lobby sizes from 8 to 40 players.
+
+For each lobby size, random lobbies are balanced into two even teams. The time and
+the distance from the goal are printed for the solver top_splits picks, for the exact
+and heuristic solvers on their own, and for the exhaustive search the balancer replaced
+(every combination of players, stopping early on a perfect split), while it is feasible.
+
+Run from the repository root, no database is used but MONGO_URL has to be a valid URL:
+    MONGO_URL=mongodb://localhost python -m benchmarks.balancer [lobbies per size]
+"""
+from itertools import combinations
+import random
+import statistics
+import sys
+import time
+from typing import Callable, List
+
+from pug import balancer
+
+LOBBY_SIZES: List[int] = [8, 12, 14, 18, 20, 24, 30, 40]
+LOBBIES: int = 20
+# Largest lobby the exhaustive search and the exact solver are run on
+EXHAUSTIVE_LIMIT: int = 20
+SPLITS: int = 10
+
+
+def exhaustive_split(values: List[int], size: int, goal: int) -> List[int]:
+    """The previous find_subset, looking at every combination of players."""
+    best_diff = None
+    best_team: List[int] = []
+    for team in combinations(range(len(values)), size):
+        diff = abs(goal - sum(values[i] for i in team))
+        if best_diff is None or diff < best_diff:
+            best_diff = diff
+            best_team = list(team)
+        if diff == 0:
+            break
+    return best_team
+
+
+def run(
+    name: str,
+    lobbies: List[List[int]],
+    solve: Callable[[List[int], int, int], List[int]],
+    offset: int,
+) -> None:
+    """Balance every lobby with a solver and print the mean time and goal difference."""
+    times: List[float] = []
+    diffs: List[int] = []
+    for values in lobbies:
+        size = len(values) // 2
+        goal = sum(values) // 2 + offset
+        start = time.perf_counter()
+        team = solve(values, size, goal)
+        times.append(time.perf_counter() - start)
+        diffs.append(abs(goal - sum(values[i] for i in team)))
+    print(
+        f"  {name:<28} {statistics.mean(times) * 1000:>10.2f} ms"
+        f" {statistics.mean(diffs):>10.2f} elo from goal (max {max(diffs)})"
+    )
+
+
+def run_all(lobbies: List[List[int]], offset: int) -> None:
+    """Run every solver that is feasible for the lobby size."""
+    lobby_size = len(lobbies[0])
+    run("top_splits", lobbies, balancer.split, offset)
+    run(
+        f"top_splits, {SPLITS} splits",
+        lobbies,
+        lambda values, size, goal: balancer.top_splits(values, size, goal, SPLITS)[0],
+        offset,
+    )
+    if lobby_size <= balancer.EXACT_LIMIT:
+        run(
+            "exact",
+            lobbies,
+            lambda values, size, goal: balancer.split(
+                values, size, goal, balancer.exact_splits
+            ),
+            offset,
+        )
+    run(
+        "heuristic",
+        lobbies,
+        lambda values, size, goal: balancer.split(
+            values, size, goal, balancer.heuristic_splits
+        ),
+        offset,
+    )
+    if lobby_size <= EXHAUSTIVE_LIMIT:
+        run("exhaustive (previous)", lobbies, exhaustive_split, offset)
+
+
+def main(lobbies_per_size: int) -> None:
+    """Generate the lobbies and run every solver on them.
+
+    Random elos nearly always have a perfect split, which lets the exhaustive search
+    stop early. Elos rounded to 10 with a goal ending in 5 never do, which is its worst
+    case, every combination is looked at.
+    """
+    random.seed(0)
+    for lobby_size in LOBBY_SIZES:
+        print(f"{lobby_size} players, random elo")
+        run_all(
+            [
+                [random.randint(800, 1800) for _ in range(lobby_size)]
+                for _ in range(lobbies_per_size)
+            ],
+            0,
+        )
+        print(f"{lobby_size} players, no perfect split")
+        run_all(
+            [
+                [random.randint(80, 180) * 10 for _ in range(lobby_size)]
+                for _ in range(lobbies_per_size)
+            ],
+            5,
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else LOBBIES)
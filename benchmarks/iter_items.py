@@ -0,0 +1,105 @@
+"""Benchmark BotCollection.iter_items, count and exists against loading the whole collection.
+
+Needs a MongoDB server, it uses the bot's configured database (MONGO_URL) and
+writes to a scratch bench.items collection, which is dropped afterwards.
+
+Run from the repository root:
+    python -m benchmarks.iter_items [documents]
+"""
+import asyncio
+import random
+import sys
+import time
+import tracemalloc
+from typing import Awaitable, Callable
+
+from database import BotCollection
+
+DOCUMENTS: int = 100_000
+INSERT_BATCH: int = 5000
+
+
+def make_document(index: int) -> dict:
+    """A document shaped like a players.data entry, with some bulk to it."""
+    return {
+        "steam": str(76561198000000000 + index),
+        "discord": str(100000000000000000 + index),
+        "registered": random.randint(0, 2**31),
+        "divison": {
+            mode: {"highest": random.randint(0, 6), "current": random.randint(0, 6)}
+            for mode in ("sixes", "hl")
+        },
+        "history": [random.random() for _ in range(20)],
+    }
+
+
+async def measure(name: str, func: Callable[[], Awaitable[object]]) -> None:
+    """Print the time taken and the peak memory allocated by a call.
+
+    Memory is traced on a second run, tracing slows down the first one too much.
+    """
+    start = time.perf_counter()
+    await func()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    await func()
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<40} {elapsed * 1000:>10.1f} ms {peak / 2**20:>10.2f} MiB")
+
+
+async def main(documents: int) -> None:
+    """Fill the scratch collection and compare each way of reading it."""
+    collection = BotCollection("bench", "items")
+    await collection.database.drop()
+    for start in range(0, documents, INSERT_BATCH):
+        await collection.database.insert_many(
+            [
+                make_document(index)
+                for index in range(start, min(start + INSERT_BATCH, documents))
+            ]
+        )
+    await collection.database.create_index("steam")
+    target = str(76561198000000000 + documents // 2)
+
+    async def load_all() -> None:
+        for item in await collection.find_all_items():
+            _ = item["steam"]
+
+    async def stream_all() -> None:
+        async for item in collection.iter_items(batch_size=1000):
+            _ = item["steam"]
+
+    async def stream_projected() -> None:
+        async for item in collection.iter_items(
+            projection={"steam": 1, "_id": 0}, batch_size=1000
+        ):
+            _ = item["steam"]
+
+    async def count_loaded() -> None:
+        len(await collection.find_all_items())
+
+    async def count_server() -> None:
+        await collection.count()
+
+    async def exists_loaded() -> None:
+        any(item["steam"] == target for item in await collection.find_all_items())
+
+    async def exists_server() -> None:
+        await collection.exists({"steam": target})
+
+    print(f"{documents} documents")
+    try:
+        await measure("find_all_items", load_all)
+        await measure("iter_items", stream_all)
+        await measure("iter_items with projection", stream_projected)
+        await measure("len(find_all_items)", count_loaded)
+        await measure("count", count_server)
+        await measure("search find_all_items", exists_loaded)
+        await measure("exists", exists_server)
+    finally:
+        await collection.database.drop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else DOCUMENTS))
@@ -0,0 +1,162 @@
+"""Micro-benchmark of parsing logs.tf data into the LogData model.
+
+Parses a corpus of logs and prints the parse time per log, the time of the fields the
+queue reads on every poll, and the memory and allocations kept alive by the models.
+
+The corpus is logs.tf JSON files, for example downloaded from
+https://logs.tf/api/v1/log/<id>. Without any files, highlander and sixes logs shaped
+like logs.tf's are generated.
+
+Run from the repository root, no database is used but MONGO_URL has to be a valid URL:
+    MONGO_URL=mongodb://localhost python -m benchmarks.log_model [log.json ...]
+"""
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+from logs import LogData
+
+GENERATED_LOGS: int = 200
+REPEATS: int = 5
+CLASSES: list[str] = [
+    "scout",
+    "soldier",
+    "pyro",
+    "demoman",
+    "heavyweapons",
+    "engineer",
+    "medic",
+    "sniper",
+    "spy",
+]
+PLAYER_STATS: list[str] = [
+    "kills",
+    "deaths",
+    "assists",
+    "suicides",
+    "dmg",
+    "dmg_real",
+    "dt",
+    "dt_real",
+    "hr",
+    "lks",
+    "as",
+    "dapd",
+    "dapm",
+    "ubers",
+    "drops",
+    "medkits",
+    "medkits_hp",
+    "backstabs",
+    "headshots",
+    "headshots_hit",
+    "sentries",
+    "heal",
+    "cpc",
+    "ic",
+]
+
+
+def generate_log(players: int) -> dict:
+    """A log with the fields and nesting of a logs.tf log, filled with random stats."""
+    player_data: dict = {}
+    for index in range(players):
+        stats: dict = {stat: random.randint(0, 3000) for stat in PLAYER_STATS}
+        stats["kpd"] = round(random.random() * 3, 1)
+        stats["kapd"] = round(random.random() * 4, 1)
+        stats["team"] = "Red" if index % 2 == 0 else "Blue"
+        stats["ubertypes"] = {}
+        stats["class_stats"] = [
+            {
+                "type": random.choice(CLASSES),
+                "kills": random.randint(0, 40),
+                "assists": random.randint(0, 20),
+                "deaths": random.randint(0, 30),
+                "dmg": random.randint(0, 12000),
+                "total_time": random.randint(0, 1800),
+                "weapon": {
+                    f"weapon_{weapon}": {
+                        "kills": random.randint(0, 20),
+                        "dmg": random.randint(0, 6000),
+                        "avg_dmg": random.random() * 100,
+                        "shots": random.randint(0, 500),
+                        "hits": random.randint(0, 300),
+                    }
+                    for weapon in range(3)
+                },
+            }
+            for _ in range(random.randint(1, 3))
+        ]
+        player_data[f"[U:1:{random.randint(10**6, 10**9)}]"] = stats
+    team = {
+        key: random.randint(0, 100)
+        for key in ("score", "kills", "deaths", "dmg", "charges", "drops")
+    }
+    return {
+        "version": 3,
+        "teams": {
+            "Red": team | {"firstcaps": 2, "caps": 5},
+            "Blue": team | {"firstcaps": 1, "caps": 3},
+        },
+        "length": random.randint(600, 1800),
+        "players": player_data,
+        "names": {steam_3: "player" for steam_3 in player_data},
+        "info": {"map": "koth_product_final", "total_length": 1800},
+        "success": True,
+    }
+
+
+def poll(log: LogData) -> None:
+    """Read what the queue reads when it checks if a log is finished."""
+    _ = log.red_team.score, log.blue_team.score, log.length, log.map_name
+    for player in log.players:
+        _ = player.steam_3, player.team
+
+
+def timed(func, corpus: list) -> float:
+    """The best time over REPEATS of calling a function on every log, in µs per log."""
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        for item in corpus:
+            func(item)
+        best = min(best, time.perf_counter() - start)
+    return best / len(corpus) * 1e6
+
+
+def main(paths: list[str]) -> None:
+    """Load or generate the corpus and print the measurements."""
+    corpus: list[dict] = []
+    for path in paths:
+        with open(path, encoding="UTF-8") as log_file:
+            corpus.append(json.load(log_file))
+    if not corpus:
+        random.seed(0)
+        corpus = [generate_log(random.choice([12, 18])) for _ in range(GENERATED_LOGS)]
+
+    parse_time = timed(LogData, corpus)
+    models = [LogData(data) for data in corpus]
+    poll_time = timed(poll, models)
+    del models
+
+    tracemalloc.start()
+    models = [LogData(data) for data in corpus]
+    for model in models:
+        poll(model)
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    statistics = snapshot.statistics("filename")
+    size = sum(stat.size for stat in statistics)
+    blocks = sum(stat.count for stat in statistics)
+
+    print(f"{len(corpus)} logs")
+    print(f"parse            {parse_time:>10.1f} µs/log")
+    print(f"queue poll       {poll_time:>10.1f} µs/log")
+    print(f"retained memory  {size / len(corpus) / 1024:>10.1f} KiB/log")
+    print(f"retained blocks  {blocks / len(corpus):>10.0f} allocations/log")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
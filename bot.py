@@ -18,8 +18,10 @@ from logs.searcher import LogSearcher
 from logs.stats import StatsCog
 from menus import BotMenu
 from menus.templates import send_channel_prompt
+from migrations import bootstrap_database
 from pug.manual import ManualPugCog
 from pug.med_immunity import PugMedicCog
+from pug.presence import PresenceCog
 from pug.pug import PugRunningCog
 from pug.setup import PugSetupCog
 from registration.registration import RegistrationCog
@@ -45,6 +47,7 @@ bot.add_cog(RegistrationSetupCog(bot))
 bot.add_cog(PugSetupCog(bot))
 bot.add_cog(PugRunningCog(bot))
 bot.add_cog(PugMedicCog(bot))
+bot.add_cog(PresenceCog(bot))
 bot.add_cog(LogsCog(bot))
 bot.add_cog(EloCog(bot))
 bot.add_cog(StatsCog(bot))
@@ -67,19 +70,23 @@ async def on_ready() -> None:
     logging.info("Creating webserver...")
     registration_cog: RegistrationCog = RegistrationCog(bot)
     bot.add_cog(registration_cog)
-    webserver: Webserver = Webserver(registration_cog)
+    log_searcher: LogSearcher = LogSearcher(bot)
+    webserver: Webserver = Webserver(registration_cog, log_searcher)
     logging.info("Adding delayed cogs...")
     bot.add_cog(UpdateRolesCog(bot))
     bot.add_cog(ServerCog(bot))
     logging.info("Syncing commands...")
     await bot.sync_all_application_commands()
+    logging.info("Checking database migrations and indexes...")
+    await bootstrap_database()
     logging.info("Starting bot loops...")
+    bot.loop.create_task(database.guild_config_cache.watch())
     update_status.start()
-    manual_cog.status_check.start()  # pylint: disable=no-member
-    manual_cog.update_channel_status.start()  # pylint: disable=no-member
-    log_searcher: LogSearcher = LogSearcher(bot)
+    bot.loop.create_task(manual_cog.expiry.run())
+    bot.loop.create_task(manual_cog.refresh_topics())
     log_searcher.searcher.start()  # pylint: disable=no-member
     log_searcher.queue.start()  # pylint: disable=no-member
+    bot.loop.create_task(log_searcher.ingest())
     logging.info("Starting webserver. Bot is ready!")
     await registration_cog.start_server(webserver.app)
 
@@ -1,5 +1,13 @@
 """Functions for interacting with the database throughout the bot."""
+import asyncio
+import copy
+import logging
+import time
+from typing import Any, AsyncIterator, TypedDict
+
 import motor.motor_asyncio
+import pymongo.errors
+from pymongo import ASCENDING, IndexModel, ReturnDocument, UpdateOne
 
 import constants
 from rglapi import RglApi
@@ -16,6 +24,7 @@ class BotCollection:
 
     def __init__(self, database: str, collection: str) -> None:
         self.client = db_client
+        self.name: str = f"{database}.{collection}"
         self.database = db_client[database][collection]
 
     async def add_item(self, item: dict):
@@ -35,6 +44,19 @@ class BotCollection:
         """
         await self.database.update_one(search, item, upsert=True)
 
+    async def bulk_update_items(self, updates: list[tuple[dict, dict]]):
+        """Update many items in the collection in a single round trip.
+
+        Args:
+            updates (list[tuple[dict, dict]]): The search key and update for each item.
+        """
+        if not updates:
+            return
+        await self.database.bulk_write(
+            [UpdateOne(search, item, upsert=True) for search, item in updates],
+            ordered=False,
+        )
+
     async def find_item(self, search: dict):
         """Search for an item in the collection.
 
@@ -46,20 +68,366 @@ class BotCollection:
             raise LookupError
         return result
 
-    async def delete_item(self, search: dict):
+    async def delete_item(self, search: dict) -> bool:
         """Delete an item from the collection.
 
         Args:
             search (dict): The key to look for.
+
+        Returns:
+            bool: True if an item was deleted.
         """
-        await self.database.delete_one(search)
+        result = await self.database.delete_one(search)
+        return result.deleted_count > 0
 
     async def find_all_items(self) -> list[dict]:
-        """Returns all items in the collection."""
-        results = []
-        async for item in self.database.find():
-            results.append(item)
-        return results
+        """Returns all items in the collection.
+
+        This loads the whole collection into memory, use iter_items where possible.
+        """
+        return [item async for item in self.iter_items()]
+
+    async def iter_items(
+        self,
+        search: dict | None = None,
+        projection: dict | None = None,
+        batch_size: int = 100,
+        sort: list[tuple[str, int]] | None = None,
+    ) -> AsyncIterator[dict]:
+        """Stream items from the collection, fetching them from the database in batches.
+
+        Keep the work done per batch under 10 minutes or the cursor will time out.
+
+        Args:
+            search (dict | None): The filter to match items against, all items if None.
+            projection (dict | None): The fields to return, all fields if None.
+            batch_size (int): The number of items fetched per round trip.
+            sort (list[tuple[str, int]] | None): The keys and directions to sort by.
+
+        Yields:
+            dict: Each matching item.
+        """
+        cursor = self.database.find(search or {}, projection, batch_size=batch_size)
+        if sort is not None:
+            cursor = cursor.sort(sort)
+        async for item in cursor:
+            yield item
+
+    async def count(self, search: dict | None = None) -> int:
+        """Count the items in the collection.
+
+        Args:
+            search (dict | None): The filter to match items against, all items if None.
+
+        Returns:
+            int: The number of matching items.
+        """
+        if search is None:
+            return await self.database.estimated_document_count()
+        return await self.database.count_documents(search)
+
+    async def exists(self, search: dict) -> bool:
+        """Check if any item in the collection matches the search.
+
+        Args:
+            search (dict): The filter to match items against.
+
+        Returns:
+            bool: True if at least one item matches.
+        """
+        return await self.database.find_one(search, {"_id": 1}) is not None
+
+    async def ensure_indexes(self, indexes: list[IndexModel]) -> list[str]:
+        """Create any of the given indexes that do not exist yet.
+
+        Args:
+            indexes (list[IndexModel]): The indexes the collection needs.
+
+        Returns:
+            list[str]: The names of the indexes that were missing and have been created.
+        """
+        existing = await self.database.index_information()
+        missing = [index for index in indexes if index.document["name"] not in existing]
+        if missing:
+            await self.database.create_indexes(missing)
+        return [index.document["name"] for index in missing]
+
+    async def unused_indexes(self) -> list[str]:
+        """Returns the names of indexes that have not been used since the server started."""
+        unused = []
+        async for stats in self.database.aggregate([{"$indexStats": {}}]):
+            if stats["name"] != "_id_" and stats["accesses"]["ops"] == 0:
+                unused.append(stats["name"])
+        return unused
+
+
+# The indexes each collection needs for the lookups done throughout the bot.
+REQUIRED_INDEXES: dict[tuple[str, str], list[IndexModel]] = {
+    ("players", "data"): [
+        IndexModel([("steam", ASCENDING)], name="steam"),
+        IndexModel([("discord", ASCENDING)], name="discord"),
+        IndexModel([("rgl_sync.next", ASCENDING)], name="rgl_sync_next"),
+    ],
+    ("players", "elo"): [
+        IndexModel([("steam", ASCENDING)], name="steam", unique=True),
+    ],
+    ("logs", "list"): [IndexModel([("log_id", ASCENDING)], name="log_id")],
+    ("logs", "queue"): [
+        IndexModel([("log_id", ASCENDING)], name="log_id"),
+        IndexModel([("next_check", ASCENDING)], name="next_check"),
+    ],
+    ("logs", "ids"): [
+        IndexModel([("log_id", ASCENDING)], name="log_id", unique=True),
+    ],
+    ("logs", "raw.files"): [
+        IndexModel([("filename", ASCENDING)], name="filename", unique=True),
+    ],
+    ("guilds", "config"): [IndexModel([("guild", ASCENDING)], name="guild")],
+    ("guilds", "manual"): [
+        IndexModel([("guild", ASCENDING)], name="guild", unique=True),
+    ],
+    ("bot", "jobs"): [
+        IndexModel(
+            [("kind", ASCENDING), ("guild", ASCENDING), ("status", ASCENDING)],
+            name="kind_guild_status",
+        ),
+        IndexModel([("started", ASCENDING)], name="started"),
+    ],
+    ("bot", "job_players"): [
+        IndexModel(
+            [("job", ASCENDING), ("steam", ASCENDING)], name="job_steam", unique=True
+        ),
+    ],
+}
+
+
+async def ensure_indexes() -> None:
+    """Create missing indexes and report any that are not being used.
+
+    Safe to run on every startup, existing indexes are left alone.
+    """
+    for (database, collection), indexes in REQUIRED_INDEXES.items():
+        bot_collection = BotCollection(database, collection)
+        try:
+            created = await bot_collection.ensure_indexes(indexes)
+        except pymongo.errors.OperationFailure as error:
+            logging.error(
+                "Unable to create indexes on %s: %s", bot_collection.name, error
+            )
+            continue
+        if created:
+            logging.info(
+                "Created missing indexes on %s: %s", bot_collection.name, created
+            )
+        try:
+            unused = await bot_collection.unused_indexes()
+        except pymongo.errors.OperationFailure:
+            # $indexStats needs the clusterMonitor role, not worth failing startup over
+            continue
+        unused = [name for name in unused if name not in created]
+        if unused:
+            logging.info("Unused indexes on %s: %s", bot_collection.name, unused)
+
+
+class GuildConfig(TypedDict, total=False):
+    """TypedDict for a guild's document in the guilds.config collection."""
+
+    _id: Any
+    guild: int
+    role: int
+    connect: int | None
+    rcon: int | None
+    immune: list[int]
+    serveme: str
+    registration: dict[str, Any]
+    roles: dict[str, dict[str, Any]]
+    logs: dict[str, Any]
+    elo: dict[str, Any]
+    manual: dict[str, Any]
+
+
+class GuildConfigCache:
+    """Process-wide cache of guilds.config documents keyed by guild ID.
+
+    Writes made through the bot update the cache directly (write-through).
+    Writes made elsewhere are picked up by a change stream if the database supports
+    one, otherwise entries expire after the TTL and are reloaded on the next lookup.
+    Every write or change bumps the guild's generation, and a read or write only stores
+    its result if the generation hasn't changed since it started, so an older result
+    never overwrites a newer one.
+
+    Attributes:
+        ttl (float): Seconds before a cached entry is considered stale.
+        streaming (bool): Whether the change stream is currently running.
+        watching (bool): Whether watch has been started, it only needs to run once.
+    """
+
+    def __init__(self, ttl: float = 300) -> None:
+        self.ttl: float = ttl
+        self.streaming: bool = False
+        self.watching: bool = False
+        self._entries: dict[int, tuple[float, GuildConfig | None]] = {}
+        self._guild_ids: dict[Any, int] = {}
+        self._generations: dict[int, int] = {}
+        self._cleared: int = 0
+        self._collection = db_client.guilds.config
+
+    def _store(self, guild: int, config: GuildConfig | None) -> None:
+        self._entries[int(guild)] = (time.monotonic() + self.ttl, config)
+        if config is not None and "_id" in config:
+            self._guild_ids[config["_id"]] = int(guild)
+
+    def _generation(self, guild: int) -> tuple[int, int]:
+        return self._cleared, self._generations.get(int(guild), 0)
+
+    def _bump(self, guild: int) -> None:
+        self._generations[int(guild)] = self._generations.get(int(guild), 0) + 1
+
+    def invalidate(self, guild: int) -> None:
+        """Drop a guild from the cache so the next lookup reads the database.
+
+        Args:
+            guild (int): The guild ID to drop.
+        """
+        self._bump(guild)
+        self._entries.pop(int(guild), None)
+
+    def clear(self) -> None:
+        """Drop every cached guild."""
+        self._cleared += 1
+        self._entries.clear()
+
+    async def get(self, guild: int) -> GuildConfig | None:
+        """Get the config for a guild, reading the database only on a miss.
+
+        Args:
+            guild (int): The guild ID to get.
+
+        Returns:
+            GuildConfig | None: A copy of the guild config, None if the guild is not setup.
+        """
+        entry = self._entries.get(int(guild))
+        if entry is None or entry[0] < time.monotonic():
+            generation = self._generation(guild)
+            config: GuildConfig | None = await self._collection.find_one(
+                {"guild": guild}
+            )
+            # A write or change that finished during the read is newer than the read
+            if self._generation(guild) == generation:
+                self._store(guild, config)
+        else:
+            config = entry[1]
+        return copy.deepcopy(config)
+
+    async def update(self, guild: int, update: dict, upsert: bool = True) -> None:
+        """Apply an update to a guild config and store the result in the cache.
+
+        Args:
+            guild (int): The guild ID to update.
+            update (dict): The update operators to apply ($set, $push, $pull...).
+            upsert (bool): Whether to create the document if it does not exist.
+        """
+        self._bump(guild)
+        generation = self._generation(guild)
+        config: GuildConfig | None = await self._collection.find_one_and_update(
+            {"guild": guild},
+            update,
+            upsert=upsert,
+            return_document=ReturnDocument.AFTER,
+        )
+        if self._generation(guild) == generation:
+            self._store(guild, config)
+        else:
+            # Another write finished in between, it isn't known which one was applied last
+            self.invalidate(guild)
+
+    async def watch(self) -> None:
+        """Keep the cache in sync with changes made outside of this process.
+
+        Runs until cancelled. If change streams are not supported (standalone server),
+        this returns and the cache falls back to the TTL. Calling it again while it is
+        already running (on_ready fires again after a reconnect) does nothing.
+        """
+        if self.watching:
+            return
+        self.watching = True
+        while True:
+            try:
+                async with self._collection.watch(
+                    full_document="updateLookup"
+                ) as stream:
+                    self.streaming = True
+                    async for change in stream:
+                        document = change.get("fullDocument")
+                        if document is not None and "guild" in document:
+                            self._bump(document["guild"])
+                            self._store(document["guild"], document)
+                            continue
+                        guild = self._guild_ids.pop(change["documentKey"]["_id"], None)
+                        if guild is not None:
+                            self.invalidate(guild)
+            except pymongo.errors.OperationFailure as error:
+                logging.info(
+                    "Guild config change stream unavailable, using TTL: %s", error
+                )
+                self.streaming = False
+                return
+            except pymongo.errors.PyMongoError as error:
+                logging.warning("Guild config change stream stopped: %s", error)
+                self.streaming = False
+                self.clear()
+                await asyncio.sleep(30)
+
+
+guild_config_cache: GuildConfigCache = GuildConfigCache()
+
+
+class GuildConfigCollection(BotCollection):
+    """BotCollection for guilds.config that reads and writes through the guild config cache.
+
+    Only lookups and updates keyed on the guild alone use the cache, anything else
+    goes straight to the database.
+    """
+
+    def __init__(self) -> None:
+        super().__init__("guilds", "config")
+
+    async def add_item(self, item: dict):
+        await super().add_item(item)
+        if "guild" in item:
+            guild_config_cache.invalidate(item["guild"])
+
+    async def update_item(self, search: dict, item: dict):
+        if list(search) == ["guild"]:
+            await guild_config_cache.update(search["guild"], item)
+            return
+        await super().update_item(search, item)
+        guild_config_cache.clear()
+
+    async def bulk_update_items(self, updates: list[tuple[dict, dict]]):
+        await super().bulk_update_items(updates)
+        guild_config_cache.clear()
+
+    async def find_item(self, search: dict):
+        if list(search) != ["guild"]:
+            return await super().find_item(search)
+        result = await guild_config_cache.get(search["guild"])
+        if result is None:
+            raise LookupError
+        return result
+
+    async def exists(self, search: dict) -> bool:
+        if list(search) != ["guild"]:
+            return await super().exists(search)
+        return await guild_config_cache.get(search["guild"]) is not None
+
+    async def delete_item(self, search: dict) -> bool:
+        deleted = await super().delete_item(search)
+        if list(search) == ["guild"]:
+            guild_config_cache.invalidate(search["guild"])
+        else:
+            guild_config_cache.clear()
+        return deleted
 
 
 async def is_server_setup(guild: int):
@@ -71,10 +439,7 @@ async def is_server_setup(guild: int):
     Returns:
         bool: True if the server is setup, False otherwise.
     """
-    database = db_client.guilds.config
-    if await database.find_one({"guild": guild}) is None:
-        return False
-    return True
+    return await guild_config_cache.get(guild) is not None
 
 
 async def add_new_guild(guild: int, role: int, connect: int | None, rcon: int | None):
@@ -86,11 +451,9 @@ async def add_new_guild(guild: int, role: int, connect: int | None, rcon: int |
         connect (int | None): The connect channel ID.
         rcon (int | None): The rcon channel ID.
     """
-    database = db_client.guilds.config
-    await database.update_one(
-        {"guild": guild},
+    await guild_config_cache.update(
+        guild,
         {"$set": {"role": role, "connect": connect, "rcon": rcon, "immune": []}},
-        upsert=True,
     )
 
 
@@ -103,10 +466,7 @@ async def get_server(guild: int):
     Returns:
         dict: The server data from the db.
     """
-    database = db_client.guilds.config
-    if await database.find_one({"guild": guild}) is None:
-        return None
-    return await database.find_one({"guild": guild})
+    return await guild_config_cache.get(guild)
 
 
 def get_all_servers():
@@ -122,12 +482,7 @@ async def set_registration_settings(guild: int, registration):
         guild (int): The guild ID to set.
         registration (dict): The registration settings to set.
     """
-    database = db_client.guilds.config
-    await database.update_one(
-        {"guild": guild},
-        {"$set": {"registration": registration}},
-        upsert=True,
-    )
+    await guild_config_cache.update(guild, {"$set": {"registration": registration}})
 
 
 async def set_guild_serveme(guild: int, serveme: str):
@@ -137,12 +492,7 @@ async def set_guild_serveme(guild: int, serveme: str):
         guild (int): The guild ID to set.
         serveme (str): The serveme key to set.
     """
-    database = db_client.guilds.config
-    await database.update_one(
-        {"guild": guild},
-        {"$set": {"serveme": serveme}},
-        upsert=True,
-    )
+    await guild_config_cache.update(guild, {"$set": {"serveme": serveme}})
 
 
 async def add_player(steam: str, discord: str):
@@ -167,8 +517,7 @@ async def add_med_immune_player(guild: int, discord: int):
         guild (int): The guild ID to set in
         discord (str): The discord ID of the player to set
     """
-    database = db_client.guilds.config
-    await database.update_one({"guild": guild}, {"$push": {"immune": discord}})
+    await guild_config_cache.update(guild, {"$push": {"immune": discord}}, upsert=False)
 
 
 async def remove_med_immune_player(guild: int, discord: int):
@@ -178,8 +527,7 @@ async def remove_med_immune_player(guild: int, discord: int):
         guild (int): The guild ID to remove from
         discord (str): The discord ID of the player to remove
     """
-    database = db_client.guilds.config
-    await database.update_one({"guild": guild}, {"$pull": {"immune": discord}})
+    await guild_config_cache.update(guild, {"$pull": {"immune": discord}}, upsert=False)
 
 
 async def clear_med_immunity_by_guild(guild: int):
@@ -188,8 +536,7 @@ async def clear_med_immunity_by_guild(guild: int):
     Args:
         guild: The guild ID to clear the med immunity field of
     """
-    database = db_client.guilds.config
-    await database.update_one({"guild": guild}, {"$set": {"immune": []}})
+    await guild_config_cache.update(guild, {"$set": {"immune": []}}, upsert=False)
 
 
 async def clear_med_immunity_all_guilds():
@@ -198,6 +545,7 @@ async def clear_med_immunity_all_guilds():
     """
     database = db_client.guilds.config
     await database.update_many({}, {"$set": {"immune": []}})
+    guild_config_cache.clear()
 
 
 async def get_player_stats(steam: int):
@@ -274,6 +622,24 @@ async def get_player_from_discord(discord: int):
     return player
 
 
+async def get_players_from_discord(discord_ids: list[int]) -> dict[int, dict]:
+    """Get many players from the database with a single query.
+
+    Args:
+        discord_ids (list[int]): The discord IDs to get.
+
+    Returns:
+        dict[int, dict]: Player data by discord ID, unregistered players are left out.
+    """
+    database = db_client.players.data
+    players: dict[int, dict] = {}
+    async for player in database.find(
+        {"discord": {"$in": [str(discord) for discord in discord_ids]}}
+    ):
+        players[int(player["discord"])] = player
+    return players
+
+
 def get_all_players():
     """Get all players from the database."""
     database = db_client.players.data
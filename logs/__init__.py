@@ -6,41 +6,64 @@ from database import BotCollection
 player_db = BotCollection("players", "data")
 
 
+def _stat(key: str) -> property:
+    """Property reading a stat from the raw log data only when it is accessed."""
+    return property(lambda self: self.data[key])
+
+
 class LogTeamData:
     """Stores team data from a log"""
 
+    __slots__ = ("data", "score", "players")
+
+    kills = _stat("kills")
+    deaths = _stat("deaths")
+    dmg = _stat("dmg")
+    charges = _stat("charges")
+    drops = _stat("drops")
+    firstcaps = _stat("firstcaps")
+    caps = _stat("caps")
+
     def __init__(self, data: dict) -> None:
-        self.score = data["score"]
-        self.kills = data["kills"]
-        self.deaths = data["deaths"]
-        self.dmg = data["dmg"]
-        self.charges = data["charges"]
-        self.drops = data["drops"]
-        self.firstcaps = data["firstcaps"]
-        self.caps = data["caps"]
+        self.data: dict = data
+        self.score: int = data["score"]
         self.players: list[PlayerData] = []
 
 
 class PlayerData:
-    """Stores player data from a log"""
+    """Stores player data from a log, class stats are only parsed when first used"""
 
-    def __init__(self, steam_3: str, data: dict) -> None:
-        self.steam_3 = steam_3
-        self.team = data["team"]
-        self.class_stats: list[ClassData] = []
-        self.kills = data["kills"]
-        self.deaths = data["deaths"]
-        self.assists = data["assists"]
-        self.kpd = data["kpd"]
-        self.dmg = data["dmg"]
-        self.dmg_taken = data["dt"]
-        self.time = 0
+    __slots__ = ("data", "steam_3", "team", "linked", "_class_stats")
 
-        for class_played in data["class_stats"]:
-            self.class_stats.append(ClassData(class_played))
-            self.time += class_played["total_time"]
+    kills = _stat("kills")
+    deaths = _stat("deaths")
+    assists = _stat("assists")
+    kpd = _stat("kpd")
+    dmg = _stat("dmg")
+    dmg_taken = _stat("dt")
 
+    def __init__(self, steam_3: str, data: dict) -> None:
+        self.data: dict = data
+        self.steam_3: str = steam_3
+        self.team: str = data["team"]
         self.linked: None | Player = None
+        self._class_stats: list[ClassData] | None = None
+
+    @property
+    def class_stats(self) -> list["ClassData"]:
+        """The stats of each class the player played."""
+        if self._class_stats is None:
+            self._class_stats = [
+                ClassData(class_played) for class_played in self.data["class_stats"]
+            ]
+        return self._class_stats
+
+    @property
+    def time(self) -> int:
+        """The total time the player played in seconds."""
+        return sum(
+            class_played["total_time"] for class_played in self.data["class_stats"]
+        )
 
     async def link_player(self) -> None:
         """Add database data from the associated steam ID to the player data"""
@@ -97,6 +120,8 @@ class Player:
 class ClassData:
     """Stores class data from a log"""
 
+    __slots__ = ("kills", "assists", "deaths", "dmg", "time", "dpm")
+
     def __init__(self, data: dict) -> None:
         self.kills = data["kills"]
         self.assists = data["assists"]
@@ -110,7 +135,9 @@ class ClassData:
 
 
 class LogData:
-    """Stores log data from logs.tf"""
+    """Stores log data from logs.tf, each player is parsed once and shared with their team"""
+
+    __slots__ = ("red_team", "blue_team", "players", "map_name", "length")
 
     def __init__(self, data: dict) -> None:
         self.red_team: LogTeamData = LogTeamData(data["teams"]["Red"])
@@ -119,16 +146,13 @@ class LogData:
         self.map_name: str = data["info"]["map"]
         self.length: int = data["length"]
 
-        for player in data["players"]:
-            if data["players"][player]["team"] == "Red":
-                self.red_team.players.append(
-                    PlayerData(player, data["players"][player])
-                )
-            elif data["players"][player]["team"] == "Blue":
-                self.blue_team.players.append(
-                    PlayerData(player, data["players"][player])
-                )
-            self.players.append(PlayerData(player, data["players"][player]))
+        for steam_3, player_data in data["players"].items():
+            player = PlayerData(steam_3, player_data)
+            if player.team == "Red":
+                self.red_team.players.append(player)
+            elif player.team == "Blue":
+                self.blue_team.players.append(player)
+            self.players.append(player)
 
     async def link_all_players(self) -> None:
         """Link all players in the log to their database entries"""
@@ -0,0 +1,147 @@
+"""Compressed archive of raw logs.tf log data, stored in GridFS next to the rest of the bot's data."""
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+
+import aiohttp
+import gridfs.errors
+import motor.motor_asyncio
+import pymongo.errors
+
+from database import BotCollection, db_client
+from logs.logstf_api import LogsAPI
+
+logs_db: BotCollection = BotCollection("logs", "list")
+
+# Logs looked at between progress messages in the bot logs while backfilling
+BACKFILL_PROGRESS: int = 100
+
+
+class LogArchive:
+    """Stores the raw JSON of each completed log, gzipped, so it never has to be downloaded again.
+
+    Each log is stored once in the logs.raw GridFS bucket under its log ID, with the
+    SHA-256 of its JSON kept in the metadata to check the data when it is read back.
+    The unique index on the file name keeps concurrent stores of a log from both
+    archiving it.
+    """
+
+    def __init__(self) -> None:
+        self.bucket: motor.motor_asyncio.AsyncIOMotorGridFSBucket | None = None
+
+    def get_bucket(self) -> motor.motor_asyncio.AsyncIOMotorGridFSBucket:
+        """Return the GridFS bucket, created on first use inside the running loop."""
+        if self.bucket is None:
+            self.bucket = motor.motor_asyncio.AsyncIOMotorGridFSBucket(
+                db_client["logs"], bucket_name="raw"
+            )
+        return self.bucket
+
+    async def contains(self, log_id: int) -> bool:
+        """Check if a log has been archived.
+
+        Args:
+            log_id (int): The logs.tf log ID.
+
+        Returns:
+            bool: True if the log is in the archive.
+        """
+        files = db_client["logs"]["raw.files"]
+        return await files.find_one({"filename": str(log_id)}, {"_id": 1}) is not None
+
+    async def store(self, log_id: int, log_data: dict) -> bool:
+        """Archive the raw data of a log, unless it is already archived.
+
+        Args:
+            log_id (int): The logs.tf log ID.
+            log_data (dict): The log data from logs.tf.
+
+        Returns:
+            bool: True if the log was added to the archive.
+        """
+        if await self.contains(log_id):
+            return False
+        raw = json.dumps(log_data, separators=(",", ":")).encode()
+        upload = self.get_bucket().open_upload_stream(
+            str(log_id),
+            metadata={
+                "log_id": int(log_id),
+                "sha256": hashlib.sha256(raw).hexdigest(),
+                "size": len(raw),
+            },
+        )
+        try:
+            await upload.write(gzip.compress(raw))
+            await upload.close()
+        except pymongo.errors.DuplicateKeyError:
+            # Archived by another store in the meantime, drop the chunks this one wrote
+            await upload.abort()
+            return False
+        return True
+
+    async def load(self, log_id: int) -> dict:
+        """Load the raw data of an archived log.
+
+        Args:
+            log_id (int): The logs.tf log ID.
+
+        Raises:
+            LookupError: The log is not in the archive, or its archived data is corrupted.
+
+        Returns:
+            dict: The log data, as returned by logs.tf.
+        """
+        try:
+            stream = await self.get_bucket().open_download_stream_by_name(str(log_id))
+        except gridfs.errors.NoFile as exc:
+            raise LookupError(f"Log {log_id} is not archived") from exc
+        raw = gzip.decompress(await stream.read())
+        if hashlib.sha256(raw).hexdigest() != stream.metadata["sha256"]:
+            raise LookupError(f"Archived data of log {log_id} is corrupted")
+        return json.loads(raw)
+
+
+log_archive: LogArchive = LogArchive()
+
+
+async def backfill_archive() -> tuple[int, int, int]:
+    """Archive every log in logs.list that isn't archived yet, logging progress as it goes.
+
+    Returns:
+        tuple[int, int, int]: The number of logs archived, already archived and failed.
+    """
+    log_ids = [
+        entry["log_id"]
+        async for entry in logs_db.iter_items(
+            projection={"log_id": 1, "_id": 0}, batch_size=1000
+        )
+    ]
+    archived = existing = failed = 0
+    for index, log_id in enumerate(log_ids):
+        if index % BACKFILL_PROGRESS == 0:
+            logging.info("Archive backfill: %d/%d logs", index, len(log_ids))
+        if await log_archive.contains(log_id):
+            existing += 1
+            continue
+        try:
+            log_data = await LogsAPI.get_single_log(log_id)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+            logging.warning(
+                "Archive backfill could not download log %s: %s", log_id, exc
+            )
+            failed += 1
+            continue
+        if not log_data.get("success", False):
+            failed += 1
+            continue
+        await log_archive.store(log_id, log_data)
+        archived += 1
+    logging.info(
+        "Archive backfill: %d archived, %d already archived, %d failed",
+        archived,
+        existing,
+        failed,
+    )
+    return archived, existing, failed
@@ -1,5 +1,7 @@
 """Elo calculations, storage and utilities."""
+from dataclasses import dataclass
 from difflib import SequenceMatcher
+import logging
 import math
 from typing import Any
 
@@ -31,10 +33,13 @@ class Elo:
 
     Methods:
         as_dict: Return the elo data as a dict.
+        load: Load the elo data from a database document.
         retrieve: Retrieve the elo data from the database.
         upload: Upload the elo data to the database.
         get_elo_from_mode: Get the elo of the player from a specific mode.
         update_elo_from_mode: Update the elo of the player from a specific mode.
+        get_mode_elo: get_elo_from_mode with the category already resolved.
+        update_mode_elo: update_elo_from_mode with the category already resolved.
     """
 
     def __init__(self, steam: int) -> None:
@@ -63,6 +68,21 @@ class Elo:
             "servers": server_elo_dict,
         }
 
+    def load(self, data: dict) -> None:
+        """Load the elo data from a database document.
+
+        Args:
+            data (dict): The elo document of the player.
+        """
+        self.elo = data["elo"]
+        self.global_elo = GlobalElo(data)
+
+        try:
+            for server in data["servers"]:
+                self.server_elo[server] = ServerElo(data, server)
+        except KeyError:
+            self.server_elo = {}
+
     async def retrieve(self) -> None:
         """Retrieve the elo data from the database."""
         data: dict
@@ -73,14 +93,7 @@ class Elo:
             print("Player not found in database, creating new entry.")
             data = default_elo
 
-        self.elo = data["elo"]
-        self.global_elo = GlobalElo(data)
-
-        try:
-            for server in data["servers"]:
-                self.server_elo[server] = ServerElo(data, server)
-        except KeyError:
-            self.server_elo = {}
+        self.load(data)
 
     async def upload(self) -> None:
         """Upload the elo data to the database."""
@@ -91,7 +104,6 @@ class Elo:
     async def get_elo_from_mode(
         self, mode: str, guild: int, category: str = "", num_players: int = 0
     ) -> int:
-        # pylint: disable=too-many-return-statements
         """Get the elo of the player from a specific mode.
 
         Args:
@@ -100,6 +112,41 @@ class Elo:
             category (str): The category name to get the elo from.
             num_players (int): The number of players in the log.
 
+        Returns:
+            int: The elo of the player.
+        """
+        if mode == "category":
+            category = await find_similar_categories(category, guild)
+        return self.get_mode_elo(mode, guild, category, num_players)
+
+    async def update_elo_from_mode(
+        self, mode: str, guild: int, category: str, num_players: int, elo_change: int
+    ) -> None:
+        """Update the elo of the player from a specific mode.
+
+        Args:
+            mode (str): The elo mode to update the elo from.
+            guild (int): The guild ID to update the elo from.
+            category (str): The category name to update the elo from.
+            num_players (int): The number of players in the log.
+            elo_change (int): The amount to change the elo by.
+        """
+        if mode == "category":
+            category = await find_similar_categories(category, guild)
+        self.update_mode_elo(mode, guild, category, num_players, elo_change)
+
+    def get_mode_elo(
+        self, mode: str, guild: int, category: str = "", num_players: int = 0
+    ) -> int:
+        # pylint: disable=too-many-return-statements
+        """Get the elo of the player from a specific mode without touching the database.
+
+        Args:
+            mode (str): The elo mode to get the elo from.
+            guild (int): The guild ID to get the elo from.
+            category (str): The elo category name, already combined by find_similar_categories.
+            num_players (int): The number of players in the log.
+
         Returns:
             int: The elo of the player.
         """
@@ -120,25 +167,24 @@ class Elo:
                 self.server_elo[str(guild)] = ServerElo(default_elo, str(guild))
                 return 1000
         if mode == "category":
-            correct_category = await find_similar_categories(category, guild)
             try:
-                return self.server_elo[str(guild)].categories[correct_category]
+                return self.server_elo[str(guild)].categories[category]
             except KeyError:
                 if str(guild) not in self.server_elo:
                     self.server_elo[str(guild)] = ServerElo(default_elo, str(guild))
-                self.server_elo[str(guild)].categories[correct_category] = 1000
+                self.server_elo[str(guild)].categories[category] = 1000
                 return 1000
         return 1000
 
-    async def update_elo_from_mode(
+    def update_mode_elo(
         self, mode: str, guild: int, category: str, num_players: int, elo_change: int
     ) -> None:
-        """Update the elo of the player from a specific mode.
+        """Update the elo of the player from a specific mode without touching the database.
 
         Args:
             mode (str): The elo mode to update the elo from.
             guild (int): The guild ID to update the elo from.
-            category (str): The category name to update the elo from.
+            category (str): The elo category name, already combined by find_similar_categories.
             num_players (int): The number of players in the log.
             elo_change (int): The amount to change the elo by.
         """
@@ -158,15 +204,12 @@ class Elo:
                 self.server_elo[str(guild)] = ServerElo(default_elo, str(guild))
                 self.server_elo[str(guild)].elo += elo_change
         elif mode == "category":
-            correct_category = await find_similar_categories(category, guild)
             try:
-                self.server_elo[str(guild)].categories[correct_category] += elo_change
+                self.server_elo[str(guild)].categories[category] += elo_change
             except KeyError:
                 if str(guild) not in self.server_elo:
                     self.server_elo[str(guild)] = ServerElo(default_elo, str(guild))
-                self.server_elo[str(guild)].categories[correct_category] = (
-                    1000 + elo_change
-                )
+                self.server_elo[str(guild)].categories[category] = 1000 + elo_change
 
 
 class GlobalElo:
@@ -197,6 +240,96 @@ class ServerElo:
             self.categories = {}
 
 
+@dataclass
+class EloLog:
+    """The parts of a log needed to calculate elo changes.
+
+    Stored with each completed log in logs.list so elo can be replayed without logs.tf.
+
+    Attributes:
+        guild (int): The guild the log was played in.
+        category (str): The name of the pug category the log was played in.
+        players (list[tuple[int, str]]): The steam_64 ID and team of each player.
+        red_score (int): The score of the red team.
+        blue_score (int): The score of the blue team.
+        length (int): The length of the log in seconds.
+    """
+
+    guild: int
+    category: str
+    players: list[tuple[int, str]]
+    red_score: int
+    blue_score: int
+    length: int
+
+    @classmethod
+    def from_full_log(cls, log) -> "EloLog":
+        """Create the summary of a log found by the searcher.
+
+        Args:
+            log (FullLog): The log to summarize.
+        """
+        return cls(
+            log.guild,
+            log.category.name,
+            [
+                (int(get_steam64(player.steam_3)), player.team)
+                for player in log.log.players
+            ],
+            log.log.red_team.score,
+            log.log.blue_team.score,
+            log.log.length,
+        )
+
+    @classmethod
+    def from_log_data(cls, guild: int, category: str, data: dict) -> "EloLog":
+        """Create the summary of a log from the logs.tf API response.
+
+        Args:
+            guild (int): The guild the log was played in.
+            category (str): The name of the pug category the log was played in.
+            data (dict): The log data from logs.tf.
+        """
+        return cls(
+            guild,
+            category,
+            [
+                (int(get_steam64(steam_3)), player["team"])
+                for steam_3, player in data["players"].items()
+            ],
+            data["teams"]["Red"]["score"],
+            data["teams"]["Blue"]["score"],
+            data["length"],
+        )
+
+    @classmethod
+    def from_summary(cls, guild: int, category: str, summary: dict) -> "EloLog":
+        """Create the summary of a log from the summary stored in logs.list.
+
+        Args:
+            guild (int): The guild the log was played in.
+            category (str): The name of the pug category the log was played in.
+            summary (dict): The stored summary, as returned by as_summary.
+        """
+        return cls(
+            guild,
+            category,
+            [(int(steam), team) for steam, team in summary["players"]],
+            summary["red_score"],
+            summary["blue_score"],
+            summary["length"],
+        )
+
+    def as_summary(self) -> dict[str, Any]:
+        """Return the fields that are not already stored in logs.list as a dict."""
+        return {
+            "players": [[NumberLong(steam), team] for steam, team in self.players],
+            "red_score": self.red_score,
+            "blue_score": self.blue_score,
+            "length": self.length,
+        }
+
+
 async def get_elo(steam: int | None = None, discord: int | None = None) -> Elo:
     """Get the elo of a player.
 
@@ -217,14 +350,31 @@ async def get_elo(steam: int | None = None, discord: int | None = None) -> Elo:
         steam_64 = steam
     else:
         data = await player_db.find_item({"discord": str(discord)})
-        steam_64 = data["steam"]
+        steam_64 = int(data["steam"])
     elo = Elo(steam=steam_64)
     print(steam_64)
     await elo.retrieve()
     return elo
 
 
-async def calculate_probability(team1_avg_elo: float, team2_avg_elo: float) -> float:
+async def get_elos(steam_ids: list[int]) -> dict[int, Elo]:
+    """Get the elo of multiple players with a single query.
+
+    Args:
+        steam_ids (list[int]): The steam_64 IDs of the players.
+
+    Returns:
+        dict[int, Elo]: The elo of each player, default elo for players without any.
+    """
+    elos: dict[int, Elo] = {steam: Elo(steam=steam) for steam in steam_ids}
+    async for data in elo_db.iter_items(
+        {"steam": {"$in": [NumberLong(steam) for steam in steam_ids]}}
+    ):
+        elos[int(data["steam"])].load(data)
+    return elos
+
+
+def calculate_probability(team1_avg_elo: float, team2_avg_elo: float) -> float:
     """Calculate the probability of team1 winning against team2.
 
     Args:
@@ -238,161 +388,149 @@ async def calculate_probability(team1_avg_elo: float, team2_avg_elo: float) -> f
     return 1 / (1 + pow(10, (team1_avg_elo - team2_avg_elo) / 300))
 
 
-async def calculate_elo_changes(log, mode: str) -> None:
-    """Calculate the elo changes for each player in the log.
+def calculate_player_elo_change(team_elo_change: int, elo_effect: float) -> int:
+    """Scale a team's elo change for one player by how far they are from the other team.
 
     Args:
-        log (FullLog): The log to calculate the elo changes for.
+        team_elo_change (int): The elo change of the player's team.
+        elo_effect (float): The player's elo minus the other team's average elo, divided by 400.
+
+    Returns:
+        int: The elo change of the player.
+    """
+    if elo_effect == 0.0:
+        return team_elo_change
+    if team_elo_change > 0:
+        # If the team won...
+        if elo_effect > 0:
+            # If the player's elo is higher than the team's average elo
+            return round(team_elo_change * (1 - math.log(elo_effect, 4)))
+        # If the player's elo is lower than the team's average elo
+        return round(team_elo_change * (1 + math.log(abs(elo_effect), 4)))
+    # If the team lost...
+    if elo_effect > 0:
+        # If the player's elo is higher than the team's average elo
+        return round(team_elo_change * (1 + math.log(elo_effect, 4)))
+    # If the player's elo is lower than the team's average elo
+    return round(team_elo_change * (1 - math.log(abs(elo_effect), 4)))
+
+
+def calculate_elo_changes(
+    log: EloLog, mode: str, elos: dict[int, Elo], category: str
+) -> None:
+    """Calculate the elo changes for each player in the log and apply them in memory.
+
+    Args:
+        log (EloLog): The log to calculate the elo changes for.
         mode (str): The elo mode to calculate the elo changes for.
+        elos (dict[int, Elo]): The elo of every player in the log, by steam_64 ID.
+        category (str): The elo category name, already combined by find_similar_categories.
     """
     base_elo_change: int = 40
     red_team_elo: float = 0
     blu_team_elo: float = 0
     red_team_players: list[Elo] = []
     blu_team_players: list[Elo] = []
-    print(f"Players: {len(log.log.players)}")
-    for player in log.log.players:
-        player_elo = await get_elo(steam=int(get_steam64(player.steam_3)))
-        elo = await player_elo.get_elo_from_mode(
-            mode, log.guild, log.category.name, len(log.log.players)
-        )
-        if player.team == "Red":
+    num_players = len(log.players)
+    logging.debug("Players: %d", num_players)
+    for steam, team in log.players:
+        player_elo = elos[steam]
+        elo = player_elo.get_mode_elo(mode, log.guild, category, num_players)
+        if team == "Red":
             red_team_elo += elo
             red_team_players.append(player_elo)
         else:
             blu_team_elo += elo
             blu_team_players.append(player_elo)
-    total_rounds = log.log.red_team.score + log.log.blue_team.score
+    total_rounds = log.red_score + log.blue_score
     if total_rounds != 0:
-        red_team_rounds_ratio = log.log.red_team.score / total_rounds
-        blu_team_rounds_ratio = log.log.blue_team.score / total_rounds
+        red_team_rounds_ratio = log.red_score / total_rounds
+        blu_team_rounds_ratio = log.blue_score / total_rounds
     else:
         red_team_rounds_ratio = 0.5
         blu_team_rounds_ratio = 0.5
-    if log.log.length < 15 * 60 and (
+    if log.length < 15 * 60 and (
         red_team_rounds_ratio == 0 or blu_team_rounds_ratio == 0
     ):
         base_elo_change = int(base_elo_change * 1.2)
     red_team_elo /= len(red_team_players)
     blu_team_elo /= len(blu_team_players)
-    red_team_prob = await calculate_probability(blu_team_elo, red_team_elo)
-    blu_team_prob = await calculate_probability(red_team_elo, blu_team_elo)
+    red_team_prob = calculate_probability(blu_team_elo, red_team_elo)
+    blu_team_prob = calculate_probability(red_team_elo, blu_team_elo)
     red_team_elo_change = round(
         base_elo_change * (red_team_rounds_ratio - red_team_prob)
     )
     blu_team_elo_change = round(
         base_elo_change * (blu_team_rounds_ratio - blu_team_prob)
     )
-    print(f"red_team_elo: {red_team_elo}")
-    print(f"blu_team_elo: {blu_team_elo}")
-    print(f"red_team_prob: {red_team_prob}")
-    print(f"blu_team_prob: {blu_team_prob}")
-    print(f"red_team_elo_change: {red_team_elo_change}")
-    print(f"blu_team_elo_change: {blu_team_elo_change}")
-
-    for red_player_elo in red_team_players:
-        mode_elo = await red_player_elo.get_elo_from_mode(
-            mode, log.guild, log.category.name, len(log.log.players)
-        )
-        red_current_elo_effect: float = (mode_elo - blu_team_elo) / 400
-        red_elo_change: int
-        if red_current_elo_effect != 0.0:
-            if red_team_elo_change > 0:
-                # If the team won...
-                if red_current_elo_effect > 0:
-                    # If the player's elo is higher than the team's average elo
-                    red_elo_change = round(
-                        red_team_elo_change * (1 - math.log(red_current_elo_effect, 4))
-                    )
-                else:
-                    # If the player's elo is lower than the team's average elo
-                    red_elo_change = round(
-                        red_team_elo_change
-                        * (1 + math.log(abs(red_current_elo_effect), 4))
-                    )
-            else:
-                # If the team lost...
-                if red_current_elo_effect > 0:
-                    # If the player's elo is higher than the team's average elo
-                    red_elo_change = round(
-                        red_team_elo_change * (1 + math.log(red_current_elo_effect, 4))
-                    )
-                else:
-                    # If the player's elo is lower than the team's average elo
-                    red_elo_change = round(
-                        red_team_elo_change
-                        * (1 - math.log(abs(red_current_elo_effect), 4))
-                    )
-        else:
-            red_elo_change = red_team_elo_change
-        await red_player_elo.update_elo_from_mode(
-            mode,
-            log.guild,
-            log.category.name,
-            len(log.log.players),
-            red_elo_change,
-        )
-        await red_player_elo.upload()
+    logging.debug("red_team_elo: %s, blu_team_elo: %s", red_team_elo, blu_team_elo)
+    logging.debug("red_team_prob: %s, blu_team_prob: %s", red_team_prob, blu_team_prob)
+    logging.debug(
+        "red_team_elo_change: %s, blu_team_elo_change: %s",
+        red_team_elo_change,
+        blu_team_elo_change,
+    )
 
-    for blu_player_elo in blu_team_players:
-        mode_elo = await blu_player_elo.get_elo_from_mode(
-            mode, log.guild, log.category.name, len(log.log.players)
-        )
-        blu_current_elo_effect: float = (mode_elo - red_team_elo) / 400
-        blu_elo_change: int
-        if blu_current_elo_effect != 0.0:
-            if blu_team_elo_change > 0:
-                # If the team won...
-                if blu_current_elo_effect > 0:
-                    # If the player's elo is higher than the team's average elo
-                    blu_elo_change = round(
-                        blu_team_elo_change * (1 - math.log(blu_current_elo_effect, 4))
-                    )
-                else:
-                    # If the player's elo is lower than the team's average elo
-                    blu_elo_change = round(
-                        blu_team_elo_change
-                        * (1 + math.log(abs(blu_current_elo_effect), 4))
-                    )
-            else:
-                # If the team lost...
-                if blu_current_elo_effect > 0:
-                    # If the player's elo is higher than the team's average elo
-                    blu_elo_change = round(
-                        blu_team_elo_change * (1 + math.log(blu_current_elo_effect, 4))
-                    )
-                else:
-                    # If the player's elo is lower than the team's average elo
-                    blu_elo_change = round(
-                        blu_team_elo_change
-                        * (1 - math.log(abs(blu_current_elo_effect), 4))
-                    )
-        else:
-            blu_elo_change = blu_team_elo_change
-        await blu_player_elo.update_elo_from_mode(
-            mode,
-            log.guild,
-            log.category.name,
-            len(log.log.players),
-            blu_elo_change,
-        )
-        await blu_player_elo.upload()
+    for team_players, team_elo_change, other_team_elo in (
+        (red_team_players, red_team_elo_change, blu_team_elo),
+        (blu_team_players, blu_team_elo_change, red_team_elo),
+    ):
+        for player_elo in team_players:
+            mode_elo = player_elo.get_mode_elo(mode, log.guild, category, num_players)
+            player_elo.update_mode_elo(
+                mode,
+                log.guild,
+                category,
+                num_players,
+                calculate_player_elo_change(
+                    team_elo_change, (mode_elo - other_team_elo) / 400
+                ),
+            )
+
+
+def apply_elo_log(log: EloLog, elos: dict[int, Elo], category: str | None) -> None:
+    """Apply every elo mode for a log in memory, in order (global, gamemode, server, category).
+
+    Args:
+        log (EloLog): The log to apply.
+        elos (dict[int, Elo]): The elo of every player in the log, by steam_64 ID.
+        category (str | None): The combined elo category name, None to skip category elo.
+    """
+    for mode in ("global", "gamemode", "server", "category"):
+        if mode == "category" and category is None:
+            continue
+        logging.debug("Processing %s elo", mode)
+        calculate_elo_changes(log, mode, elos, category or "")
 
 
 async def process_elo(log) -> None:
-    """Process elo changes for each gamemode.
+    """Process elo changes for each elo mode in a single pass.
+
+    Every player is loaded with one query, the modes are applied in memory and the
+    results are saved with one bulk write.
 
     Args:
         log (FullLog): The log to process the elo changes for.
+
+    Raises:
+        LookupError: The guild has no pug categories, category elo was not processed.
     """
-    print("Processing global elo")
-    await calculate_elo_changes(log, "global")
-    print("Processing gamemode elo")
-    await calculate_elo_changes(log, "gamemode")
-    print("Processing server elo")
-    await calculate_elo_changes(log, "server")
-    print("Processing category elo")
-    await calculate_elo_changes(log, "category")
+    elo_log = EloLog.from_full_log(log)
+    elos = await get_elos([steam for steam, _team in elo_log.players])
+    try:
+        category: str | None = await find_similar_categories(
+            elo_log.category, elo_log.guild
+        )
+    except LookupError:
+        category = None
+
+    apply_elo_log(elo_log, elos, category)
+
+    await elo_db.bulk_update_items(
+        [({"steam": elo.steam}, {"$set": elo.as_dict()}) for elo in elos.values()]
+    )
+    if category is None:
+        raise LookupError(f"No pug categories found for guild {elo_log.guild}")
 
 
 async def find_similar_categories(category: str, guild: int) -> str:
@@ -405,13 +543,26 @@ async def find_similar_categories(category: str, guild: int) -> str:
         str: The combined category name.
     """
     all_categories = await category_db.find_item({"_id": NumberLong(str(guild))})
+    return combine_similar_categories(category, all_categories["categories"])
+
+
+def combine_similar_categories(category: str, categories: dict[str, dict]) -> str:
+    """find_similar_categories for an already loaded guild categories document.
+
+    Args:
+        category (str): The category to find similar categories to.
+        categories (dict[str, dict]): All pug categories of the guild.
+
+    Returns:
+        str: The combined category name.
+    """
     # Find category with same waiting channels
     try:
-        add_up: int = all_categories["categories"][category]["add_up"]
+        add_up: int = categories[category]["add_up"]
     except KeyError:
         return category
     similar_category: str | None = None
-    for name, category_data in all_categories["categories"].items():
+    for name, category_data in categories.items():
         if name == category:
             continue
         if category_data["add_up"] == add_up:
@@ -1,24 +1,28 @@
 """This cog contains the elo cog with commands to configure elo and add missing logs."""
 import asyncio
+import logging
 import time
 
 from bson import Int64 as NumberLong
 import nextcord
 from nextcord.ext import commands, application_checks
 
-from database import BotCollection
+from database import BotCollection, GuildConfigCollection
 from constants import BOT_COLOR
 from logs import Player
 from logs.searcher import FullLog, PartialLog
 from logs.logstf_api import LogsAPI
+from logs.archive import backfill_archive, log_archive
 from logs.elo import process_elo
+from logs.registry import log_registry
+from logs.replay import replay_elo
 from menus import BotMenu
 from menus.callbacks import action_callback
 from menus.templates import send_boolean_menu
 from pug import PugCategory, CategoryButton, CategorySelect
 from util import is_runner, get_steam64
 
-config_db: BotCollection = BotCollection("guilds", "config")
+config_db: BotCollection = GuildConfigCollection()
 logs_db: BotCollection = BotCollection("logs", "list")
 category_db: BotCollection = BotCollection("guilds", "categories")
 
@@ -74,6 +78,8 @@ class EloCog(commands.Cog):
 
     def __init__(self, bot: commands.Bot):
         self.bot: commands.Bot = bot
+        self.backfill: asyncio.Task | None = None
+        self.replay: asyncio.Task | None = None
 
     @nextcord.slash_command(name="elo")
     async def elo(self, _interaction: nextcord.Interaction):
@@ -167,89 +173,179 @@ class EloCog(commands.Cog):
     @elo.subcommand(name="update")
     async def add_log(self, interaction: nextcord.Interaction, logstf_id: int):
         """Update the elo of all players in a log."""
-        try:
-            # If the log already exists we don't wanna add it again.
-            result = await logs_db.find_item({"log_id": int(logstf_id)})
+        # If the log already exists we don't wanna add it again.
+        if await log_registry.contains(logstf_id):
             await interaction.send(
-                content=f"Log #{result['log_id']} already exists in the database."
+                content=f"Log #{logstf_id} already exists in the database."
             )
             return
+        await interaction.send(content="Looking for log...")
+        players: list[Player] = []
+        log = await LogsAPI.get_single_log(logstf_id)
+        for player in log["players"]:
+            print(player)
+            log_player = Player(steam=get_steam64(player))
+            await log_player.link_player()
+            players.append(log_player)
+
+        # Need the category that the log was played in
+        try:
+            result = await category_db.find_item({"_id": interaction.guild.id})
+            categories = result["categories"]
         except LookupError:
-            await interaction.send(content="Looking for log...")
-            players: list[Player] = []
-            log = await LogsAPI.get_single_log(logstf_id)
-            for player in log["players"]:
-                print(player)
-                log_player = Player(steam=get_steam64(player))
-                await log_player.link_player()
-                players.append(log_player)
-
-            # Need the category that the log was played in
-            try:
-                result = await category_db.find_item({"_id": interaction.guild.id})
-                categories = result["categories"]
-            except LookupError:
-                await interaction.send(
-                    "There are no pug categories setup for this server.\nPlease run /pug category add to add a pug category."
-                )
-                return
-            select_view = CategorySelect()
-
-            for name, _category in categories.items():
-                disabled: bool = False
-                color = nextcord.ButtonStyle.gray
-                button = CategoryButton(name=name, color=color, disabled=disabled)
-                select_view.add_item(button)
-
-            pug_embed = nextcord.Embed(
-                title="Generate Teams",
-                color=BOT_COLOR,
-                description="Select the category this log was played in.",
+            await interaction.send(
+                "There are no pug categories setup for this server.\nPlease run /pug category add to add a pug category."
             )
-            await interaction.edit_original_message(embed=pug_embed, view=select_view)
-            embed_status = await select_view.wait()
-            if embed_status or select_view.name == "cancel":
-                return
+            return
+        select_view = CategorySelect()
 
-            chosen_category: PugCategory = PugCategory(
-                select_view.name, categories[select_view.name]
-            )
+        for name, _category in categories.items():
+            disabled: bool = False
+            color = nextcord.ButtonStyle.gray
+            button = CategoryButton(name=name, color=color, disabled=disabled)
+            select_view.add_item(button)
 
-            full_log = FullLog(
-                PartialLog(
-                    interaction.guild.id,
-                    chosen_category,
-                    players,
-                    round(time.time()),
-                ),
-                logstf_id,
-                log,
-            )
+        pug_embed = nextcord.Embed(
+            title="Generate Teams",
+            color=BOT_COLOR,
+            description="Select the category this log was played in.",
+        )
+        await interaction.edit_original_message(embed=pug_embed, view=select_view)
+        embed_status = await select_view.wait()
+        if embed_status or select_view.name == "cancel":
+            return
 
-            await logs_db.add_item(full_log.export())
-            await process_elo(full_log)
+        chosen_category: PugCategory = PugCategory(
+            select_view.name, categories[select_view.name]
+        )
+
+        full_log = FullLog(
+            PartialLog(
+                interaction.guild.id,
+                chosen_category,
+                players,
+                round(time.time()),
+            ),
+            logstf_id,
+            log,
+        )
+
+        if not await log_registry.claim(logstf_id):
             await interaction.edit_original_message(
-                content="Elo has been updated.", embed=None, view=None
+                content=f"Log #{logstf_id} already exists in the database.",
+                embed=None,
+                view=None,
             )
+            return
+        await logs_db.add_item(full_log.export(summary=True))
+        await log_archive.store(logstf_id, log)
+        await process_elo(full_log)
+        await interaction.edit_original_message(
+            content="Elo has been updated.", embed=None, view=None
+        )
 
     @commands.is_owner()
     @elo.subcommand(name="fullupdate")
-    async def full_elo_update(self, interaction: nextcord.Interaction):
-        """Update the elo of all players using the full backlog of logs."""
-        await interaction.send(content="Updating elo...")
-        all_logs = await logs_db.find_all_items()
-        for log in all_logs:
-            print(log)
-            players = [Player(data=player) for player in log["players"]]
-            full_log = FullLog(
-                PartialLog(
-                    log["guild"],
-                    PugCategory(log["category"]["name"], log["category"]),
-                    players,
-                    log["timestamp"],
+    async def full_elo_update(
+        self,
+        interaction: nextcord.Interaction,
+        dry_run: bool = nextcord.SlashOption(
+            name="dry_run",
+            description="Only show the changes, without saving them.",
+            required=False,
+            default=False,
+        ),
+    ):
+        """Recalculate the elo of all players from scratch using the full backlog of logs.
+
+        Logs recorded before summaries were stored have to be downloaded, which can take
+        hours, so the replay runs in the background and the result is posted in the
+        channel the command was used in.
+        """
+        if self.replay is not None and not self.replay.done():
+            await interaction.send(content="The elo replay is already running.")
+            return
+        channel = interaction.channel
+        if not isinstance(channel, nextcord.abc.Messageable):
+            return
+        self.replay = asyncio.create_task(self.run_replay(channel, dry_run))
+        await interaction.send(
+            content="Updating elo in the background, the result will be posted here."
+        )
+
+    @staticmethod
+    async def run_replay(channel: nextcord.abc.Messageable, dry_run: bool) -> None:
+        """Run the elo replay and post the biggest changes in a channel.
+
+        Args:
+            channel (nextcord.abc.Messageable): The channel to post the result in.
+            dry_run (bool): Only calculate the changes, without saving anything.
+        """
+        try:
+            result = await replay_elo(dry_run=dry_run)
+        except Exception:  # pylint: disable=broad-except
+            logging.exception("Elo replay failed")
+            await channel.send("The elo replay failed, see the bot logs.")
+            return
+
+        biggest_changes = sorted(
+            result.changes.items(),
+            key=lambda change: abs(change[1][1] - change[1][0]),
+            reverse=True,
+        )[:10]
+        changes_embed = nextcord.Embed(
+            title="Elo replay" + (" (dry run)" if dry_run else ""),
+            description=(
+                f"Replayed {result.logs} logs ({result.downloaded} downloaded, "
+                f"{result.skipped} skipped)\n"
+                f"Elo changed for {len(result.changes)} of {len(result.elos)} players"
+            ),
+            color=BOT_COLOR,
+        )
+        if biggest_changes:
+            changes_embed.add_field(
+                name="Biggest changes",
+                value="\n".join(
+                    f"`{steam}`: {old} -> {new}"
+                    for steam, (old, new) in biggest_changes
                 ),
-                log["log_id"],
-                await LogsAPI.get_single_log(log["log_id"]),
             )
-            await process_elo(full_log)
-            await asyncio.sleep(10)
+        await channel.send(embed=changes_embed)
+
+    @commands.is_owner()
+    @elo.subcommand(name="archive")
+    async def backfill_log_archive(self, interaction: nextcord.Interaction):
+        """Archive the raw data of every recorded log that isn't archived yet.
+
+        This can take hours, far longer than the interaction lasts, so it runs in the
+        background and the result is posted in the channel the command was used in.
+        """
+        if self.backfill is not None and not self.backfill.done():
+            await interaction.send(
+                content="The log archive backfill is already running."
+            )
+            return
+        channel = interaction.channel
+        if not isinstance(channel, nextcord.abc.Messageable):
+            return
+        self.backfill = asyncio.create_task(self.run_backfill(channel))
+        await interaction.send(
+            content="Archiving logs in the background, the result will be posted here."
+        )
+
+    @staticmethod
+    async def run_backfill(channel: nextcord.abc.Messageable) -> None:
+        """Run the log archive backfill and post the result in a channel.
+
+        Args:
+            channel (nextcord.abc.Messageable): The channel to post the result in.
+        """
+        try:
+            archived, existing, failed = await backfill_archive()
+        except Exception:  # pylint: disable=broad-except
+            logging.exception("Log archive backfill failed")
+            await channel.send("The log archive backfill failed, see the bot logs.")
+            return
+        await channel.send(
+            f"Archived {archived} logs ({existing} already archived, {failed} failed)."
+        )
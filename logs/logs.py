@@ -3,13 +3,13 @@ import nextcord
 from nextcord.ext import commands, application_checks
 from nextcord.enums import ChannelType
 
-from database import BotCollection
+from database import GuildConfigCollection
 from pug.pug import PugRunningCog
 from menus import BotMenu
 from menus.templates import send_boolean_menu, send_channel_prompt
 from constants import BOT_COLOR
 
-guild_configs = BotCollection("guilds", "config")
+guild_configs = GuildConfigCollection()
 
 
 class LogsCog(commands.Cog):
@@ -1,10 +1,182 @@
 """File storing the LogsAPI class, which is used to interact with the Logs.tf API."""
 import asyncio
+from dataclasses import dataclass
+import logging
+import random
+import time
 
 import aiohttp
 
 BASE_URL = "https://logs.tf/api/v1/"
 
+# Statuses worth retrying, anything else is returned to the caller as is
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Token bucket rate limiter, allows bursts up to capacity and refills at a fixed rate.
+
+    Attributes:
+        rate (float): Tokens added per second.
+        capacity (int): Maximum number of stored tokens.
+    """
+
+    def __init__(self, rate: float, capacity: int) -> None:
+        self.rate: float = rate
+        self.capacity: int = capacity
+        self.tokens: float = capacity
+        self.updated: float = time.monotonic()
+        self.lock: asyncio.Lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Wait until a token is available and take it."""
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+@dataclass
+class EndpointStats:
+    """Request counters for a single logs.tf endpoint."""
+
+    requests: int = 0
+    errors: int = 0
+    retries: int = 0
+    coalesced: int = 0
+    total_latency: float = 0
+    max_latency: float = 0
+
+    @property
+    def average_latency(self) -> float:
+        """The average latency of a request in seconds."""
+        return self.total_latency / self.requests if self.requests else 0
+
+
+class LogsClient:
+    """Long-lived logs.tf client shared by everything that talks to logs.tf.
+
+    Requests share one connection pool, are rate limited, retried with jittered
+    exponential backoff and identical in-flight requests are only sent once.
+
+    Attributes:
+        stats (dict[str, EndpointStats]): Request counters by endpoint.
+    """
+
+    def __init__(
+        self,
+        *,
+        rate: float = 2,
+        burst: int = 5,
+        max_retries: int = 4,
+        base_delay: float = 2,
+        max_delay: float = 60,
+        timeout: float = 30,
+    ) -> None:
+        self.bucket: TokenBucket = TokenBucket(rate, burst)
+        self.max_retries: int = max_retries
+        self.base_delay: float = base_delay
+        self.max_delay: float = max_delay
+        self.timeout: aiohttp.ClientTimeout = aiohttp.ClientTimeout(total=timeout)
+        self.session: aiohttp.ClientSession | None = None
+        self.in_flight: dict[str, asyncio.Task] = {}
+        self.stats: dict[str, EndpointStats] = {}
+
+    def get_session(self) -> aiohttp.ClientSession:
+        """Return the shared session, creating it on first use inside the running loop."""
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=10, keepalive_timeout=60),
+                timeout=self.timeout,
+            )
+        return self.session
+
+    async def close(self) -> None:
+        """Close the shared session."""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def backoff(self, attempt: int) -> float:
+        """Return the delay before a retry, exponential with full jitter."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+    async def get(self, endpoint: str, url: str) -> dict:
+        """Send a GET request, sharing the response with identical in-flight requests.
+
+        Cancelling a caller only cancels its wait, the request carries on for any other
+        caller waiting on it.
+
+        Args:
+            endpoint (str): The name of the endpoint, used for the request counters.
+            url (str): The full URL to request.
+
+        Returns:
+            dict: The JSON response.
+        """
+        stats = self.stats.setdefault(endpoint, EndpointStats())
+        task = self.in_flight.get(url)
+        if task is None:
+            # The request runs on its own, so a cancelled caller doesn't cancel it for the rest
+            task = asyncio.create_task(self.request(stats, url))
+            self.in_flight[url] = task
+            task.add_done_callback(lambda done: self.finished(url, done))
+        else:
+            stats.coalesced += 1
+        return await asyncio.shield(task)
+
+    def finished(self, url: str, task: asyncio.Task) -> None:
+        """Forget a finished request, so the next identical request is sent again."""
+        if self.in_flight.get(url) is task:
+            del self.in_flight[url]
+        # Mark the exception as retrieved in case every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    async def request(self, stats: EndpointStats, url: str) -> dict:
+        """Send a GET request with rate limiting and retries.
+
+        Raises:
+            aiohttp.ClientError: The request still failed after every retry.
+            asyncio.TimeoutError: The request still timed out after every retry.
+        """
+        attempt = 0
+        while True:
+            await self.bucket.acquire()
+            start = time.monotonic()
+            stats.requests += 1
+            try:
+                async with self.get_session().get(url) as resp:
+                    if resp.status in RETRY_STATUSES:
+                        resp.raise_for_status()
+                    data = await resp.json()
+                return data
+            except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+                stats.errors += 1
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.backoff(attempt)
+                logging.warning(
+                    "logs.tf request %s failed (%s), retrying in %.1fs", url, exc, delay
+                )
+                attempt += 1
+                stats.retries += 1
+                await asyncio.sleep(delay)
+            finally:
+                latency = time.monotonic() - start
+                stats.total_latency += latency
+                stats.max_latency = max(stats.max_latency, latency)
+
+
+logs_client = LogsClient()
+
 
 class LogsAPI:
     """Class used to interact with the Logs.tf API."""
@@ -22,17 +194,7 @@ class LogsAPI:
         Returns:
             dict: The log data.
         """
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"{BASE_URL}log/{str(log_id)}") as resp:
-                    log = await resp.json()
-                    return log
-        except aiohttp.ContentTypeError:
-            await asyncio.sleep(30)
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"{BASE_URL}log/{str(log_id)}") as resp:
-                    log = await resp.json()
-                    return log
+        return await logs_client.get("log", f"{BASE_URL}log/{str(log_id)}")
 
     @staticmethod
     async def search_for_log(
@@ -79,7 +241,9 @@ class LogsAPI:
         if offset is not None:
             query_url += f"offset={offset}&"
 
-        async with aiohttp.ClientSession() as session:
-            async with session.get(query_url) as resp:
-                log = await resp.json()
-                return log
+        return await logs_client.get("search", query_url)
+
+    @staticmethod
+    def get_stats() -> dict[str, EndpointStats]:
+        """Return the request counters of each logs.tf endpoint."""
+        return logs_client.stats
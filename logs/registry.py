@@ -0,0 +1,82 @@
+"""Registry of every logs.tf log ID the bot has already matched to a game."""
+import asyncio
+
+import pymongo.errors
+
+from database import BotCollection
+
+
+class LogRegistry:
+    """Tracks which log IDs are already queued or recorded, so a log is never used twice.
+
+    The IDs are stored in logs.ids with a unique index and kept in memory as a set,
+    so membership checks don't need a database round trip.
+    """
+
+    def __init__(self) -> None:
+        self.database: BotCollection = BotCollection("logs", "ids")
+        self.known: set[int] | None = None
+        self.lock: asyncio.Lock = asyncio.Lock()
+
+    async def load(self) -> set[int]:
+        """Load every registered log ID from the database, only done on first use.
+
+        Returns:
+            set[int]: The registered log IDs.
+        """
+        async with self.lock:
+            if self.known is None:
+                self.known = {
+                    item["log_id"]
+                    async for item in self.database.iter_items(
+                        projection={"log_id": 1, "_id": 0}, batch_size=1000
+                    )
+                }
+        return self.known
+
+    async def contains(self, log_id: int) -> bool:
+        """Check if a log ID has already been registered.
+
+        Args:
+            log_id (int): The logs.tf log ID.
+
+        Returns:
+            bool: True if the log is already queued or recorded.
+        """
+        return int(log_id) in await self.load()
+
+    async def claim(self, log_id: int) -> bool:
+        """Register a log ID, unless it has already been registered.
+
+        Args:
+            log_id (int): The logs.tf log ID.
+
+        Returns:
+            bool: True if the log was claimed, False if it was already registered.
+        """
+        log_id = int(log_id)
+        known = await self.load()
+        if log_id in known:
+            return False
+        known.add(log_id)
+        try:
+            await self.database.add_item({"log_id": log_id})
+        except pymongo.errors.DuplicateKeyError:
+            return False
+        except pymongo.errors.PyMongoError:
+            known.discard(log_id)
+            raise
+        return True
+
+    async def release(self, log_id: int) -> None:
+        """Unregister a claimed log ID, when the game it was claimed for couldn't be queued.
+
+        Args:
+            log_id (int): The logs.tf log ID.
+        """
+        log_id = int(log_id)
+        await self.database.delete_item({"log_id": log_id})
+        (await self.load()).discard(log_id)
+
+
+log_registry: LogRegistry = LogRegistry()
@@ -0,0 +1,153 @@
+"""Rebuilds every player's elo from the full history of recorded logs in one in-memory pass."""
+import asyncio
+from dataclasses import dataclass, field
+import logging
+
+import aiohttp
+from bson import Int64 as NumberLong
+
+from database import BotCollection
+from logs.archive import log_archive
+from logs.elo import Elo, EloLog, apply_elo_log, combine_similar_categories
+from logs.logstf_api import LogsAPI
+
+logs_db: BotCollection = BotCollection("logs", "list")
+elo_db: BotCollection = BotCollection("players", "elo")
+category_db: BotCollection = BotCollection("guilds", "categories")
+
+
+@dataclass
+class ReplayResult:
+    """The outcome of an elo replay.
+
+    Attributes:
+        logs (int): The number of logs replayed.
+        downloaded (int): The number of logs that had to be downloaded from logs.tf.
+        skipped (int): The number of logs that could not be replayed.
+        elos (dict[int, Elo]): The rebuilt elo of every player, by steam_64 ID.
+        changes (dict[int, tuple[int, int]]): The old and new global elo of every player whose elo changed.
+    """
+
+    logs: int = 0
+    downloaded: int = 0
+    skipped: int = 0
+    elos: dict[int, Elo] = field(default_factory=dict)
+    changes: dict[int, tuple[int, int]] = field(default_factory=dict)
+
+
+async def load_history(result: ReplayResult, dry_run: bool = False) -> list[EloLog]:
+    """Load the summary of every recorded log in the order they were played.
+
+    Logs recorded before summaries were stored are read from the archive, or downloaded
+    and archived if they are missing from it, and their summaries backfilled.
+
+    Args:
+        result (ReplayResult): The replay result to count downloaded and skipped logs in.
+        dry_run (bool): Don't archive downloaded logs or backfill their summaries.
+
+    Returns:
+        list[EloLog]: The summaries of every log, oldest first.
+    """
+    entries = [
+        entry
+        async for entry in logs_db.iter_items(
+            projection={"log_id": 1, "guild": 1, "category.name": 1, "summary": 1},
+            sort=[("timestamp", 1)],
+            batch_size=1000,
+        )
+    ]
+    history: list[EloLog] = []
+    for entry in entries:
+        if "summary" in entry:
+            history.append(
+                EloLog.from_summary(
+                    entry["guild"], entry["category"]["name"], entry["summary"]
+                )
+            )
+            continue
+        try:
+            log_data = await log_archive.load(entry["log_id"])
+        except LookupError:
+            try:
+                log_data = await LogsAPI.get_single_log(entry["log_id"])
+            except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+                logging.warning("Could not download log %s: %s", entry["log_id"], exc)
+                result.skipped += 1
+                continue
+            result.downloaded += 1
+            if not log_data.get("success", False):
+                result.skipped += 1
+                continue
+            if not dry_run:
+                await log_archive.store(entry["log_id"], log_data)
+        elo_log = EloLog.from_log_data(
+            entry["guild"], entry["category"]["name"], log_data
+        )
+        if not dry_run:
+            await logs_db.update_item(
+                {"_id": entry["_id"]}, {"$set": {"summary": elo_log.as_summary()}}
+            )
+        history.append(elo_log)
+    return history
+
+
+async def replay_elo(dry_run: bool = False) -> ReplayResult:
+    """Recalculate every player's elo from scratch using every recorded log.
+
+    Args:
+        dry_run (bool): Only calculate the changes, without saving anything.
+
+    Returns:
+        ReplayResult: The rebuilt elo and how it differs from the current elo.
+    """
+    result = ReplayResult()
+    history = await load_history(result, dry_run)
+
+    guild_categories: dict[int, dict[str, dict] | None] = {}
+    for elo_log in history:
+        if elo_log.guild not in guild_categories:
+            try:
+                categories = await category_db.find_item(
+                    {"_id": NumberLong(str(elo_log.guild))}
+                )
+                guild_categories[elo_log.guild] = categories["categories"]
+            except LookupError:
+                guild_categories[elo_log.guild] = None
+        categories = guild_categories[elo_log.guild]
+        category: str | None = None
+        if categories is not None:
+            category = combine_similar_categories(elo_log.category, categories)
+
+        for steam, _team in elo_log.players:
+            if steam not in result.elos:
+                result.elos[steam] = Elo(steam=steam)
+        try:
+            apply_elo_log(elo_log, result.elos, category)
+        except ZeroDivisionError:
+            # One of the teams had no players
+            result.skipped += 1
+            continue
+        result.logs += 1
+
+    async for current in elo_db.iter_items(
+        projection={"steam": 1, "elo": 1}, batch_size=1000
+    ):
+        elo = result.elos.get(int(current["steam"]))
+        if elo is not None and elo.elo != current["elo"]:
+            result.changes[elo.steam] = (current["elo"], elo.elo)
+
+    logging.info(
+        "Replayed %d logs (%d downloaded, %d skipped), %d players changed",
+        result.logs,
+        result.downloaded,
+        result.skipped,
+        len(result.changes),
+    )
+    if not dry_run:
+        await elo_db.bulk_update_items(
+            [
+                ({"steam": elo.steam}, {"$set": elo.as_dict()})
+                for elo in result.elos.values()
+            ]
+        )
+    return result
@@ -1,4 +1,7 @@
 """Implements the log searcher file, which takes the players from a team generation or moved back and searches for the log associated with the game that was played/being played."""
+import asyncio
+from dataclasses import dataclass, field
+import logging
 import time
 import traceback
 
@@ -8,17 +11,33 @@ from nextcord.ext import tasks
 from constants import DEV_SUCCESSFUL_LOGS, DEV_FAILED_LOGS, DEV_ERROR_LOGS
 from pug import PugCategory
 from logs import Player, LogData
+from logs.archive import log_archive
 from logs.logstf_api import LogsAPI
-from logs.elo import process_elo
-from database import BotCollection
+from logs.elo import EloLog, process_elo
+from logs.registry import log_registry
+from database import BotCollection, GuildConfigCollection
 from util import get_steam64
 
 queue_db = BotCollection("logs", "queue")
 searcher_db = BotCollection("logs", "searcher")
 logs_list_db = BotCollection("logs", "list")
-guild_settings_db = BotCollection("guilds", "config")
+guild_settings_db = GuildConfigCollection()
 guild_categories_db = BotCollection("guilds", "categories")
 
+# Score that ends a game for each map type, see check_map_score
+SCORE_LIMITS = {"cp_": 5, "koth_": 5, "pt_": 2}
+# Bounds in seconds between completion checks of a queued log
+MIN_QUEUE_DELAY = 60
+MAX_QUEUE_DELAY = 600
+# Pushed logs waiting to be matched before new pushes are turned away
+PUSHED_LOG_LIMIT = 100
+# Recent logs fetched per player each tick, enough to cover the 6 hour search window
+PLAYER_LOG_LIMIT = 10
+# Players searched per tick, leaves room in the logs.tf rate limit for downloading candidates
+PLAYER_BUDGET = 60
+# Seconds a game is searched for before it is given up on
+SEARCH_TIMEOUT = 21600
+
 
 class PartialLog:
     """A partial log, used to search for a log on logs.tf.
@@ -74,111 +93,340 @@ class FullLog(PartialLog):
         )
         self.log_id: int = log_id
         self.log: LogData = LogData(log_data)
+        self.log_data: dict = log_data
 
-    def export(self):
-        return {
+    def export(self, summary: bool = False):
+        """Export the full log to a dictionary.
+
+        Args:
+            summary (bool): Include the elo summary of the log, used to replay elo later.
+
+        Returns:
+            dict: The full log as a dictionary.
+        """
+        data = {
             "guild": self.guild,
             "timestamp": self.timestamp,
             "category": self.category.__dict__(),
             "players": [player.__dict__ for player in self.players],
             "log_id": self.log_id,
         }
+        if summary:
+            data["summary"] = EloLog.from_full_log(self).as_summary()
+        return data
+
+
+@dataclass
+class SearchStats:
+    """Counters for the candidate logs looked at by the searcher in one tick.
+
+    Attributes:
+        seen (set[int]): The IDs of the search results looked at, a log returned for
+            several players or games is only counted once.
+        fetched (int): Candidates that passed the metadata filters and were downloaded.
+        matched (int): Downloaded candidates that were matched to a game.
+    """
+
+    seen: set[int] = field(default_factory=set)
+    fetched: int = 0
+    matched: int = 0
+
+    @property
+    def candidates(self) -> int:
+        """The number of different search results looked at."""
+        return len(self.seen)
+
+    @property
+    def fetch_match_ratio(self) -> float:
+        """The number of logs downloaded for every log matched to a game."""
+        return self.fetched / self.matched if self.matched else float(self.fetched)
 
 
 class LogSearcher:
-    """The log searcher class, used to search for logs on logs.tf and store them in the database."""
+    """The log searcher class, used to search for logs on logs.tf and store them in the database.
+
+    Args:
+        bot (nextcord.Client): The bot, used to send log messages.
+        concurrency (int, optional): How many searcher games are searched at once. Defaults to 4.
+        tick_deadline (float, optional): Seconds a searcher tick may run, kept under the loop interval. Defaults to 50.
+    """
 
-    def __init__(self, bot: nextcord.Client) -> None:
+    def __init__(
+        self, bot: nextcord.Client, concurrency: int = 4, tick_deadline: float = 50
+    ) -> None:
         self.bot = bot
+        self.concurrency: int = concurrency
+        self.tick_deadline: float = tick_deadline
+        self.last_tick: float = 0
+        # Index of the oldest game the next tick starts from, if the last one ran out of budget
+        self.next_game: int = 0
+        self.stats: SearchStats = SearchStats()
+        self.pushed_logs: asyncio.Queue[int] = asyncio.Queue(maxsize=PUSHED_LOG_LIMIT)
 
     @tasks.loop(minutes=1)
     async def searcher(self):
         """Goes through the searcher queue and tries to find a corresponding logs.tf log for each game.
 
-        The list of players and the timestamp of the game is used to filter and find the log.
-        If a log is found, it is added to the queue.
-        If 6 hours has passed and no log has been found, the game is deleted from the searcher.
-        If a log ID matches a log ID already registered in the bot, the game is deleted from the searcher.
+        Games are searched oldest first, game by game, until PLAYER_BUDGET players have
+        been searched or the tick deadline passes. Each player is searched for at most
+        once per tick, and a game is matched as soon as its players have been searched,
+        while the next game's players are. When the budget doesn't cover every game, the
+        next tick carries on from the first game that wasn't searched, so every game gets
+        its turn. Work is done concurrently, up to the concurrency limit at a time, and
+        anything still running when the tick deadline passes is cancelled and retried.
         """
         print("Running searcher...")
-        searcher_logs = await searcher_db.find_all_items()
-        for searcher_log in searcher_logs:  # pylint: disable=too-many-nested-blocks
-            print(f"Searcher Log: {searcher_log['_id']}")
-
-            players = [Player(data=player) for player in searcher_log["players"]]
-            partial_log = PartialLog(
-                searcher_log["guild"],
-                PugCategory(searcher_log["category"]["name"], searcher_log["category"]),
-                players,
-                searcher_log["timestamp"],
+        self.stats = SearchStats()
+        start = time.monotonic()
+        deadline = start + self.tick_deadline
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run_bounded(coro, description: str) -> None:
+            async with semaphore:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    coro.close()
+                    return
+                try:
+                    await asyncio.wait_for(coro, remaining)
+                except asyncio.TimeoutError:
+                    logging.warning("Searcher %s hit the tick deadline", description)
+                except Exception:  # pylint: disable=broad-except
+                    # One broken game shouldn't stop the rest of the tick
+                    logging.exception("Error in searcher %s", description)
+
+        games: list[tuple[dict, PartialLog, set[int]]] = []
+        async for searcher_log in searcher_db.iter_items(
+            batch_size=100, sort=[("timestamp", 1)]
+        ):
+            game = await self.load_game(searcher_log)
+            if game is not None:
+                games.append(game)
+
+        first = self.next_game % len(games) if games else 0
+        player_logs: dict[int, list[dict]] = {}
+        searched: set[int] = set()
+        matches: list[asyncio.Task] = []
+        for searcher_log, partial_log, steam_ids in games[first:] + games[:first]:
+            new_players = steam_ids - searched
+            if searched and len(searched) + len(new_players) > PLAYER_BUDGET:
+                break
+            if time.monotonic() >= deadline:
+                break
+            searched |= new_players
+            await asyncio.gather(
+                *(
+                    run_bounded(
+                        self.search_player(steam_id, player_logs),
+                        f"player {steam_id}",
+                    )
+                    for steam_id in new_players
+                )
             )
-
-            steam_ids = []
-            for player in partial_log.players:
-                if player.steam_64 is not None:
-                    steam_ids.append(player.steam_64)
-            if len(steam_ids) == 0:
-                await LogSearcher._delete_searcher_game(searcher_log["_id"])
-                await self.log_failed_log(
-                    partial_log, "Invalid Searcher: No valid steam IDs"
+            matches.append(
+                asyncio.create_task(
+                    run_bounded(
+                        self.search_game(
+                            searcher_log, partial_log, steam_ids, player_logs
+                        ),
+                        f"game {searcher_log['_id']}",
+                    )
                 )
-                continue
+            )
+        await asyncio.gather(*matches)
+        # Start from the oldest game again once every game had its turn
+        self.next_game = 0 if len(matches) == len(games) else first + len(matches)
+
+        self.last_tick = time.monotonic() - start
+        logging.info(
+            "Searcher tick took %.2fs for %d of %d games (%d players searched)",
+            self.last_tick,
+            len(matches),
+            len(games),
+            len(searched),
+        )
+        logging.info(
+            "Searcher tick candidates: %d seen, %d fetched, %d matched (%.2f fetches per match)",
+            self.stats.candidates,
+            self.stats.fetched,
+            self.stats.matched,
+            self.stats.fetch_match_ratio,
+        )
 
-            query = await LogsAPI.search_for_log(players=steam_ids, limit=3)
-            try:
-                if query["success"] and query["results"] > 0:
-                    for log in query["logs"]:
-                        log_data = await LogsAPI.get_single_log(log["id"])
-                        if (
-                            log["date"] < partial_log.timestamp - 240
-                        ):  # Reduced by 4 minutes to account for machine differences
-                            continue
-                        if not log_data["success"]:
-                            continue
-                        if log["id"] in await list_all_logs():
-                            continue
-                        full_log = FullLog(partial_log, log["id"], log_data)
-                        await LogSearcher._add_queue_game(full_log)
-                        await LogSearcher._delete_searcher_game(searcher_log["_id"])
-                        break
-            except KeyError:
+    async def load_game(
+        self, searcher_log: dict
+    ) -> tuple[dict, PartialLog, set[int]] | None:
+        """Load a game from the searcher, removing it if it can never be found.
+
+        Games are given up on here rather than after a search, so a game that is never
+        searched because of the budget or the deadline still times out.
+
+        Args:
+            searcher_log (dict): The searcher document of the game.
+
+        Returns:
+            tuple[dict, PartialLog, set[int]] | None: The document, the game and the steam IDs of its players.
+        """
+        print(f"Searcher Log: {searcher_log['_id']}")
+
+        partial_log, steam_ids = LogSearcher._parse_game(searcher_log)
+        if len(steam_ids) == 0:
+            await LogSearcher._delete_searcher_game(searcher_log["_id"])
+            await self.log_failed_log(
+                partial_log, "Invalid Searcher: No valid steam IDs"
+            )
+            return None
+        if round(time.time()) - partial_log.timestamp > SEARCH_TIMEOUT:
+            await LogSearcher._delete_searcher_game(searcher_log["_id"])
+            await self.log_failed_log(
+                partial_log, "Searcher timed out (6 hours without finding a log)"
+            )
+            return None
+        return searcher_log, partial_log, steam_ids
+
+    @staticmethod
+    def _parse_game(searcher_log: dict) -> tuple[PartialLog, set[int]]:
+        """Create the game and the set of its players' steam IDs from a searcher document."""
+        players = [Player(data=player) for player in searcher_log["players"]]
+        partial_log = PartialLog(
+            searcher_log["guild"],
+            PugCategory(searcher_log["category"]["name"], searcher_log["category"]),
+            players,
+            searcher_log["timestamp"],
+        )
+
+        steam_ids: set[int] = set()
+        for player in partial_log.players:
+            if player.steam_64 is not None:
+                steam_ids.add(int(player.steam_64))
+        return partial_log, steam_ids
+
+    @staticmethod
+    async def search_player(steam_id: int, player_logs: dict[int, list[dict]]) -> None:
+        """Search logs.tf for the most recent logs of a player.
+
+        logs.tf only returns logs with every requested player in them, so players can't be
+        combined into a single query without missing logs.
+
+        Args:
+            steam_id (int): The steam_64 ID of the player.
+            player_logs (dict[int, list[dict]]): The search results of each player, filled in by this.
+        """
+        query = await LogsAPI.search_for_log(players=[steam_id], limit=PLAYER_LOG_LIMIT)
+        if query.get("success", False):
+            player_logs[steam_id] = query.get("logs", [])
+
+    async def search_game(
+        self,
+        searcher_log: dict,
+        partial_log: PartialLog,
+        steam_ids: set[int],
+        player_logs: dict[int, list[dict]],
+    ) -> None:
+        """Try to find the logs.tf log for a single game using this tick's player searches.
+
+        The list of players and the timestamp of the game is used to filter and find the log.
+        If a log is found, it is added to the queue.
+        If a log ID matches a log ID already registered in the bot, the log is skipped.
+
+        Args:
+            searcher_log (dict): The searcher document of the game.
+            partial_log (PartialLog): The game being searched for.
+            steam_ids (set[int]): The steam IDs of the players in the game.
+            player_logs (dict[int, list[dict]]): The search results of each player.
+        """
+        # Count how many of the game's players each recent log was returned for
+        overlap: dict[int, int] = {}
+        for steam_id in steam_ids:
+            for log in await self._filter_candidates(
+                player_logs.get(steam_id, []), partial_log, steam_ids
+            ):
+                overlap[log["id"]] = overlap.get(log["id"], 0) + 1
+
+        # Incase not all players are in the game, logs with at least half of the players
+        # are accepted. Each candidate is only fetched once, most likely match first.
+        candidates = [
+            log_id for log_id, count in overlap.items() if count >= len(steam_ids) / 2
+        ]
+        for log_id in sorted(candidates, key=overlap.__getitem__, reverse=True):
+            log_data = await self._fetch_candidate(log_id)
+            if not log_data["success"]:
+                continue
+            # Check if at least half the players are in the log
+            player_count = 0
+            for player_id in log_data["players"]:
+                if int(get_steam64(player_id)) in steam_ids:
+                    player_count += 1
+            if player_count < (len(steam_ids) / 2):
                 continue
 
-            # Incase not all players are in the game, check for logs with only some of the players
-            for steam_id in steam_ids:
-                query = await LogsAPI.search_for_log(players=[steam_id], limit=3)
-                try:
-                    if query["success"] and query["results"] > 0:
-                        for log in query["logs"]:
-                            log_data = await LogsAPI.get_single_log(log["id"])
-                            # Check if at least half the players are in the log
-                            player_count = 0
-                            for player_id in log_data["players"]:
-                                if str(get_steam64(player_id)) in steam_ids:
-                                    player_count += 1
-                            if player_count < (len(steam_ids) / 2):
-                                continue
-                            if log["date"] < partial_log.timestamp - 240:
-                                continue
-                            if not log_data["success"]:
-                                continue
-                            if log["id"] in await list_all_logs():
-                                continue
-
-                            # If passes...
-                            full_log = FullLog(partial_log, log["id"], log_data)
-                            await LogSearcher._add_queue_game(full_log)
-                            await LogSearcher._delete_searcher_game(searcher_log["_id"])
-                            break
-                except KeyError:
-                    continue
-
-            if round(time.time()) - partial_log.timestamp > 21600:
-                await LogSearcher._delete_searcher_game(searcher_log["_id"])
-                await self.log_failed_log(
-                    partial_log, "Searcher timed out (6 hours without finding a log)"
-                )
+            # If passes...
+            if await self._claim_log(
+                searcher_log["_id"], partial_log, log_id, log_data
+            ):
+                self.stats.matched += 1
+                return
+
+    async def _filter_candidates(
+        self, logs: list[dict], partial_log: PartialLog, steam_ids: set[int]
+    ) -> list[dict]:
+        """Filter logs.tf search results using only their metadata, before any log is downloaded.
+
+        Args:
+            logs (list[dict]): The logs.tf search results.
+            partial_log (PartialLog): The game being searched for.
+            steam_ids (set[int]): The steam IDs of the players in the game.
+
+        Returns:
+            list[dict]: The search results that could still be the game's log.
+        """
+        candidates = []
+        for log in logs:
+            self.stats.seen.add(log["id"])
+            # Reduced by 4 minutes to account for machine differences
+            if log["date"] < partial_log.timestamp - 240:
+                continue
+            # Not enough players in the log for half of the game to have played in it
+            if log.get("players", len(steam_ids)) < len(steam_ids) / 2:
                 continue
+            if await log_registry.contains(log["id"]):
+                continue
+            candidates.append(log)
+        return candidates
+
+    async def _fetch_candidate(self, log_id: int) -> dict:
+        """Download a candidate log, counting it towards the fetch/match ratio."""
+        self.stats.fetched += 1
+        return await LogsAPI.get_single_log(log_id)
+
+    @staticmethod
+    async def _claim_log(
+        database_id: str,
+        partial_log: PartialLog,
+        log_id: int,
+        log_data: dict,
+    ) -> bool:
+        """Move a game from the searcher to the queue with the log that was found for it.
+
+        Returns:
+            bool: False if the log was already taken by another game.
+        """
+        full_log = FullLog(partial_log, log_id, log_data)
+
+        async def move() -> bool:
+            if not await log_registry.claim(log_id):
+                return False
+            try:
+                await LogSearcher._add_queue_game(full_log)
+            except Exception:
+                # Otherwise the log stays claimed and can never be matched again
+                await log_registry.release(log_id)
+                raise
+            await LogSearcher._delete_searcher_game(database_id)
+            return True
+
+        # Never leave the game half moved if the tick deadline passes in between
+        return await asyncio.shield(move())
 
     @tasks.loop(minutes=1)
     async def queue(self) -> None:
@@ -190,37 +438,143 @@ class LogSearcher:
         - Game time has reached 30 minutes
         OR
         - Log data isn't changing anymore
+
+        Each log is only downloaded again once its next check is due, see estimate_next_check.
         """
         print("Running queue...")
-        queue_logs = await queue_db.find_all_items()
-        for queue_log in queue_logs:
-            players = [Player(data=player) for player in queue_log["players"]]
-            log_data: dict = await LogsAPI.get_single_log(queue_log["log_id"])
-            if not log_data["success"]:
-                # Log must have been deleted between searcher and queue. Remove.
-                await LogSearcher._delete_queue_game(queue_log["_id"])
-                continue
-            full_log = FullLog(
-                PartialLog(
-                    queue_log["guild"],
-                    PugCategory(queue_log["category"]["name"], queue_log["category"]),
-                    players,
-                    queue_log["timestamp"],
-                ),
-                queue_log["log_id"],
-                log_data,
-            )
+        now = round(time.time())
+        due_logs = queue_db.iter_items(
+            {
+                "$or": [
+                    {"next_check": {"$lte": now}},
+                    {"next_check": {"$exists": False}},
+                ]
+            },
+            batch_size=10,
+            sort=[("next_check", 1)],
+        )
+        async for queue_log in due_logs:
+            await self.check_queue_log(queue_log)
+
+    async def check_queue_log(self, queue_log: dict, log_data: dict | None = None):
+        """Check if a queued log has been completed, and log it if it has.
+
+        Args:
+            queue_log (dict): The queue document of the log.
+            log_data (dict | None): The log data if it was just downloaded, fetched if None.
+        """
+        players = [Player(data=player) for player in queue_log["players"]]
+        if log_data is None:
+            log_data = await LogsAPI.get_single_log(queue_log["log_id"])
+        if not log_data["success"]:
+            # Log must have been deleted between searcher and queue. Remove.
+            await LogSearcher._delete_queue_game(queue_log["_id"])
+            return
+        full_log = FullLog(
+            PartialLog(
+                queue_log["guild"],
+                PugCategory(queue_log["category"]["name"], queue_log["category"]),
+                players,
+                queue_log["timestamp"],
+            ),
+            queue_log["log_id"],
+            log_data,
+        )
 
-            if (round(time.time()) - full_log.timestamp) > 3600:
+        timed_out = (round(time.time()) - full_log.timestamp) > 3600
+        time_reached = await check_game_time(full_log)
+        score_reached = await check_map_score(full_log)
+        if timed_out or time_reached or score_reached:
+            # Only whoever removes the log from the queue logs it, the queue loop and
+            # pushed logs can check the same log at once
+            if await LogSearcher._delete_queue_game(queue_log["_id"]):
                 await self.log_completed_log(full_log)
-                await LogSearcher._delete_queue_game(queue_log["_id"])
+            return
+
+        # No upsert, the other check may have already removed the log from the queue
+        await queue_db.database.update_one(
+            {"_id": queue_log["_id"]},
+            {"$set": {"next_check": estimate_next_check(full_log)}},
+        )
+
+    def push_log(self, log_id: int) -> bool:
+        """Queue a log that was just uploaded to logs.tf to be matched straight away.
+
+        Args:
+            log_id (int): The logs.tf log ID.
+
+        Returns:
+            bool: False if too many pushed logs are already waiting.
+        """
+        try:
+            self.pushed_logs.put_nowait(int(log_id))
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    async def ingest(self) -> None:
+        """Process pushed logs as they come in, runs for as long as the bot does."""
+        while True:
+            log_id = await self.pushed_logs.get()
+            try:
+                await self.ingest_log(log_id)
+            except Exception:  # pylint: disable=broad-except
+                logging.exception("Error ingesting pushed log %d", log_id)
+            finally:
+                self.pushed_logs.task_done()
+
+    async def ingest_log(self, log_id: int) -> None:
+        """Match a pushed log to a pending game, then check it for completion.
+
+        Logs that don't match any game are left to the searcher, which still polls as a fallback.
+
+        Args:
+            log_id (int): The logs.tf log ID.
+        """
+        if await log_registry.contains(log_id):
+            # Already matched, a new upload of the log may have completed it
+            try:
+                queue_log = await queue_db.find_item({"log_id": log_id})
+            except LookupError:
+                return
+            await self.check_queue_log(queue_log)
+            return
+
+        log_data = await LogsAPI.get_single_log(log_id)
+        if not log_data.get("success", False):
+            return
+        log_players = {int(get_steam64(player)) for player in log_data["players"]}
+        # Player steam IDs are stored as both ints and strings
+        search_ids = [*log_players, *(str(steam_id) for steam_id in log_players)]
+
+        best_match: tuple[dict, PartialLog] | None = None
+        best_overlap = 0
+        async for searcher_log in searcher_db.iter_items(
+            {"players.steam_64": {"$in": search_ids}}
+        ):
+            partial_log, steam_ids = LogSearcher._parse_game(searcher_log)
+            # Reduced by 4 minutes to account for machine differences
+            if log_data["info"]["date"] < partial_log.timestamp - 240:
+                continue
+            overlap = len(steam_ids & log_players)
+            if overlap < len(steam_ids) / 2 or overlap <= best_overlap:
                 continue
+            best_match = (searcher_log, partial_log)
+            best_overlap = overlap
+        if best_match is None:
+            return
 
-            time_reached = await check_game_time(full_log)
-            score_reached = await check_map_score(full_log)
-            if time_reached or score_reached:
-                await self.log_completed_log(full_log)
-                await LogSearcher._delete_queue_game(queue_log["_id"])
+        searcher_log, partial_log = best_match
+        if not await self._claim_log(
+            searcher_log["_id"], partial_log, log_id, log_data
+        ):
+            return
+        logging.info("Pushed log %d matched game %s", log_id, searcher_log["_id"])
+        try:
+            queue_log = await queue_db.find_item({"log_id": log_id})
+        except LookupError:
+            return
+        await self.check_queue_log(queue_log, log_data)
 
     @searcher.error
     @queue.error
@@ -301,7 +655,8 @@ class LogSearcher:
                 content=f"{category_string}{log_url}\nGuild: {log.guild} | Failed to process elo changes due to {error}"
             )
             return
-        await logs_list_db.add_item(log.export())
+        await logs_list_db.add_item(log.export(summary=True))
+        await log_archive.store(log.log_id, log.log_data)
 
     @staticmethod
     async def add_searcher_game(
@@ -331,11 +686,11 @@ class LogSearcher:
 
     @staticmethod
     async def _add_queue_game(log: FullLog) -> None:
-        await queue_db.add_item(log.export())
+        await queue_db.add_item(log.export() | {"next_check": estimate_next_check(log)})
 
     @staticmethod
-    async def _delete_queue_game(database_id: str) -> None:
-        await queue_db.delete_item({"_id": database_id})
+    async def _delete_queue_game(database_id: str) -> bool:
+        return await queue_db.delete_item({"_id": database_id})
 
 
 async def check_map_score(log: FullLog) -> bool:
@@ -360,6 +715,37 @@ async def check_map_score(log: FullLog) -> bool:
     return False
 
 
+def estimate_next_check(log: FullLog) -> int:
+    """Estimates when a queued log should next be checked for completion.
+
+    The time left is estimated from the game time limit and, for maps with a score limit,
+    the average round length so far. Logs are checked again about halfway through the
+    time left, so logs early in a match are downloaded rarely and logs close to
+    completion about every minute.
+
+    Args:
+        log (FullLog): The log to estimate for.
+
+    Returns:
+        int: The timestamp of the next check.
+    """
+    map_name: str = log.log.map_name
+    time_limit = 2400 if map_name.startswith("pl_") else 1680
+    remaining: float = time_limit - log.log.length
+    for prefix, score_limit in SCORE_LIMITS.items():
+        if map_name.startswith(prefix):
+            rounds_played = log.log.red_team.score + log.log.blue_team.score
+            if rounds_played > 0:
+                rounds_left = score_limit - max(
+                    log.log.red_team.score, log.log.blue_team.score
+                )
+                remaining = min(remaining, rounds_left * log.log.length / rounds_played)
+            break
+    delay = min(max(remaining / 2, MIN_QUEUE_DELAY), MAX_QUEUE_DELAY)
+    # Logs are always completed an hour after the game started
+    return min(round(time.time() + delay), log.timestamp + 3600)
+
+
 async def check_game_time(log: FullLog) -> bool:
     """Checks to see if the game time has reached 30 minutes, meaning that a log is complete.
 
@@ -377,12 +763,3 @@ async def check_game_time(log: FullLog) -> bool:
         if log.log.length > 1680:
             return True
     return False
-
-
-async def list_all_logs():
-    """List all completed logs."""
-    logs = await logs_list_db.find_all_items()
-    log_ids = [log["log_id"] for log in logs]
-    for log in await queue_db.find_all_items():
-        log_ids.append(log["log_id"])
-    return log_ids
@@ -138,6 +138,32 @@ class TeamGenMenu(BotMenu):
         self.reg_settings = reg_settings
         self.elo_enabled = elo_enabled
         self.role_enabled = role_enabled
+        # Ranked teams for each generation mode, for the current voice channel members
+        self.team_pools: dict[str, list[Teams]] = {}
+        self.pool_positions: dict[str, int] = {}
+        self.lobby: frozenset[int] = frozenset()
+
+    def cache_splits(self, mode: str, lobby: frozenset[int], splits: list[Teams]):
+        """Store the ranked teams generated for a mode, dropping pools of an older lobby."""
+        if lobby != self.lobby:
+            self.team_pools.clear()
+            self.pool_positions.clear()
+            self.lobby = lobby
+        self.team_pools[mode] = splits
+        self.pool_positions[mode] = 0
+
+    def next_split(self, mode: str, lobby: frozenset[int]) -> Teams | None:
+        """Returns the next cached teams for a mode.
+
+        None if the lobby has changed or every cached split has been shown.
+        """
+        if lobby != self.lobby or mode not in self.team_pools:
+            return None
+        position = self.pool_positions[mode]
+        if position >= len(self.team_pools[mode]):
+            return None
+        self.pool_positions[mode] = position + 1
+        return self.team_pools[mode][position]
 
     async def add_gen_buttons(self) -> None:
         """Adds move and reroll buttons for the different modes depending on the servers settings."""
@@ -0,0 +1,145 @@
+"""Versioned schema migrations for the bot's MongoDB collections, run on startup."""
+import logging
+from typing import Awaitable, Callable
+
+import pymongo.errors
+from bson import Int64 as NumberLong
+
+from database import BotCollection, ensure_indexes, guild_config_cache
+from logs.archive import log_archive
+
+migrations_db: BotCollection = BotCollection("bot", "migrations")
+player_db: BotCollection = BotCollection("players", "data")
+elo_db: BotCollection = BotCollection("players", "elo")
+logs_list_db: BotCollection = BotCollection("logs", "list")
+logs_queue_db: BotCollection = BotCollection("logs", "queue")
+log_ids_db: BotCollection = BotCollection("logs", "ids")
+log_archive_files_db: BotCollection = BotCollection("logs", "raw.files")
+guild_config_db: BotCollection = BotCollection("guilds", "config")
+manual_queue_db: BotCollection = BotCollection("guilds", "manual")
+
+
+async def normalize_player_ids() -> None:
+    """Store steam and discord IDs in players.data as strings, which is what every lookup uses."""
+    for key in ("steam", "discord"):
+        await player_db.database.update_many(
+            {key: {"$type": ["int", "long"]}},
+            [{"$set": {key: {"$toString": f"${key}"}}}],
+        )
+
+
+async def normalize_elo_ids() -> None:
+    """Store steam IDs in players.elo as longs, which is what every lookup uses."""
+    async for elo in elo_db.database.find({"steam": {"$type": "string"}}):
+        steam = NumberLong(elo["steam"])
+        if await elo_db.database.find_one({"steam": steam}) is None:
+            await elo_db.database.update_one(
+                {"_id": elo["_id"]}, {"$set": {"steam": steam}}
+            )
+        else:
+            # Elo has always been read using the long ID, so this copy was never used
+            await elo_db.database.delete_one({"_id": elo["_id"]})
+
+
+async def register_log_ids() -> None:
+    """Fill logs.ids with every log already queued or recorded.
+
+    Logs already in logs.ids, from an earlier partial run or claimed since, are left as is.
+    """
+    log_ids: set[int] = set()
+    for collection in (logs_list_db, logs_queue_db):
+        async for log in collection.iter_items(
+            projection={"log_id": 1, "_id": 0}, batch_size=1000
+        ):
+            log_ids.add(int(log["log_id"]))
+    await log_ids_db.bulk_update_items(
+        [
+            ({"log_id": log_id}, {"$setOnInsert": {"log_id": log_id}})
+            for log_id in log_ids
+        ]
+    )
+
+
+async def move_manual_queues() -> None:
+    """Move manual pug queues out of guilds.config into guilds.manual."""
+    async for guild in guild_config_db.iter_items(
+        {"manual.players": {"$exists": True}}, {"guild": 1, "manual.players": 1}
+    ):
+        await manual_queue_db.update_item(
+            {"guild": guild["guild"]},
+            {
+                "$set": {
+                    "players": [
+                        {"discord": discord, "expires": expires}
+                        for discord, expires in guild["manual"]["players"]
+                    ]
+                }
+            },
+        )
+    await guild_config_db.database.update_many(
+        {"manual.players": {"$exists": True}}, {"$unset": {"manual.players": ""}}
+    )
+    # Written behind the bot's back, so drop anything the config cache holds
+    guild_config_cache.clear()
+
+
+async def drop_archive_hash_index() -> None:
+    """Drop the index on archived log hashes, archived logs are only looked up by log ID."""
+    if "sha256" in await log_archive_files_db.database.index_information():
+        await log_archive_files_db.database.drop_index("sha256")
+
+
+async def remove_duplicate_archived_logs() -> None:
+    """Keep one archived copy of each log, so the index on archived file names can be unique."""
+    async for duplicate in log_archive_files_db.database.aggregate(
+        [
+            {"$group": {"_id": "$filename", "files": {"$push": "$_id"}}},
+            {"$match": {"files.1": {"$exists": True}}},
+        ]
+    ):
+        for file_id in duplicate["files"][1:]:
+            await log_archive.get_bucket().delete(file_id)
+
+
+# Migrations are applied in order and each one only ever runs once.
+# Never change or reorder a migration once it has been released, add a new one instead.
+MIGRATIONS: list[tuple[int, str, Callable[[], Awaitable[None]]]] = [
+    (1, "Store players.data steam/discord IDs as strings", normalize_player_ids),
+    (2, "Store players.elo steam IDs as longs", normalize_elo_ids),
+    (3, "Register existing log IDs in logs.ids", register_log_ids),
+    (4, "Move manual pug queues to guilds.manual", move_manual_queues),
+    (5, "Drop the unused archived log hash index", drop_archive_hash_index),
+    (6, "Remove duplicate archived logs", remove_duplicate_archived_logs),
+]
+
+
+async def get_schema_version() -> int:
+    """Returns the version of the last migration applied to the database."""
+    try:
+        state = await migrations_db.find_item({"_id": "schema"})
+    except LookupError:
+        return 0
+    return state["version"]
+
+
+async def run_migrations() -> None:
+    """Apply every migration newer than the current schema version."""
+    version = await get_schema_version()
+    for number, description, migration in MIGRATIONS:
+        if number <= version:
+            continue
+        logging.info("Running migration %d: %s", number, description)
+        try:
+            await migration()
+        except pymongo.errors.PyMongoError as error:
+            logging.error("Migration %d failed, stopping: %s", number, error)
+            return
+        await migrations_db.update_item(
+            {"_id": "schema"}, {"$set": {"version": number}}
+        )
+
+
+async def bootstrap_database() -> None:
+    """Bring the database up to date, migrations first so the indexes see clean data."""
+    await run_migrations()
+    await ensure_indexes()
@@ -4,7 +4,13 @@ import time
 
 import nextcord
 
-from database import get_player_from_discord, get_player_from_steam, BotCollection
+from database import (
+    get_player_from_discord,
+    get_player_from_steam,
+    get_players_from_discord,
+    BotCollection,
+    GuildConfigCollection,
+)
 
 default_category = {
     "name": "",
@@ -18,7 +24,7 @@ default_category = {
     },
 }
 
-config_db = BotCollection("guilds", "config")
+config_db = GuildConfigCollection()
 category_db = BotCollection("guilds", "categories")
 
 
@@ -45,7 +51,6 @@ class PugPlayer:
         discord : Union[int, None], optional
             Discord ID, by default None
         """
-        self = cls()
         try:
             if steam is not None:
                 player_data = await get_player_from_steam(steam)
@@ -53,8 +58,51 @@ class PugPlayer:
                 player_data = await get_player_from_discord(discord)
             else:
                 raise KeyError
-            registered = True
         except LookupError:
+            player_data = None
+        return cls.from_data(player_data, steam=steam, discord=discord)
+
+    @classmethod
+    async def create_many(cls, discord_ids: List[int]) -> Dict[int, "PugPlayer"]:
+        """Create player objects for many discord users with a single database query
+
+        Parameters
+        ----------
+        discord_ids : List[int]
+            Discord IDs of the players
+
+        Returns
+        -------
+        Dict[int, PugPlayer]
+            The player object of each discord ID
+        """
+        registrations = await get_players_from_discord(discord_ids)
+        return {
+            discord: cls.from_data(registrations.get(discord), discord=discord)
+            for discord in discord_ids
+        }
+
+    @classmethod
+    def from_data(
+        cls,
+        player_data: Union[dict, None],
+        steam: Union[int, None] = None,
+        discord: Union[int, None] = None,
+    ):
+        """Create a player object from their players.data document
+
+        Parameters
+        ----------
+        player_data : Union[dict, None]
+            The player's document, None if they are not registered
+        steam : Union[int, None], optional
+            Steam ID used for unregistered players, by default None
+        discord : Union[int, None], optional
+            Discord ID used for unregistered players, by default None
+        """
+        self = cls()
+        registered = player_data is not None
+        if player_data is None:
             player_data = {
                 "steam": steam,
                 "discord": discord,
@@ -63,7 +111,6 @@ class PugPlayer:
                     "hl": {"highest": -1, "current": -1},
                 },
             }
-            registered = False
         if "divison" not in player_data:
             player_data["divison"] = {
                 "sixes": {"highest": -1, "current": -1},
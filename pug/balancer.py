@@ -0,0 +1,205 @@
+"""Team balancing, picks a team of a given size whose total value is as close as possible to a goal."""
+from bisect import bisect_left
+import heapq
+from typing import Callable, Dict, List, Tuple
+
+# Largest pool solved exactly, meet in the middle looks at 2^(n/2) subsets of each half
+EXACT_LIMIT = 24
+
+Solver = Callable[[List[int], int, int, int], List[List[int]]]
+
+
+def _subset_sums(values: List[int], offset: int) -> Dict[int, List[Tuple[int, Tuple]]]:
+    """Every subset of values as (total, indices), grouped by subset size.
+
+    Args:
+        values (List[int]): The values to build subsets of.
+        offset (int): Added to every index, for the second half of the pool.
+
+    Returns:
+        Dict[int, List[Tuple[int, Tuple]]]: The subsets of each size.
+    """
+    subsets: List[Tuple[int, Tuple]] = [(0, ())]
+    for i, value in enumerate(values):
+        subsets += [
+            (total + value, indices + (i + offset,)) for total, indices in subsets
+        ]
+    by_size: Dict[int, List[Tuple[int, Tuple]]] = {}
+    for total, indices in subsets:
+        by_size.setdefault(len(indices), []).append((total, indices))
+    return by_size
+
+
+def _split_key(team: List[int], pool_size: int, size: int) -> Tuple:
+    """Key identifying a split, a team and the rest of a full lobby are the same split."""
+    key = tuple(sorted(team))
+    if pool_size == size * 2:
+        rest = tuple(i for i in range(pool_size) if i not in key)
+        key = min(key, rest)
+    return key
+
+
+def _distinct(
+    ranked: List[Tuple[int, List[int]]], pool_size: int, size: int, count: int
+) -> List[List[int]]:
+    """The first count distinct splits of a list of (difference, team), best first."""
+    teams: List[List[int]] = []
+    seen = set()
+    for _diff, team in sorted(ranked, key=lambda ranked_team: ranked_team[0]):
+        key = _split_key(team, pool_size, size)
+        if key in seen:
+            continue
+        seen.add(key)
+        teams.append(team)
+        if len(teams) == count:
+            break
+    return teams
+
+
+def exact_splits(
+    values: List[int], size: int, goal: int, count: int
+) -> List[List[int]]:
+    """Find the best teams exactly, using meet in the middle.
+
+    The pool is cut in half and every subset sum of each half is listed. For each subset
+    of the first half, the closest subsets of the second half are binary searched.
+
+    Args:
+        values (List[int]): The value of each player.
+        size (int): The team size.
+        goal (int): The target total value of the team.
+        count (int): The number of distinct teams to return.
+
+    Returns:
+        List[List[int]]: The indices of the players in each team, best first.
+    """
+    half = len(values) // 2
+    left = _subset_sums(values[:half], 0)
+    right = _subset_sums(values[half:], half)
+    for subsets in right.values():
+        subsets.sort(key=lambda subset: subset[0])
+
+    # A split can show up twice, as the team or the rest of the lobby
+    window = count * 2
+    candidates: List[Tuple[int, Tuple]] = []
+    for left_size, left_subsets in left.items():
+        right_subsets = right.get(size - left_size)
+        if right_subsets is None:
+            continue
+        right_totals = [total for total, _indices in right_subsets]
+        for left_total, left_indices in left_subsets:
+            target = goal - left_total
+            position = bisect_left(right_totals, target)
+            for j in range(
+                max(position - window, 0), min(position + window, len(right_subsets))
+            ):
+                candidates.append(
+                    (abs(target - right_totals[j]), left_indices + right_subsets[j][1])
+                )
+    ranked = heapq.nsmallest(window, candidates, key=lambda candidate: candidate[0])
+    return _distinct(
+        [(diff, list(indices)) for diff, indices in ranked], len(values), size, count
+    )
+
+
+def heuristic_splits(
+    values: List[int], size: int, goal: int, count: int
+) -> List[List[int]]:
+    """Find good teams quickly for pools too big to solve exactly.
+
+    A greedy team is built from the highest values down, then improved by swapping single
+    players in and out of the team until no swap gets closer to the goal. Alternatives
+    are the best single swaps away from that team.
+
+    Args:
+        values (List[int]): The value of each player.
+        size (int): The team size.
+        goal (int): The target total value of the team.
+        count (int): The number of distinct teams to return.
+
+    Returns:
+        List[List[int]]: The indices of the players in each team, best first.
+    """
+    team: List[int] = []
+    bench: List[int] = []
+    total = 0
+    for i in sorted(range(len(values)), key=lambda i: values[i], reverse=True):
+        slots_left = size - len(team)
+        players_left = len(values) - len(team) - len(bench)
+        if slots_left > 0 and (total + values[i] <= goal or slots_left >= players_left):
+            team.append(i)
+            total += values[i]
+        else:
+            bench.append(i)
+
+    improved = True
+    while improved and total != goal:
+        improved = False
+        best_diff = abs(goal - total)
+        best_swap: Tuple[int, int] | None = None
+        for team_pos, team_player in enumerate(team):
+            for bench_pos, bench_player in enumerate(bench):
+                diff = abs(goal - total + values[team_player] - values[bench_player])
+                if diff < best_diff:
+                    best_diff = diff
+                    best_swap = (team_pos, bench_pos)
+        if best_swap is not None:
+            team_pos, bench_pos = best_swap
+            total += values[bench[bench_pos]] - values[team[team_pos]]
+            team[team_pos], bench[bench_pos] = bench[bench_pos], team[team_pos]
+            improved = True
+
+    ranked: List[Tuple[int, List[int]]] = [(abs(goal - total), team)]
+    if count > 1:
+        for team_pos, team_player in enumerate(team):
+            for bench_player in bench:
+                swapped = team.copy()
+                swapped[team_pos] = bench_player
+                diff = abs(goal - total + values[team_player] - values[bench_player])
+                ranked.append((diff, swapped))
+    return _distinct(ranked, len(values), size, count)
+
+
+def top_splits(
+    values: List[int],
+    size: int,
+    goal: int,
+    count: int = 1,
+    solver: Solver | None = None,
+) -> List[List[int]]:
+    """Pick the teams of players whose total value is closest to the goal.
+
+    Args:
+        values (List[int]): The value of each player.
+        size (int): The team size.
+        goal (int): The target total value of the team.
+        count (int): The number of distinct teams to return, fewer if there aren't enough.
+        solver (Solver | None): The solver to use, picked by pool size if None.
+
+    Returns:
+        List[List[int]]: The indices of the players in each team, best first.
+    """
+    if size >= len(values):
+        return [list(range(len(values)))]
+    if size <= 0:
+        return [[]]
+    if solver is None:
+        solver = exact_splits if len(values) <= EXACT_LIMIT else heuristic_splits
+    return solver(values, size, goal, count)
+
+
+def split(
+    values: List[int], size: int, goal: int, solver: Solver | None = None
+) -> List[int]:
+    """Pick a team of players whose total value is as close as possible to the goal.
+
+    Args:
+        values (List[int]): The value of each player.
+        size (int): The team size.
+        goal (int): The target total value of the team.
+        solver (Solver | None): The solver to use, picked by pool size if None.
+
+    Returns:
+        List[int]: The indices of the players in the team.
+    """
+    return top_splits(values, size, goal, 1, solver)[0]
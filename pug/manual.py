@@ -1,37 +1,35 @@
 """Cog storing commands to manually add up to pugs."""
 
 import asyncio
+import heapq
 import logging
 import time
-import traceback
 
 import nextcord
 import pymongo.errors
-from nextcord.ext import commands, tasks
+from nextcord.ext import commands
 
 from constants import BOT_COLOR
-from database import BotCollection
+from database import BotCollection, GuildConfigCollection, guild_config_cache
 from menus import BotMenu
 from menus.callbacks import action_callback, value_callback
 from menus.templates import send_channel_prompt
+from pug.manual_queue import QueueEntries, manual_queue
+from pug.presence import voice_presence
 from pug.pug import PugRunningCog
 from util import is_runner
 
-guild_configs: BotCollection = BotCollection("guilds", "config")
+guild_configs: BotCollection = GuildConfigCollection()
 
 
 async def update_guild_settings(guild: int, entry: str, settings: dict | int):
-    """Update the guild settings in the database.
+    """Update the guild settings in the database, if the guild has been setup.
 
     Args:
         guild (int): The guild ID to update.
         settings (dict): The settings to update.
     """
-    try:
-        _guild_settings = await guild_configs.find_item({"guild": guild})
-    except LookupError:
-        return
-    await guild_configs.update_item({"guild": guild}, {"$set": {entry: settings}})
+    await guild_config_cache.update(guild, {"$set": {entry: settings}}, upsert=False)
 
 
 def manual_check():
@@ -69,118 +67,238 @@ def manual_check():
     return nextcord.ext.application_checks.check(predicate)
 
 
-class ManualPugCog(commands.Cog):
-    """Cog storing commands to manually add up to pugs."""
+# Seconds to wait for more queue changes before rendering the topic
+TOPIC_DEBOUNCE: float = 5
+# Discord allows 2 topic edits per channel every 10 minutes
+TOPIC_EDIT_INTERVAL: float = 300
+
+
+class TopicUpdater:
+    """Keeps the topic of each manual pug channel in sync with its queue.
+
+    Queue changes request an update for their guild. Changes within the debounce window,
+    or while the channel is still rate limited, are coalesced into a single edit, and the
+    edit is skipped if the rendered topic is already the channel's topic.
+    """
 
     def __init__(self, bot: commands.Bot):
         self.bot: commands.Bot = bot
+        self.pending: dict[int, asyncio.Task] = {}
+        self.running: set[asyncio.Task] = set()
+        self.last_edit: dict[int, float] = {}
 
-    @tasks.loop(minutes=1)
-    async def status_check(self):
-        """Check the status of all players added up."""
-        try:
-            guilds = await guild_configs.find_all_items()
-        except pymongo.errors.PyMongoError as error:
-            logging.warning("Error fetching guilds in status check loop: %s", error)
+    def request(self, guild: int) -> None:
+        """Schedule a topic update for a guild, unless one is already scheduled.
+
+        Args:
+            guild (int): The guild ID to update.
+        """
+        if guild in self.pending:
             return
+        task = asyncio.create_task(self.update(guild))
+        self.pending[guild] = task
+        # Keep a reference until the edit is done, pending is cleared before editing
+        self.running.add(task)
+        task.add_done_callback(self.running.discard)
+
+    async def update(self, guild: int) -> None:
+        """Wait out the debounce window and rate limit, then update the guild's topic.
 
-        for guild in guilds:
-            if "manual" not in guild:
-                continue
-            if not guild["manual"]["enabled"]:
-                continue
-            if len(guild["manual"]["players"]) == 0:
-                continue
-            current_time = round(time.time())
-            for player in guild["manual"]["players"]:
-                if current_time > player[1]:
-                    await guild_configs.update_item(
-                        {"guild": guild["guild"]},
-                        {"$pull": {"manual.players": player}},
-                    )
-
-    @tasks.loop()
-    async def update_channel_status(self):
-        """Update the channel status for the guild."""
-        print("Updating channel statuses")
-        guilds = await guild_configs.find_all_items()
-        for guild in guilds:
-            if "manual" not in guild:
-                continue
-            if not guild["manual"]["enabled"]:
-                continue
-
-            if "roles" in guild:
-                guild_roles = guild["roles"]
-                sorted_roles = sorted(
-                    guild_roles.items(), key=lambda x: x[1]["value"], reverse=True
-                )
+        Args:
+            guild (int): The guild ID to update.
+        """
+        delay = max(
+            TOPIC_DEBOUNCE,
+            self.last_edit.get(guild, 0) + TOPIC_EDIT_INTERVAL - time.monotonic(),
+        )
+        await asyncio.sleep(delay)
+        # Changes from here on need another edit, so let them schedule one
+        self.pending.pop(guild, None)
+        try:
+            await self.edit_topic(guild)
+        except Exception:  # pylint: disable=broad-except
+            logging.exception("Error updating manual pug topic for guild %s", guild)
+
+    async def render(self, guild: int) -> tuple[nextcord.TextChannel, str] | None:
+        """Render the topic of a guild's manual pug channel.
+
+        Args:
+            guild (int): The guild ID to render.
+
+        Returns:
+            tuple[nextcord.TextChannel, str] | None: The channel and its topic, None if
+                the guild doesn't have a manual pug channel the bot can edit.
+        """
+        try:
+            guild_settings = await guild_configs.find_item({"guild": guild})
+        except LookupError:
+            return None
+        if "manual" not in guild_settings or not guild_settings["manual"]["enabled"]:
+            return None
+        players = await manual_queue.get(guild)
+        max_players: int = guild_settings["manual"]["num_players"]
+        # Leave the topic alone if there are more players than the queue allows
+        if len(players) > max_players:
+            return None
+
+        guild_obj: nextcord.Guild | None = self.bot.get_guild(int(guild))
+        if guild_obj is None:
+            return None
+        channel = guild_obj.get_channel(guild_settings["manual"]["channel"])
+        if not isinstance(channel, nextcord.TextChannel):
+            return None
+        if not channel.permissions_for(guild_obj.me).manage_channels:
+            logging.warning(
+                "Missing permissions to edit channel topic in guild: %s", guild
+            )
+            return None
+
+        role_info = await voice_presence.get_roles(
+            guild_obj, [player[0] for player in players]
+        )
+        player_strings: list[str] = []
+        for player in players:
+            player_icon = role_info[player[0]][1]
+            if player_icon is None:
+                player_strings.append(f"<@{player[0]}>")
             else:
-                sorted_roles = []
+                player_strings.append(f"{player_icon} <@{player[0]}>")
+        topic = f"Add up using /add! | Pug queue: {len(players)}/{max_players} | {', '.join(player_strings)}"
+        return channel, topic
 
-            # Check if there are already enough players added up
-            if len(guild["manual"]["players"]) > guild["manual"]["num_players"]:
-                return
+    async def edit_topic(self, guild: int) -> None:
+        """Render a guild's topic and edit the channel if the topic has changed.
 
-            current_players = len(guild["manual"]["players"])
-            max_players: int = guild["manual"]["num_players"]
-            guild_obj: nextcord.Guild = self.bot.get_guild(int(guild["guild"]))
-            if guild_obj is None:
-                continue
-            channel: nextcord.TextChannel = guild_obj.get_channel(
-                guild["manual"]["channel"]
+        Args:
+            guild (int): The guild ID to update.
+        """
+        rendered = await self.render(guild)
+        if rendered is None:
+            return
+        channel, topic = rendered
+        if channel.topic == topic:
+            return
+        self.last_edit[guild] = time.monotonic()
+        try:
+            await channel.edit(topic=topic)
+        except nextcord.errors.Forbidden:
+            print("Missing permissions to edit channel topic.\nGuild: ", guild)
+        except nextcord.HTTPException:
+            print(
+                "HTTP Exception when editing channel topic. Likely inappropriate username.\nGuild: ",
+                guild,
             )
 
-            if channel is None:
-                continue
-            permissions = channel.permissions_for(guild_obj.me)
-            if not permissions.manage_channels:
-                logging.warning(
-                    "Missing permissions to edit channel topic in guild: %s", guild
-                )
-                continue
-
-            player_string: str = ""
-            for player in guild["manual"]["players"]:
-                player_id = player[0]
-                player_icon: str | None = None
-                # Check for first role player has
-                member = await guild_obj.fetch_member(player_id)
-                if sorted_roles != []:
-                    for role in sorted_roles:
-                        if int(role[0]) in [role.id for role in member.roles]:
-                            player_icon = role[1]["icon"]
-                            break
-                if player_icon is None:
-                    player_string += f"<@{player_id}>, "
-                else:
-                    player_string += f"{player_icon} <@{player_id}>, "
-
-            if player_string != "":
-                player_string = player_string[:-2]
-            try:
-                await channel.edit(
-                    topic=f"Add up using /add! | Pug queue: {current_players}/{max_players} | {player_string}"
-                )
-            except nextcord.errors.Forbidden:
-                print("Missing permissions to edit channel topic.\nGuild: ", guild)
-            except nextcord.HTTPException:
-                print(
-                    "HTTP Exception when editing channel topic. Likely inappropriate username.\nGuild: ",
-                    guild,
-                )
-            await asyncio.sleep(360)
-
-    @status_check.error
-    @update_channel_status.error
-    async def server_check_error_handler(self, _exception: Exception):
-        """Handles printing errors to console for the loop
+
+class ExpiryScheduler:
+    """Removes players from manual pug queues when their add time runs out.
+
+    Every queued player's expiry is kept in a min-heap, loaded from the database on
+    start and pushed to on /add. The scheduler sleeps until the earliest expiry, then
+    pulls every player that is due with one update per guild. Heap entries for players
+    who re-added or were removed no longer match the queue and are pulled as a no-op.
+    If the database can't be reached, due players are put back and retried later.
+    """
+
+    def __init__(self, topics: TopicUpdater):
+        self.topics: TopicUpdater = topics
+        self.heap: list[tuple[int, int, int]] = []
+        self.wakeup: asyncio.Event = asyncio.Event()
+        self.started: bool = False
+
+    def schedule(self, guild: int, player: int, expires: int) -> None:
+        """Add a player's expiry to the schedule.
 
         Args:
-            exception (Exception): The exception that was raised
+            guild (int): The guild ID of the queue.
+            player (int): The discord ID of the player.
+            expires (int): The unix time the player is removed at.
         """
-        print("Error in manual status check loop:\n")
-        print(traceback.format_exc())
+        heapq.heappush(self.heap, (expires, guild, player))
+        if self.heap[0][0] == expires:
+            self.wakeup.set()
+
+    async def load(self) -> None:
+        """Schedule every player already in a manual queue.
+
+        Nothing is scheduled unless every queue was read, so a failed load can be retried.
+        """
+        queues = [queue async for queue in manual_queue.iter_queues()]
+        for guild, players in queues:
+            for player, expires in players:
+                self.schedule(guild, player, expires)
+
+    async def expire_due(self) -> None:
+        """Pull every player whose expiry has passed, batched per guild.
+
+        Raises:
+            pymongo.errors.PyMongoError: A guild's players couldn't be pulled, they and
+                every guild after it are back on the schedule.
+        """
+        current_time = round(time.time())
+        due: dict[int, QueueEntries] = {}
+        while self.heap and self.heap[0][0] < current_time:
+            expires, guild, player = heapq.heappop(self.heap)
+            due.setdefault(guild, []).append((player, expires))
+        expired: set[int] = set()
+        try:
+            for guild, players in due.items():
+                await manual_queue.expire(guild, players)
+                expired.add(guild)
+                self.topics.request(guild)
+        except pymongo.errors.PyMongoError:
+            for guild, players in due.items():
+                if guild not in expired:
+                    for player, expires in players:
+                        heapq.heappush(self.heap, (expires, guild, player))
+            raise
+
+    async def run(self) -> None:
+        """Expire players as they become due, runs until cancelled.
+
+        Only the first call does anything, on_ready fires again after a reconnect.
+        """
+        if self.started:
+            return
+        self.started = True
+        while True:
+            try:
+                await self.load()
+                break
+            except pymongo.errors.PyMongoError as error:
+                logging.warning("Error loading manual queues for expiry: %s", error)
+                await asyncio.sleep(60)
+        while True:
+            self.wakeup.clear()
+            timeout: float | None = None
+            if self.heap:
+                # Expiries are whole seconds, players are removed once the second has passed
+                timeout = max(self.heap[0][0] + 1 - time.time(), 0)
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.expire_due()
+            except pymongo.errors.PyMongoError as error:
+                logging.warning("Error expiring manual queue players: %s", error)
+                await asyncio.sleep(60)
+
+
+class ManualPugCog(commands.Cog):
+    """Cog storing commands to manually add up to pugs."""
+
+    def __init__(self, bot: commands.Bot):
+        self.bot: commands.Bot = bot
+        self.topics: TopicUpdater = TopicUpdater(bot)
+        self.expiry: ExpiryScheduler = ExpiryScheduler(self.topics)
+
+    async def refresh_topics(self):
+        """Queue a topic update for every guild with manual pugs enabled."""
+        async for guild in guild_configs.iter_items(
+            {"manual.enabled": True}, {"guild": 1}
+        ):
+            self.topics.request(guild["guild"])
 
     @PugRunningCog.pug.subcommand(name="manual")  # pylint: disable=no-member
     async def manual_group(self, interaction: nextcord.Interaction):
@@ -216,7 +334,6 @@ class ManualPugCog(commands.Cog):
             guild_settings = await guild_configs.find_item(
                 {"guild": interaction.guild.id}
             )
-            print(guild_settings)
         except LookupError:
             await interaction.send(
                 "This server has not been setup yet. Please run /setup first."
@@ -230,7 +347,6 @@ class ManualPugCog(commands.Cog):
                 "enabled": False,
                 "channel": 0,
                 "num_players": 0,
-                "players": [],
             }
 
         menu: BotMenu = BotMenu(embed=setup_embed, user_id=interaction.user.id)
@@ -323,6 +439,7 @@ class ManualPugCog(commands.Cog):
         await interaction.edit_original_message(embed=setup_embed, view=None)
         await interaction.delete_original_message(delay=60)
         await update_guild_settings(interaction.guild.id, "manual", settings)
+        self.topics.request(interaction.guild.id)
 
     @is_runner()
     @manual_check()
@@ -351,12 +468,7 @@ class ManualPugCog(commands.Cog):
             )
             return
 
-        try:
-            guild_settings = await guild_configs.find_item(
-                {"guild": interaction.guild.id}
-            )
-            print(guild_settings)
-        except LookupError:
+        if not await guild_configs.exists({"guild": interaction.guild.id}):
             await interaction.send(
                 "This server has not been setup yet. Please run /setup first."
             )
@@ -397,57 +509,30 @@ class ManualPugCog(commands.Cog):
                 add_time = guild_settings["manual"]["default"]
 
         removal_time: int = round(time.time()) + (add_time * 3600)
-
-        if interaction.user.id in [
-            player[0] for player in guild_settings["manual"]["players"]
-        ]:
-            # Update the time for the player
-            old_time: int = -1
-            for player in guild_settings["manual"]["players"]:
-                if player[0] == interaction.user.id:
-                    old_time = player[1]
-            if old_time == -1:
-                await interaction.send(
-                    "Unable to find player even though first check was passed. Please report this to the pugBot support server."
-                )
-                return
-            # Pull any instances of the player
-            await guild_configs.update_item(
-                {"guild": interaction.guild.id},
-                {"$pull": {"manual.players": [interaction.user.id, old_time]}},
-            )
-            await guild_configs.update_item(
-                {"guild": interaction.guild.id},
-                {"$push": {"manual.players": [interaction.user.id, removal_time]}},
-            )
-            await interaction.send(f"Updated your time to {add_time} hours.")
-            return
-
-        current_players = len(guild_settings["manual"]["players"]) + 1
         max_players: int = guild_settings["manual"]["num_players"]
 
-        if current_players > max_players:
+        result, players = await manual_queue.add(
+            interaction.guild.id, interaction.user.id, removal_time, max_players
+        )
+        if result == "full":
             await interaction.send(
                 "The max amount of players have already added up.\nPlease wait for a runner to clear the queue."
             )
             return
+        self.expiry.schedule(interaction.guild.id, interaction.user.id, removal_time)
+        self.topics.request(interaction.guild.id)
+        if result == "updated":
+            await interaction.send(f"Updated your time to {add_time} hours.")
+            return
 
-        # Add player to list
-        await guild_configs.update_item(
-            {"guild": interaction.guild.id},
-            {"$push": {"manual.players": [interaction.user.id, removal_time]}},
-        )
-
+        current_players = len(players)
         await interaction.send(
             f"{interaction.user.mention} has added up for {add_time} hours.\nNow at {current_players}/{max_players} players."
         )
 
+        # Only the add that filled the queue sees it at exactly max players
         if current_players == max_players:
-            player_ids: list[int] = [
-                player[0] for player in guild_settings["manual"]["players"]
-            ]
-            player_ids.append(interaction.user.id)
-            player_mentions: str = " ".join([f"<@{player}>" for player in player_ids])
+            player_mentions: str = " ".join([f"<@{player}>" for player, _ in players])
             pug_embed = nextcord.Embed(
                 title="Pug started!",
                 description="Please join the voice channels to pug.",
@@ -468,27 +553,11 @@ class ManualPugCog(commands.Cog):
             interaction (nextcord.Interaction): The interaction that triggered the command.
         """
         await interaction.response.defer()
-        guild_settings = await guild_configs.find_item({"guild": interaction.guild.id})
-        player_ids: list[int] = [
-            player[0] for player in guild_settings["manual"]["players"]
-        ]
-        if interaction.user.id not in player_ids:
+        if not await manual_queue.remove(interaction.guild.id, interaction.user.id):
             await interaction.send("You are not in the pug queue.")
             return
-        old_time: int = -1
-        for player in guild_settings["manual"]["players"]:
-            if player[0] == interaction.user.id:
-                old_time = player[1]
-        if old_time == -1:
-            await interaction.send(
-                "Unable to find player even though first check was passed. Please report this to the pugBot support server."
-            )
-            return
-        await guild_configs.update_item(
-            {"guild": interaction.guild.id},
-            {"$pull": {"manual.players": [interaction.user.id, old_time]}},
-        )
         await interaction.send("You have been removed from the pug queue.")
+        self.topics.request(interaction.guild.id)
 
     @manual_check()
     @nextcord.slash_command(name="status", description="Check the status of the pug.")
@@ -508,9 +577,9 @@ class ManualPugCog(commands.Cog):
         except LookupError:
             return
 
-        current_players = len(guild_settings["manual"]["players"])
+        player_ids = await manual_queue.get(interaction.guild.id)
+        current_players = len(player_ids)
         max_players: int = guild_settings["manual"]["num_players"]
-        player_ids: list[list[int]] = list(guild_settings["manual"]["players"])
 
         player_string: str = "\n".join([f"<@{player[0]}>" for player in player_ids])
         time_string: str = "\n".join([f"<t:{player[1]}:R>" for player in player_ids])
@@ -545,17 +614,14 @@ class ManualPugCog(commands.Cog):
         except LookupError:
             return
 
-        current_players = len(guild_settings["manual"]["players"])
+        players = await manual_queue.get(interaction.guild.id)
+        current_players = len(players)
         max_players: int = guild_settings["manual"]["num_players"]
 
         if current_players == max_players:
-            all_vc_members: list[int] = []
-            for channel in interaction.guild.voice_channels:
-                all_vc_members.extend([member.id for member in channel.members])
+            all_vc_members = voice_presence.in_voice(interaction.guild.id)
 
-            all_queue_members: set[int] = set(
-                [player[0] for player in guild_settings["manual"]["players"]]
-            )
+            all_queue_members: set[int] = set([player[0] for player in players])
 
             missing_players = [i for i in all_queue_members if i not in all_vc_members]
             await interaction.send(
@@ -578,7 +644,6 @@ class ManualPugCog(commands.Cog):
         Args:
             interaction (nextcord.Interaction): The interaction that triggered the command.
         """
-        guild_settings = await guild_configs.find_item({"guild": interaction.guild.id})
         if player is None:
             menu: BotMenu = BotMenu(interaction.user.id)
             menu.add_button("Yes", await action_callback("clear", interaction.user.id))
@@ -593,32 +658,16 @@ class ManualPugCog(commands.Cog):
                 await interaction.delete_original_message(delay=1)
                 return
             if menu.action == "clear":
-                await guild_configs.update_item(
-                    {"guild": interaction.guild.id}, {"$set": {"manual.players": []}}
-                )
+                await manual_queue.clear(interaction.guild.id)
                 menu.embed.description = "The pug queue has been cleared."
                 await interaction.edit_original_message(embed=menu.embed, view=None)
+                self.topics.request(interaction.guild.id)
             else:
                 menu.embed.description = "The pug queue has not been cleared."
                 await interaction.edit_original_message(embed=menu.embed, view=None)
         else:
-            player_ids: list[int] = [
-                player[0] for player in guild_settings["manual"]["players"]
-            ]
-            if player.id not in player_ids:
+            if not await manual_queue.remove(interaction.guild.id, player.id):
                 await interaction.send("The user is not in the pug queue.")
                 return
-            old_time: int = -1
-            for added_player in guild_settings["manual"]["players"]:
-                if added_player[0] == player.id:
-                    old_time = added_player[1]
-            if old_time == -1:
-                await interaction.send(
-                    "Unable to find player even though first check was passed. Please report this to the pugBot support server."
-                )
-                return
-            await guild_configs.update_item(
-                {"guild": interaction.guild.id},
-                {"$pull": {"manual.players": [player.id, old_time]}},
-            )
             await interaction.send("The user has been removed from the pug queue.")
+            self.topics.request(interaction.guild.id)
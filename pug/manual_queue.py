@@ -0,0 +1,141 @@
+"""Storage for manual pug queues, kept apart from the guild config documents."""
+from typing import AsyncIterator, List, Literal, Tuple
+
+import pymongo.errors
+from pymongo import ReturnDocument
+
+from database import BotCollection
+
+# The discord ID and expiry time of each player in a queue, in the order they added up
+QueueEntries = List[Tuple[int, int]]
+AddResult = Literal["added", "updated", "full"]
+
+
+def get_entries(queue: dict | None) -> QueueEntries:
+    """The players in a queue document, as (discord ID, expiry) pairs."""
+    if queue is None:
+        return []
+    return [(player["discord"], player["expires"]) for player in queue["players"]]
+
+
+class ManualQueue:
+    """The manual pug queue of every guild, one document per guild in guilds.manual.
+
+    Every change is a single conditional update on the guild's queue document, so
+    concurrent adds can't go over capacity and never rewrite the guild config.
+    """
+
+    def __init__(self) -> None:
+        self.collection: BotCollection = BotCollection("guilds", "manual")
+
+    async def get(self, guild: int) -> QueueEntries:
+        """Get the players in a guild's queue.
+
+        Args:
+            guild (int): The guild ID.
+
+        Returns:
+            QueueEntries: The players in the queue, empty if nobody has added up.
+        """
+        return get_entries(await self.collection.database.find_one({"guild": guild}))
+
+    async def add(
+        self, guild: int, discord: int, expires: int, max_players: int
+    ) -> Tuple[AddResult, QueueEntries]:
+        """Add a player to a queue, or update their expiry if they're already in it.
+
+        Args:
+            guild (int): The guild ID.
+            discord (int): The discord ID of the player.
+            expires (int): The unix time the player is removed at.
+            max_players (int): The size of the queue.
+
+        Returns:
+            Tuple[AddResult, QueueEntries]: What happened, and the players in the queue after.
+        """
+        updated = await self.collection.database.find_one_and_update(
+            {"guild": guild, "players.discord": discord},
+            {"$set": {"players.$.expires": expires}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if updated is not None:
+            return "updated", get_entries(updated)
+        try:
+            # Only matches if the player isn't queued and there's a free slot
+            added = await self.collection.database.find_one_and_update(
+                {
+                    "guild": guild,
+                    "players.discord": {"$ne": discord},
+                    f"players.{max_players - 1}": {"$exists": False},
+                },
+                {"$push": {"players": {"discord": discord, "expires": expires}}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+            return "added", get_entries(added)
+        except pymongo.errors.DuplicateKeyError:
+            # The queue exists but didn't match, it's full or they added up meanwhile
+            entries = await self.get(guild)
+            if discord in [player for player, _expires in entries]:
+                return "updated", entries
+            return "full", entries
+
+    async def remove(self, guild: int, discord: int) -> bool:
+        """Remove a player from a queue.
+
+        Args:
+            guild (int): The guild ID.
+            discord (int): The discord ID of the player.
+
+        Returns:
+            bool: True if the player was in the queue.
+        """
+        result = await self.collection.database.update_one(
+            {"guild": guild}, {"$pull": {"players": {"discord": discord}}}
+        )
+        return result.modified_count > 0
+
+    async def expire(self, guild: int, entries: QueueEntries) -> None:
+        """Remove players from a queue, only if their expiry hasn't been changed since.
+
+        Args:
+            guild (int): The guild ID.
+            entries (QueueEntries): The players and the expiry they were due at.
+        """
+        await self.collection.database.update_one(
+            {"guild": guild},
+            {
+                "$pull": {
+                    "players": {
+                        "$or": [
+                            {"discord": discord, "expires": expires}
+                            for discord, expires in entries
+                        ]
+                    }
+                }
+            },
+        )
+
+    async def clear(self, guild: int) -> None:
+        """Remove every player from a queue.
+
+        Args:
+            guild (int): The guild ID.
+        """
+        await self.collection.database.update_one(
+            {"guild": guild}, {"$set": {"players": []}}
+        )
+
+    async def iter_queues(self) -> AsyncIterator[Tuple[int, QueueEntries]]:
+        """Stream every queue that has players in it.
+
+        Yields:
+            Tuple[int, QueueEntries]: The guild ID and the players in its queue.
+        """
+        async for queue in self.collection.iter_items(
+            {"players.0": {"$exists": True}}, {"guild": 1, "players": 1}
+        ):
+            yield queue["guild"], get_entries(queue)
+
+
+manual_queue: ManualQueue = ManualQueue()
@@ -0,0 +1,97 @@
+"""Moves pug players between voice channels concurrently."""
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, List, Tuple
+
+import nextcord
+
+# Moves in flight at once, Discord rate limits member edits per guild so more won't help
+MOVE_CONCURRENCY: int = 5
+# Seconds to wait before retrying the moves that failed
+RETRY_DELAY: float = 1.0
+# Minimum seconds between progress updates, editing the menu is rate limited too
+PROGRESS_INTERVAL: float = 1.0
+
+Move = Tuple[int, nextcord.VoiceChannel]
+ProgressCallback = Callable[[int, int], Awaitable[None]]
+
+
+async def get_member(guild: nextcord.Guild, member_id: int) -> nextcord.Member:
+    """Get a member from the guild cache, only asking Discord if they aren't cached.
+
+    Args:
+        guild (nextcord.Guild): The guild the member is in.
+        member_id (int): The discord ID of the member.
+
+    Returns:
+        nextcord.Member: The member.
+    """
+    member = guild.get_member(member_id)
+    if member is None:
+        member = await guild.fetch_member(member_id)
+    return member
+
+
+async def move_members(
+    guild: nextcord.Guild,
+    moves: List[Move],
+    progress: ProgressCallback | None = None,
+) -> List[Move]:
+    """Move members to voice channels, several at a time, retrying failed moves once.
+
+    Args:
+        guild (nextcord.Guild): The guild the members are in.
+        moves (List[Move]): The discord ID of each member and the channel to move them to.
+        progress (ProgressCallback | None): Called with the moves done and the total moves,
+            reporting stops if it fails to edit the message.
+
+    Returns:
+        List[Move]: The moves that still failed after retrying.
+    """
+    semaphore = asyncio.Semaphore(MOVE_CONCURRENCY)
+    done: int = 0
+    last_update: float = 0.0
+    reporting: bool = True
+
+    async def report() -> None:
+        nonlocal last_update, reporting
+        if progress is None or not reporting:
+            return
+        now = time.monotonic()
+        if now - last_update < PROGRESS_INTERVAL and done < len(moves):
+            return
+        last_update = now
+        try:
+            await progress(done, len(moves))
+        except nextcord.HTTPException as error:
+            # The message may be gone or the interaction expired, the moves carry on
+            logging.warning("Stopped reporting move progress: %s", error)
+            reporting = False
+
+    async def move(member_id: int, channel: nextcord.VoiceChannel, final: bool) -> bool:
+        nonlocal done
+        async with semaphore:
+            try:
+                member = await get_member(guild, member_id)
+                if member.voice is None or member.voice.channel != channel:
+                    await member.move_to(channel)
+                moved = True
+            except nextcord.HTTPException:
+                moved = False
+        if moved or final:
+            done += 1
+            await report()
+        return moved
+
+    async def attempt(batch: List[Move], final: bool) -> List[Move]:
+        results = await asyncio.gather(
+            *(move(member_id, channel, final) for member_id, channel in batch)
+        )
+        return [pair for pair, moved in zip(batch, results) if not moved]
+
+    failed = await attempt(moves, final=False)
+    if failed:
+        await asyncio.sleep(RETRY_DELAY)
+        failed = await attempt(failed, final=True)
+    return failed
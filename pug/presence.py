@@ -0,0 +1,214 @@
+"""In memory index of who is in which voice channel, and which pug role each member has."""
+from typing import Dict, List, Set, Tuple
+
+import nextcord
+from nextcord.ext import commands
+
+from database import guild_config_cache
+
+# The value and icon of a member's highest pug role, (0, None) if they have none
+RoleInfo = Tuple[int, str | None]
+NO_ROLE: RoleInfo = (0, None)
+
+
+class VoicePresence:
+    """Tracks voice channel members and pug role icons from gateway events.
+
+    Lookups are answered from memory, nothing here calls the Discord API. Role info is
+    worked out the first time a member is looked up, and dropped when their roles or
+    the guild's pug roles change.
+    """
+
+    def __init__(self) -> None:
+        self.channels: Dict[int, Dict[int, Set[int]]] = {}
+        self.member_channels: Dict[int, Dict[int, int]] = {}
+        self.pug_roles: Dict[int, List[Tuple[int, int, str | None]]] = {}
+        self.role_config: Dict[int, dict] = {}
+        self.role_info: Dict[int, Dict[int, RoleInfo]] = {}
+
+    def load_guild(self, guild: nextcord.Guild) -> None:
+        """Index every member currently in a voice channel of a guild.
+
+        Args:
+            guild (nextcord.Guild): The guild to index.
+        """
+        self.channels[guild.id] = {}
+        self.member_channels[guild.id] = {}
+        for channel in guild.voice_channels + guild.stage_channels:
+            for member in channel.members:
+                self.join(guild.id, member.id, channel.id)
+
+    def forget_guild(self, guild_id: int) -> None:
+        """Drop everything known about a guild.
+
+        Args:
+            guild_id (int): The guild ID to drop.
+        """
+        for index in (
+            self.channels,
+            self.member_channels,
+            self.pug_roles,
+            self.role_config,
+            self.role_info,
+        ):
+            index.pop(guild_id, None)
+
+    def join(self, guild_id: int, member_id: int, channel_id: int) -> None:
+        """Record a member joining or moving to a voice channel."""
+        self.leave(guild_id, member_id)
+        self.channels.setdefault(guild_id, {}).setdefault(channel_id, set()).add(
+            member_id
+        )
+        self.member_channels.setdefault(guild_id, {})[member_id] = channel_id
+
+    def leave(self, guild_id: int, member_id: int) -> None:
+        """Record a member leaving voice."""
+        channel_id = self.member_channels.get(guild_id, {}).pop(member_id, None)
+        if channel_id is None:
+            return
+        members = self.channels[guild_id][channel_id]
+        members.discard(member_id)
+        if not members:
+            del self.channels[guild_id][channel_id]
+
+    def members(self, guild_id: int, channel_id: int) -> Set[int]:
+        """The members in a voice channel.
+
+        Args:
+            guild_id (int): The guild ID of the channel.
+            channel_id (int): The voice channel ID.
+
+        Returns:
+            Set[int]: The discord IDs of the members in the channel.
+        """
+        return set(self.channels.get(guild_id, {}).get(channel_id, ()))
+
+    def in_voice(self, guild_id: int) -> Set[int]:
+        """Every member in any voice channel of a guild.
+
+        Args:
+            guild_id (int): The guild ID.
+
+        Returns:
+            Set[int]: The discord IDs of the members in voice.
+        """
+        return set(self.member_channels.get(guild_id, {}))
+
+    def member_updated(self, guild_id: int, member_id: int) -> None:
+        """Drop the role info of a member, so it is worked out again on the next lookup."""
+        self.role_info.get(guild_id, {}).pop(member_id, None)
+
+    async def load_roles(self, guild_id: int) -> None:
+        """Load the pug roles of a guild, dropping role info if they have changed.
+
+        Args:
+            guild_id (int): The guild ID.
+        """
+        config = await guild_config_cache.get(guild_id)
+        roles: dict = {} if config is None else config.get("roles", {})
+        if self.role_config.get(guild_id) == roles:
+            return
+        self.role_config[guild_id] = roles
+        self.pug_roles[guild_id] = sorted(
+            (
+                (int(role_id), role["value"], role.get("icon"))
+                for role_id, role in roles.items()
+            ),
+            key=lambda role: role[1],
+            reverse=True,
+        )
+        self.role_info[guild_id] = {}
+
+    def get_role(self, guild: nextcord.Guild, member_id: int) -> RoleInfo:
+        """The value and icon of a member's highest pug role, from the member cache.
+
+        load_roles must have been awaited for the guild first.
+
+        Args:
+            guild (nextcord.Guild): The guild the member is in.
+            member_id (int): The discord ID of the member.
+
+        Returns:
+            RoleInfo: The value and icon of the role, NO_ROLE if they have no pug role.
+        """
+        guild_info = self.role_info.setdefault(guild.id, {})
+        if member_id in guild_info:
+            return guild_info[member_id]
+        info = NO_ROLE
+        member = guild.get_member(member_id)
+        if member is not None:
+            member_roles = {role.id for role in member.roles}
+            for role_id, value, icon in self.pug_roles.get(guild.id, []):
+                if role_id in member_roles:
+                    info = (value, icon)
+                    break
+            guild_info[member_id] = info
+        return info
+
+    async def get_roles(
+        self, guild: nextcord.Guild, member_ids: List[int]
+    ) -> Dict[int, RoleInfo]:
+        """The value and icon of the highest pug role of several members.
+
+        Args:
+            guild (nextcord.Guild): The guild the members are in.
+            member_ids (List[int]): The discord IDs of the members.
+
+        Returns:
+            Dict[int, RoleInfo]: The role info of each member.
+        """
+        await self.load_roles(guild.id)
+        return {member_id: self.get_role(guild, member_id) for member_id in member_ids}
+
+
+voice_presence: VoicePresence = VoicePresence()
+
+
+class PresenceCog(commands.Cog):
+    """Keeps the voice presence index up to date from gateway events."""
+
+    def __init__(self, bot: commands.Bot):
+        self.bot: commands.Bot = bot
+
+    @commands.Cog.listener("on_ready")
+    async def load_presence(self) -> None:
+        """Index every guild once the member and voice caches are filled."""
+        for guild in self.bot.guilds:
+            voice_presence.load_guild(guild)
+
+    @commands.Cog.listener("on_guild_join")
+    async def guild_joined(self, guild: nextcord.Guild) -> None:
+        """Index a guild the bot was added to."""
+        voice_presence.load_guild(guild)
+
+    @commands.Cog.listener("on_guild_remove")
+    async def guild_removed(self, guild: nextcord.Guild) -> None:
+        """Forget a guild the bot was removed from."""
+        voice_presence.forget_guild(guild.id)
+
+    @commands.Cog.listener("on_voice_state_update")
+    async def voice_state_updated(
+        self,
+        member: nextcord.Member,
+        _before: nextcord.VoiceState,
+        after: nextcord.VoiceState,
+    ) -> None:
+        """Move a member in the index when they join, leave or switch voice channels."""
+        if after.channel is None:
+            voice_presence.leave(member.guild.id, member.id)
+        else:
+            voice_presence.join(member.guild.id, member.id, after.channel.id)
+
+    @commands.Cog.listener("on_member_update")
+    async def member_updated(
+        self, before: nextcord.Member, after: nextcord.Member
+    ) -> None:
+        """Drop a member's role info when their roles change."""
+        if before.roles != after.roles:
+            voice_presence.member_updated(after.guild.id, after.id)
+
+    @commands.Cog.listener("on_member_remove")
+    async def member_removed(self, member: nextcord.Member) -> None:
+        """Forget a member who left the guild."""
+        voice_presence.leave(member.guild.id, member.id)
+        voice_presence.member_updated(member.guild.id, member.id)
@@ -1,6 +1,5 @@
 """Commands for generating teams in pugs."""
 
-from itertools import combinations
 import random
 import time
 from typing import Optional, Dict, List
@@ -9,14 +8,17 @@ import nextcord
 from nextcord.ext import commands
 
 from constants import BOT_COLOR
-from database import BotCollection
+from database import BotCollection, GuildConfigCollection
 from logs import Player
 from logs.searcher import LogSearcher
-from logs.elo import get_elo, Elo
+from logs.elo import find_similar_categories, get_elos, Elo
 from logs.elo_cog import EloSettings
 from menus import BotMenu
 from menus.callbacks import action_callback
 from menus.templates import TeamGenMenu
+from pug import balancer
+from pug.mover import move_members
+from pug.presence import NO_ROLE, voice_presence
 from pug import (
     CategorySelect,
     CategoryButton,
@@ -29,13 +31,16 @@ from registration import RegistrationSettings
 from util import is_runner, guild_config_check
 
 category_db = BotCollection("guilds", "categories")
-config_db = BotCollection("guilds", "config")
+config_db = GuildConfigCollection()
+
+# Number of ranked teams generated at once, rerolls walk through them
+TEAM_POOL_SIZE = 10
 
 
 async def get_player_dict(
     next_pug: nextcord.VoiceChannel, add_up: nextcord.VoiceChannel
 ) -> Dict[str, List[PugPlayer]]:
-    """Return a dict of players in two voice channels.
+    """Return a dict of players in two voice channels, using the voice presence index.
 
     Args:
         next_pug (nextcord.VoiceChannel): A voice channel to get players from.
@@ -44,47 +49,60 @@ async def get_player_dict(
     Returns:
         dict: A dict of players in the voice channels.
     """
-    players: Dict[str, list[PugPlayer]] = {"next_pug": [], "add_up": []}
-    for member in next_pug.members:
-        player = await PugPlayer.create(discord=member.id)
-        players["next_pug"].append(player)
-    for member in add_up.members:
-        player = await PugPlayer.create(discord=member.id)
-        players["add_up"].append(player)
+    next_pug_ids = list(voice_presence.members(next_pug.guild.id, next_pug.id))
+    add_up_ids = list(voice_presence.members(add_up.guild.id, add_up.id))
+    resolved = await PugPlayer.create_many(next_pug_ids + add_up_ids)
+    players: Dict[str, list[PugPlayer]] = {
+        "next_pug": [resolved[member_id] for member_id in next_pug_ids],
+        "add_up": [resolved[member_id] for member_id in add_up_ids],
+    }
     return players
 
 
+def lobby_snapshot(
+    next_pug: nextcord.VoiceChannel, add_up: nextcord.VoiceChannel
+) -> frozenset[int]:
+    """Returns the IDs of everyone waiting in two voice channels, from the voice presence index.
+
+    Args:
+        next_pug (nextcord.VoiceChannel): A voice channel to get players from.
+        add_up (nextcord.VoiceChannel): A voice channel to get players from.
+    """
+    return frozenset(
+        voice_presence.members(next_pug.guild.id, next_pug.id)
+        | voice_presence.members(add_up.guild.id, add_up.id)
+    )
+
+
 async def generate_random_teams(
-    players: Dict[str, List[PugPlayer]], team_size: int
-) -> Teams:
+    players: Dict[str, List[PugPlayer]], team_size: int, splits: int = 1
+) -> List[Teams]:
     """Generate random teams for a pug.
 
     Args:
         players (list): A list of all players in the VC
         team_size (int): The amount of players per team.
+        splits (int): The number of different teams to generate.
 
     Returns:
-        teams: The generated teams.
+        List[Teams]: The generated teams.
     """
     random.shuffle(players["next_pug"])
     random.shuffle(players["add_up"])
     all_players: List[PugPlayer] = players["next_pug"] + players["add_up"]
 
-    red_team: list[PugPlayer] = []
-    blu_team: list[PugPlayer] = []
-
     if len(all_players) < team_size * 2:
         raise ValueError(
             "Not enough players to generate teams. "
             f"Required: {team_size * 2}, Available: {len(all_players)}"
         )
 
-    while len(red_team) < team_size and len(blu_team) < team_size:
-        red_team.append(all_players.pop(0))
-        blu_team.append(all_players.pop(0))
-
-    teams = Teams(red=red_team, blu=blu_team)
-    return teams
+    lobby = all_players[0 : team_size * 2]
+    pool: List[Teams] = []
+    for _ in range(splits):
+        random.shuffle(lobby)
+        pool.append(Teams(red=lobby[0::2], blu=lobby[1::2]))
+    return pool
 
 
 async def generate_balanced_teams(
@@ -92,20 +110,21 @@ async def generate_balanced_teams(
     team_size,
     reg_settings: RegistrationSettings,
     gamemode: str,
-) -> Teams:
+    splits: int = 1,
+) -> List[Teams]:
     """Generate balanced teams for a pug.
 
     Args:
         players (dict): A dictionary of all players in the VCs
         team_size (int): The amount of players per team.
         reg_settings (RegistrationSettings): The registration settings for the server.
+        splits (int): The number of different teams to generate, best first.
 
     Returns:
-        teams: The generated teams.
+        List[Teams]: The generated teams, best first.
     """
     if reg_settings.mode == "" or reg_settings.gamemode == "":
-        teams = await generate_random_teams(players, team_size)
-        return teams
+        return await generate_random_teams(players, team_size, splits)
 
     random.shuffle(players["next_pug"])
     random.shuffle(players["add_up"])
@@ -140,8 +159,7 @@ async def generate_balanced_teams(
         team_players.append(player)
         total_level += player.elo
 
-    teams = await process_players(team_players, team_size, int(total_level / 2))
-    return teams
+    return await process_players(team_players, team_size, int(total_level / 2), splits)
 
 
 async def generate_elo_teams(
@@ -149,16 +167,18 @@ async def generate_elo_teams(
     team_size: int,
     elo_settings: EloSettings,
     category: PugCategory,
-) -> Teams:
+    splits: int = 1,
+) -> List[Teams]:
     """Generate balanced teams for a pug.
 
     Args:
         players (dict): A dictionary of all players in the VCs
         team_size (int): The amount of players per team.
         reg_settings (RegistrationSettings): The registration settings for the server.
+        splits (int): The number of different teams to generate, best first.
 
     Returns:
-        teams: The generated teams.
+        List[Teams]: The generated teams, best first.
     """
     random.shuffle(players["next_pug"])
     random.shuffle(players["add_up"])
@@ -171,39 +191,45 @@ async def generate_elo_teams(
         )
 
     total_elo: int = 0
-    elo_players: List[PugPlayer] = []
+    elo_players: List[PugPlayer] = all_players[0 : team_size * 2]
 
-    for player in all_players[0 : team_size * 2]:
-        try:
-            player_elo = await get_elo(discord=player.discord)
-        except LookupError:
+    # One query for every player's elo, unregistered players get the default elo
+    elos = await get_elos(
+        [player.steam for player in elo_players if player.steam is not None]
+    )
+    elo_category = category.name
+    if elo_settings.mode == "category":
+        elo_category = await find_similar_categories(
+            category.name, elo_settings.guild_id
+        )
+    for player in elo_players:
+        player_elo = elos.get(player.steam) if player.registered else None
+        if player_elo is None:
             player_elo = Elo(0)  # default elo value
-        print(player_elo.as_dict())
-        player.elo = await player_elo.get_elo_from_mode(
-            elo_settings.mode, elo_settings.guild_id, category.name, team_size
+        player.elo = player_elo.get_mode_elo(
+            elo_settings.mode, elo_settings.guild_id, elo_category, team_size
         )
         total_elo += player.elo
-        elo_players.append(player)
 
-    teams = await process_players(elo_players, team_size, int(total_elo / 2))
-    return teams
+    return await process_players(elo_players, team_size, int(total_elo / 2), splits)
 
 
 async def generate_role_teams(
     players: Dict[str, List[PugPlayer]],
     team_size: int,
     guild: nextcord.Guild,
-    roles: Dict[str, Dict],
-) -> Teams:
+    splits: int = 1,
+) -> List[Teams]:
     """Generate balanced teams for a pug.
 
     Args:
         players (dict): A dictionary of all players in the VCs
         team_size (int): The amount of players per team.
         reg_settings (RegistrationSettings): The registration settings for the server.
+        splits (int): The number of different teams to generate, best first.
 
     Returns:
-        teams: The generated teams.
+        List[Teams]: The generated teams, best first.
     """
     random.shuffle(players["next_pug"])
     random.shuffle(players["add_up"])
@@ -218,85 +244,47 @@ async def generate_role_teams(
     total_value: int = 0
     processed_players: List[PugPlayer] = []
 
-    sorted_roles = sorted(roles.items(), key=lambda x: x[1]["value"], reverse=True)
-
-    for player in all_players[0 : team_size * 2]:
-        # Check for first role player has
-        member = await guild.fetch_member(player.discord)
-        for role in sorted_roles:
-            if int(role[0]) in [role.id for role in member.roles]:
-                player.elo = role[1]["value"]
-                player.icon = role[1]["icon"]
-                total_value += role[1]["value"]
-                break
-        if not player.elo:
-            player.elo = 0
+    # Role values come from the presence index, no REST call per player
+    role_players = all_players[0 : team_size * 2]
+    role_info = await voice_presence.get_roles(
+        guild, [player.discord for player in role_players if player.discord is not None]
+    )
+    for player in role_players:
+        player.elo, player.icon = (
+            NO_ROLE if player.discord is None else role_info[player.discord]
+        )
+        total_value += player.elo
         processed_players.append(player)
 
-    teams = await process_players(processed_players, team_size, int(total_value / 2))
-    return teams
+    return await process_players(
+        processed_players, team_size, int(total_value / 2), splits
+    )
 
 
 async def process_players(
-    players: List[PugPlayer], team_size: int, target_elo: int
-) -> Teams:
-    """Turn a list of players into two balanced teams.
+    players: List[PugPlayer], team_size: int, target_elo: int, splits: int = 1
+) -> List[Teams]:
+    """Turn a list of players into balanced teams.
+
+    Small pools are solved exactly, large ones with a heuristic, see pug.balancer.
 
     Args:
         players (List[PugPlayer]): A list of the players to process
         team_size (int): The size of the teams
         target_elo (int): The target elo for each team
+        splits (int): The number of different teams to generate
 
     Returns:
-        Dict[str, List[PugPlayer]]: The two teams
+        List[Teams]: The closest teams, best first
     """
-    red_team = find_subset(players, team_size, target_elo)
-    blu_team = players.copy()
-
-    # Remove players from blu team
-    for item in red_team:
-        for i, item_blu in enumerate(blu_team):
-            if item_blu.discord == item.discord:
-                blu_team.pop(i)
-                break
-
-    return Teams(red=red_team, blu=blu_team)
-
-
-def find_subset(arr: List[PugPlayer], num: int, goal: int) -> List[PugPlayer]:
-    """Find a subset of players of size num that gets as close to total as possible.
-
-    Args:
-        arr (List[EloPlayer]): The list of all players
-        num (int): Team size
-        goal (int): The target average ELO for each team
-
-    Raises:
-        ValueError: Subset not found
-
-    Returns:
-        List[EloPlayer]: One subset of players that is closest to the total elo
-    """
-    # Find every UNIQUE subset of arr of size num
-    # Get initial lowest diff
-    lowest_diff = 0
-    for player in arr[0:num]:
-        lowest_diff += player.elo
-    if lowest_diff == 0:
-        lowest_diff = 9999  # lol weird workaround but its needed
-
-    best_team: List[PugPlayer] = arr[0:num]
-    result = combinations(arr, num)
-    for combination in result:
-        team_total = 0
-        for player in combination:
-            team_total += player.elo
-        if abs(goal - team_total) < lowest_diff:
-            lowest_diff = abs(goal - team_total)
-            best_team = list(combination)
-        if lowest_diff == 0:
-            break
-    return best_team
+    pool: List[Teams] = []
+    for red_indices in balancer.top_splits(
+        [player.elo for player in players], team_size, target_elo, splits
+    ):
+        red_team = [players[i] for i in red_indices]
+        blu_team = [player for i, player in enumerate(players) if i not in red_indices]
+        pool.append(Teams(red=red_team, blu=blu_team))
+    return pool
 
 
 class PugRunningCog(commands.Cog):
@@ -347,8 +335,9 @@ class PugRunningCog(commands.Cog):
 
         try:
             guild_config = await config_db.find_item({"guild": interaction.guild.id})
-            roles = guild_config["roles"]
-        except (LookupError, KeyError):
+            if "roles" not in guild_config:
+                role_disabled = True
+        except LookupError:
             role_disabled = True
 
         # Get a list of pug categories
@@ -460,30 +449,13 @@ class PugRunningCog(commands.Cog):
                 text="Elo is disabled for this server, enable using /elo setup!"
             )
 
-        teams: Teams
         if not elo_disabled:
-            teams = await generate_elo_teams(
-                await get_player_dict(next_pug, add_up),
-                team_size,
-                elo_settings,
-                chosen_category,
-            )
             mode = "elo"
         elif not balancing_disabled:
             mode = reg_settings.gamemode if reg_settings.gamemode != "both" else "sixes"
-            teams = await generate_balanced_teams(
-                await get_player_dict(next_pug, add_up), team_size, reg_settings, mode
-            )
         elif not role_disabled:
-            guild = await self.bot.fetch_guild(interaction.guild.id)
-            teams = await generate_role_teams(
-                await get_player_dict(next_pug, add_up), team_size, guild, roles
-            )
             mode = "roles"
         else:
-            teams = await generate_random_teams(
-                await get_player_dict(next_pug, add_up), team_size
-            )
             mode = "random"
 
         pug_embed.title = "Generate Teams"
@@ -497,7 +469,42 @@ class PugRunningCog(commands.Cog):
         await gen_menu.add_gen_buttons()
         gen_menu.action = mode
 
+        async def generate(action: str) -> List[Teams]:
+            """Generate a ranked pool of teams for a generation mode."""
+            players = await get_player_dict(next_pug, add_up)
+            match action:
+                case "elo":
+                    return await generate_elo_teams(
+                        players,
+                        team_size,
+                        elo_settings,
+                        chosen_category,
+                        TEAM_POOL_SIZE,
+                    )
+                case "sixes" | "highlander" | "combined":
+                    return await generate_balanced_teams(
+                        players, team_size, reg_settings, action, TEAM_POOL_SIZE
+                    )
+                case "roles":
+                    return await generate_role_teams(
+                        players, team_size, next_pug.guild, TEAM_POOL_SIZE
+                    )
+            return await generate_random_teams(players, team_size, TEAM_POOL_SIZE)
+
         while True:  # Loop while teams are being generated
+            # Rerolls walk through the cached pool until the lobby changes or it runs out
+            lobby = lobby_snapshot(next_pug, add_up)
+            teams = gen_menu.next_split(gen_menu.action, lobby)
+            if teams is None:
+                gen_menu.cache_splits(
+                    gen_menu.action, lobby, await generate(gen_menu.action)
+                )
+                teams = gen_menu.next_split(gen_menu.action, lobby)
+            if teams is None:
+                # Only happens if the generator had no teams to give for these players
+                pug_embed.description = "Teams could not be generated."
+                await interaction.edit_original_message(embed=pug_embed, view=None)
+                return
             await gen_menu.update_teams(teams)
             await gen_menu.edit(interaction)
             view_result = await gen_menu.wait_for_action(self.bot)
@@ -509,21 +516,30 @@ class PugRunningCog(commands.Cog):
                     # Move players to the correct channels
                     pug_embed.description = "Moving players.."
                     await interaction.edit_original_message(embed=pug_embed, view=None)
-                    pug_embed.description = ""
 
-                    for player in teams["red"]:
-                        member = await interaction.guild.fetch_member(player.discord)
-                        try:
-                            await member.move_to(red_team)
-                        except nextcord.HTTPException:
-                            pug_embed.description += f"<@{player.discord}> could not be moved to the RED team.\n"
-
-                    for player in teams["blu"]:
-                        member = await interaction.guild.fetch_member(player.discord)
-                        try:
-                            await member.move_to(blu_team)
-                        except nextcord.HTTPException:
-                            pug_embed.description += f"<@{player.discord}> could not be moved to the BLU team.\n"
+                    async def progress(done: int, total: int) -> None:
+                        pug_embed.description = f"Moving players.. ({done}/{total})"
+                        await interaction.edit_original_message(
+                            embed=pug_embed, view=None
+                        )
+
+                    failed = await move_members(
+                        interaction.guild,
+                        [
+                            (player.discord, red_team if team == "red" else blu_team)
+                            for team in ("red", "blu")
+                            for player in teams[team]
+                            if player.discord is not None
+                        ],
+                        progress,
+                    )
+                    pug_embed.description = ""
+                    for member_id, channel in failed:
+                        team_name = "RED" if channel == red_team else "BLU"
+                        pug_embed.description += (
+                            f"<@{member_id}> could not be moved to the "
+                            f"{team_name} team.\n"
+                        )
                     pug_embed.description += "Done moving players!"
                     await interaction.edit_original_message(embed=pug_embed, view=None)
 
@@ -541,31 +557,6 @@ class PugRunningCog(commands.Cog):
                     )
 
                     break
-                case "elo":
-                    teams = await generate_elo_teams(
-                        await get_player_dict(next_pug, add_up),
-                        team_size,
-                        elo_settings,
-                        chosen_category,
-                    )
-                case "sixes" | "highlander" | "combined":
-                    teams = await generate_balanced_teams(
-                        await get_player_dict(next_pug, add_up),
-                        team_size,
-                        reg_settings,
-                        gen_menu.action,
-                    )
-                case "roles":
-                    teams = await generate_role_teams(
-                        await get_player_dict(next_pug, add_up),
-                        team_size,
-                        interaction.guild,
-                        roles,
-                    )
-                case "random":
-                    teams = await generate_random_teams(
-                        await get_player_dict(next_pug, add_up), team_size
-                    )
                 case "cancel":
                     await interaction.delete_original_message()
                     break
@@ -581,14 +572,7 @@ class PugRunningCog(commands.Cog):
         Returns:
             list: A list of players in the voice channel.
         """
-        players: Dict[str, list[PugPlayer]] = {"next_pug": [], "add_up": []}
-        for member in next_pug.members:
-            player = await PugPlayer.create(discord=member.id)
-            players["next_pug"].append(player)
-        for member in add_up.members:
-            player = await PugPlayer.create(discord=member.id)
-            players["add_up"].append(player)
-        return players
+        return await get_player_dict(next_pug, add_up)
 
     @pug.subcommand(  # pylint: disable=no-member
         name="move", description="Moves players after a pug is done."
@@ -600,6 +584,8 @@ class PugRunningCog(commands.Cog):
     ):  # pylint: disable=too-many-return-statements
         """Move players back after a pug is done."""
         await interaction.response.defer()
+        if interaction.guild is None:
+            return
 
         # Get a list of pug categories
         try:
@@ -684,41 +670,28 @@ class PugRunningCog(commands.Cog):
             chosen_category.next_pug
         )
 
-        red_players = []
-        blu_players = []
-        waiting_players = []
-        moving_string = f"Moving players from <#{add_up.id}> to <#{next_pug.id}>..."
-        pug_embed.title = "Moving players..."
-        pug_embed.description = moving_string
-        await interaction.edit_original_message(embed=pug_embed, view=None)
-        for member in add_up.members:
-            waiting_players.append(member)
-            try:
-                await member.move_to(next_pug)
-            except nextcord.HTTPException:
-                continue
-        moving_string += (
-            f"\nDone!\n\nMoving players from <#{red_team.id}> to <#{add_up.id}>..."
+        # Snapshot every channel first, so players moved into add up stay there
+        waiting_players = list(add_up.members)
+        red_players = list(red_team.members)
+        blu_players = list(blu_team.members)
+        moving_string = (
+            f"Moving players from <#{add_up.id}> to <#{next_pug.id}>, "
+            f"and from <#{red_team.id}> and <#{blu_team.id}> to <#{add_up.id}>..."
         )
+        pug_embed.title = "Moving players..."
         pug_embed.description = moving_string
         await interaction.edit_original_message(embed=pug_embed, view=None)
-        for member in red_team.members:
-            red_players.append(member)
-            try:
-                await member.move_to(add_up)
-            except nextcord.HTTPException:
-                continue
-        moving_string += (
-            f"\nDone!\n\nMoving players from <#{blu_team.id}> to <#{add_up.id}>..."
+
+        async def progress(done: int, total: int) -> None:
+            pug_embed.description = f"{moving_string} ({done}/{total})"
+            await interaction.edit_original_message(embed=pug_embed, view=None)
+
+        await move_members(
+            interaction.guild,
+            [(member.id, next_pug) for member in waiting_players]
+            + [(member.id, add_up) for member in red_players + blu_players],
+            progress,
         )
-        pug_embed.description = moving_string
-        await interaction.edit_original_message(embed=pug_embed, view=None)
-        for member in blu_team.members:
-            blu_players.append(member)
-            try:
-                await member.move_to(add_up)
-            except nextcord.HTTPException:
-                continue
         moving_string += "\nDone!"
 
         game_players = [
@@ -769,35 +742,20 @@ class PugRunningCog(commands.Cog):
             return
         # Move players back
         move_menu.clear_items()
-        moving_string = f"Moving players from <#{next_pug.id}> to <#{add_up.id}>..."
-        pug_embed.title = "Moving players back..."
-        pug_embed.description = moving_string
-        await move_menu.edit(interaction)
-        for member in waiting_players:
-            try:
-                await member.move_to(add_up)
-            except nextcord.HTTPException:
-                continue
-        moving_string += (
-            f"\nDone!\n\nMoving players from <#{add_up.id}> to <#{red_team.id}>..."
+        moving_string = (
+            f"Moving players from <#{next_pug.id}> to <#{add_up.id}>, "
+            f"and from <#{add_up.id}> to <#{red_team.id}> and <#{blu_team.id}>..."
         )
+        pug_embed.title = "Moving players back..."
         pug_embed.description = moving_string
         await move_menu.edit(interaction)
-        for member in red_players:
-            try:
-                await member.move_to(red_team)
-            except nextcord.HTTPException:
-                continue
-        moving_string += (
-            f"\nDone!\n\nMoving players from <#{add_up.id}> to <#{blu_team.id}>..."
+        await move_members(
+            interaction.guild,
+            [(member.id, add_up) for member in waiting_players]
+            + [(member.id, red_team) for member in red_players]
+            + [(member.id, blu_team) for member in blu_players],
+            progress,
         )
-        pug_embed.description = moving_string
-        await move_menu.edit(interaction)
-        for member in blu_players:
-            try:
-                await member.move_to(blu_team)
-            except nextcord.HTTPException:
-                continue
         moving_string += "\nDone!"
 
         pug_embed.title = "Done moving players back."
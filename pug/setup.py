@@ -5,7 +5,7 @@ from nextcord.abc import GuildChannel
 from nextcord.enums import ChannelType
 
 from constants import BOT_COLOR
-from database import BotCollection
+from database import BotCollection, GuildConfigCollection
 from menus import BotMenu
 from menus.templates import send_channel_prompt
 from pug import (
@@ -17,7 +17,7 @@ from pug.pug import PugRunningCog
 from util import is_runner, guild_config_check
 
 category_db = BotCollection("guilds", "categories")
-config_db = BotCollection("guilds", "config")
+config_db = GuildConfigCollection()
 
 
 class PugSetupCog(commands.Cog):
@@ -3,9 +3,11 @@ import asyncio
 from dataclasses import dataclass, field
 import json
 
-from database import BotCollection
+import nextcord
 
-guild_config_db: BotCollection = BotCollection("guilds", "config")
+from database import BotCollection, GuildConfigCollection
+
+guild_config_db: BotCollection = GuildConfigCollection()
 
 
 @dataclass
@@ -145,3 +147,90 @@ class RegistrationSettings:
             await guild_config_db.add_item(
                 {"guild": guild_id, "registration": self.to_dict()}
             )
+
+
+class LoadedRegSettings:
+    """
+    Stores the loaded registration settings for a guild.
+    This is different from the normal RegistrationSettings class which just gives the ids for everything.
+    Catches a lot of the errors that can happen when trying to load roles/channels.
+    """
+
+    def __init__(self, bot: nextcord.Client, settings: RegistrationSettings) -> None:
+        guild: nextcord.Guild | None = bot.get_guild(settings.guild_id)
+        if guild is None:
+            raise ValueError(
+                settings.guild_id, "Guild could not be found. Is the bot in the guild?"
+            )
+        self.guild: nextcord.Guild = guild
+        self.gamemode: str = settings.gamemode
+        self.mode: str = settings.mode
+
+        # Load sixes roles
+        self.sixes: list[nextcord.Role | None] = []
+        for role_id in settings.roles.sixes.get_div_list():
+            if role_id is None:
+                self.sixes.append(None)
+            else:
+                role = guild.get_role(role_id)
+                if role is None:
+                    raise AttributeError(role_id, "Role could not be found.")
+                self.sixes.append(role)
+
+        # Load highlander roles
+        self.highlander: list[nextcord.Role | None] = []
+        for role_id in settings.roles.highlander.get_div_list():
+            if role_id is None:
+                self.highlander.append(None)
+            else:
+                role = guild.get_role(role_id)
+                if role is None:
+                    raise AttributeError(role_id, "Role could not be found.")
+                self.highlander.append(role)
+
+        # Load generic roles
+        self.bypass: nextcord.Role | None = None
+        self.ban: nextcord.Role | None = None
+        self.registered: nextcord.Role | None = None
+        if settings.roles.bypass is not None:
+            if guild.get_role(settings.roles.bypass) is None:
+                raise AttributeError(settings.roles.bypass, "Role could not be found.")
+            self.bypass = guild.get_role(settings.roles.bypass)
+        if settings.roles.ban is not None:
+            if guild.get_role(settings.roles.ban) is None:
+                raise AttributeError(settings.roles.ban, "Role could not be found.")
+            self.ban = guild.get_role(settings.roles.ban)
+        if settings.roles.registered is not None:
+            if guild.get_role(settings.roles.registered) is None:
+                raise AttributeError(
+                    settings.roles.registered, "Role could not be found."
+                )
+            self.registered = guild.get_role(settings.roles.registered)
+
+        # Load channels
+        self.registration: nextcord.TextChannel | None
+        self.logs: nextcord.TextChannel | None
+        if settings.channels.registration is not None:
+            reg_channel: nextcord.abc.GuildChannel | None = guild.get_channel(
+                settings.channels.registration
+            )
+            if not isinstance(reg_channel, nextcord.TextChannel):
+                raise AttributeError(
+                    settings.channels.registration,
+                    "Channel could not be found or is not a text channel.",
+                )
+            self.registration = reg_channel
+        else:
+            self.registration = None
+        if settings.channels.logs is not None:
+            log_channel: nextcord.abc.GuildChannel | None = guild.get_channel(
+                settings.channels.logs
+            )
+            if not isinstance(log_channel, nextcord.TextChannel):
+                raise AttributeError(
+                    settings.channels.logs,
+                    "Channel could not be found or is not a text channel.",
+                )
+            self.logs = log_channel
+        else:
+            self.logs = None
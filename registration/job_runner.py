@@ -0,0 +1,287 @@
+"""Runs the persistent role update jobs and reports their progress."""
+
+import asyncio
+import logging
+import time
+
+import nextcord
+from nextcord.ext import commands
+from pymongo import ASCENDING
+
+import database as db
+from constants import BOT_COLOR
+from registration import LoadedRegSettings, RegistrationSettings
+from registration.jobs import RoleUpdateJob, is_fresh
+from registration.rgl_refresh import (
+    DAY,
+    RGL_MAX_RATE,
+    RefreshProgress,
+    divisions_due,
+    player_db,
+    refresh_all,
+    refresh_rate,
+    rgl_scheduler,
+)
+
+# Seconds between edits of the RGL update progress message
+PROGRESS_INTERVAL: int = 15 * 60
+
+
+class RoleJobRunner(commands.Cog):
+    """Base of UpdateRolesCog, runs and resumes its role update jobs.
+
+    At most one job per kind and guild runs in this process. The subclass provides how
+    guilds are loaded and how players are checked and failures logged.
+    """
+
+    def __init__(self, bot: nextcord.Client):
+        self.bot: nextcord.Client = bot
+        # The kind and guild of every job running in this process
+        self.running_jobs: set[tuple[str, int | None]] = set()
+        self.admin_log_channel: nextcord.TextChannel | None = None
+
+    async def _get_loaded_servers(self) -> list[LoadedRegSettings]:
+        """Get all loaded registration settings for all servers the bot is in."""
+        raise NotImplementedError
+
+    async def check_player_data(
+        self,
+        player: dict,
+        guilds: list[LoadedRegSettings],
+        check_divisions: bool = True,
+        check_ban: bool = True,
+    ) -> bool:
+        """Checks the player data and updates their roles in all guilds they are in."""
+        raise NotImplementedError
+
+    async def admin_log_failed(self, reason: str, data: str) -> None:
+        """Send a message to the admin log channel about a failed action"""
+        raise NotImplementedError
+
+    async def run_rgl_job(self, job: RoleUpdateJob) -> None:
+        """Update every registered player in every guild, skipping players the job already did.
+
+        Parameters
+        ----------
+        job : RoleUpdateJob
+            The job to run or resume
+        """
+        # Get all players and servers from DB, most overdue division checks first
+        # Gather all information before cursors timeout
+        finished: set[str] = await job.finished_players()
+        all_players: list[dict] = []
+        total: int = 0
+        async for player in player_db.iter_items(
+            sort=[("rgl_sync.next", ASCENDING)], batch_size=1000
+        ):
+            total += 1
+            if str(player.get("steam")) not in finished:
+                all_players.append(player)
+        await job.set_total(total)
+        if finished:
+            logging.info(
+                "Resuming RGL update %s, %d players left",
+                job.job_id,
+                len(all_players),
+            )
+
+        # Go through all servers and add to list if registration is enabled
+        guilds: list[LoadedRegSettings] = await self._get_loaded_servers()
+
+        # Bans are checked every run, divisions only when due before the next run
+        next_run = time.time() + DAY
+        due = {
+            player["_id"] for player in all_players if divisions_due(player, next_run)
+        }
+
+        async def refresh(player: dict) -> bool:
+            # Players a manual update just checked only need their roles applied
+            fresh = is_fresh(player)
+            result: bool = await self.check_player_data(
+                player, guilds, player["_id"] in due and not fresh, not fresh
+            )
+            if not result:
+                await self.admin_log_failed(
+                    "Skipping player, update failed.", str(player)
+                )
+            await job.record(str(player.get("steam")), result)
+            return result
+
+        # Pace the run to finish within the day, the workers share the RGL rate limit
+        rgl_scheduler.set_target(refresh_rate(len(all_players) + len(due)))
+        progress = RefreshProgress(len(all_players))
+        reporter = asyncio.create_task(self.report_progress(progress))
+        try:
+            await refresh_all(all_players, refresh, progress)
+        finally:
+            rgl_scheduler.set_target(RGL_MAX_RATE)
+            reporter.cancel()
+            await asyncio.wait([reporter])
+        await job.finish()
+
+    async def update_guild_members(
+        self,
+        job: RoleUpdateJob,
+        loaded: LoadedRegSettings,
+        progress_embed: nextcord.Embed | None = None,
+        interaction: nextcord.Interaction | None = None,
+    ) -> None:
+        """Update every registered member of a guild, skipping members the job already did.
+
+        Parameters
+        ----------
+        job : RoleUpdateJob
+            The job to run or resume
+        loaded : LoadedRegSettings
+            The guild's loaded registration settings
+        progress_embed : nextcord.Embed | None
+            The embed to show progress in, if the job was started from a command
+        interaction : nextcord.Interaction | None
+            The interaction that started the job, to edit the progress embed
+        """
+        finished: set[str] = await job.finished_players()
+        players = await db.get_players_from_discord(
+            [member.id for member in loaded.guild.members if not member.bot]
+        )
+        await job.set_total(len(players))
+        for discord_id, player in players.items():
+            if str(player.get("steam")) in finished:
+                continue
+
+            if progress_embed is not None and interaction is not None:
+                progress_embed.clear_fields()
+                progress_embed.add_field(
+                    name="Currently Updating", value=f"<@{discord_id}>", inline=True
+                )
+                await interaction.edit_original_message(embed=progress_embed)
+
+            # Players the daily update just checked only need their roles applied
+            fresh = is_fresh(player)
+            result: bool = await self.check_player_data(
+                player, [loaded], not fresh, not fresh
+            )
+            if not result:
+                await self.admin_log_failed(
+                    "Skipping player, update failed.", str(player)
+                )
+            await job.record(str(player.get("steam")), result)
+        await job.finish()
+
+    async def resume_jobs(self) -> None:
+        """Resume the role update jobs that were running when the bot stopped."""
+        for job in await RoleUpdateJob.unfinished():
+            if (job.kind, job.guild) in self.running_jobs:
+                continue
+            logging.info("Resuming role update job %s", job.job_id)
+            if job.kind == "rgl":
+                self.bot.loop.create_task(self.run_rgl_update())
+                continue
+            settings: RegistrationSettings = RegistrationSettings()
+            await settings.load_data(job.guild)
+            try:
+                loaded: LoadedRegSettings = LoadedRegSettings(self.bot, settings)
+            except (AttributeError, ValueError):
+                await job.finish("failed")
+                continue
+            self.bot.loop.create_task(self.run_guild_job(loaded))
+
+    async def run_rgl_update(self) -> None:
+        """Start or resume the RGL update of every guild, unless it is already running."""
+        if ("rgl", None) in self.running_jobs:
+            logging.info("RGL update is already running")
+            return
+        self.running_jobs.add(("rgl", None))
+        try:
+            job: RoleUpdateJob = await RoleUpdateJob.start("rgl")
+            await self.run_rgl_job(job)
+        finally:
+            self.running_jobs.discard(("rgl", None))
+
+    async def run_guild_job(
+        self,
+        loaded: LoadedRegSettings,
+        progress_embed: nextcord.Embed | None = None,
+        interaction: nextcord.Interaction | None = None,
+    ) -> bool:
+        """Start or resume a guild's job, unless it is already running.
+
+        Parameters
+        ----------
+        loaded : LoadedRegSettings
+            The guild's loaded registration settings
+        progress_embed : nextcord.Embed | None
+            The embed to show progress in, if the job was started from a command
+        interaction : nextcord.Interaction | None
+            The interaction that started the job, to edit the progress embed
+
+        Returns
+        -------
+        bool
+            False if the job was already running
+        """
+        key = ("guild", loaded.guild.id)
+        if key in self.running_jobs:
+            return False
+        self.running_jobs.add(key)
+        try:
+            job: RoleUpdateJob = await RoleUpdateJob.start("guild", loaded.guild.id)
+            await self.update_guild_members(job, loaded, progress_embed, interaction)
+        finally:
+            self.running_jobs.discard(key)
+        return True
+
+    async def send_progress(
+        self, progress: RefreshProgress, message: nextcord.Message | None = None
+    ) -> nextcord.Message | None:
+        """Send or edit the RGL refresh progress message in the admin log channel.
+
+        Parameters
+        ----------
+        progress : RefreshProgress
+            The progress of the refresh
+        message : nextcord.Message | None
+            The progress message to edit, a new one is sent if None
+
+        Returns
+        -------
+        nextcord.Message | None
+            The progress message, None if there is no admin log channel or it failed
+        """
+        finished = progress.done == progress.total
+        embed: nextcord.Embed = nextcord.Embed(
+            title="RGL Update Complete" if finished else "Updating RGL Divisions",
+            color=BOT_COLOR,
+        )
+        embed.add_field(name="Players", value=f"{progress.done}/{progress.total}")
+        embed.add_field(name="Failed", value=str(progress.failed))
+        embed.add_field(
+            name="Rate",
+            value=f"{rgl_scheduler.rate:.2f} requests/s ({rgl_scheduler.rate_limited} rate limits)",
+        )
+        if not finished and progress.eta is not None:
+            embed.add_field(name="ETA", value=f"<t:{round(progress.eta)}:R>")
+        if self.admin_log_channel is None:
+            return None
+        try:
+            if message is None:
+                return await self.admin_log_channel.send(embed=embed)
+            return await message.edit(embed=embed)
+        except nextcord.HTTPException as err:
+            logging.warning("Could not send RGL update progress: %s", err)
+            return message
+
+    async def report_progress(self, progress: RefreshProgress) -> None:
+        """Keep the progress message up to date until cancelled, then show the result.
+
+        Parameters
+        ----------
+        progress : RefreshProgress
+            The progress of the refresh
+        """
+        message: nextcord.Message | None = None
+        try:
+            while True:
+                message = await self.send_progress(progress, message)
+                await asyncio.sleep(PROGRESS_INTERVAL)
+        finally:
+            await self.send_progress(progress, message)
@@ -0,0 +1,195 @@
+"""Persistent, resumable role update jobs, checkpointed in MongoDB."""
+import time
+
+from pymongo import ASCENDING, DESCENDING
+
+from database import BotCollection
+
+jobs_db: BotCollection = BotCollection("bot", "jobs")
+job_players_db: BotCollection = BotCollection("bot", "job_players")
+
+# Attempts a player gets within a job before it stops retrying them on resume
+MAX_PLAYER_ATTEMPTS: int = 3
+# Players checked against RGL this recently only get their roles updated from stored data
+FRESH_WINDOW: int = 6 * 3600
+
+
+class RoleUpdateJob:
+    """A role update run over many players that survives restarts.
+
+    The job document in bot.jobs holds the job's kind, guild, size and state. Each
+    player's outcome is stored in bot.job_players as it finishes, so a restarted job
+    skips the players already done and retries failed ones a limited number of times.
+
+    Attributes:
+        job_id (str): The ID of the job document.
+        kind (str): "rgl" for the daily update of every guild, "guild" for /updateall.
+        guild (int | None): The guild a "guild" job is updating.
+        started (int): Unix time the job was first started.
+    """
+
+    def __init__(self, job: dict) -> None:
+        self.job_id: str = job["_id"]
+        self.kind: str = job["kind"]
+        self.guild: int | None = job.get("guild")
+        self.started: int = job["started"]
+
+    @classmethod
+    async def start(cls, kind: str, guild: int | None = None) -> "RoleUpdateJob":
+        """Resume the unfinished job of a kind and guild, or start a new one.
+
+        Args:
+            kind (str): The kind of job.
+            guild (int | None): The guild the job is for, None for every guild.
+
+        Returns:
+            RoleUpdateJob: The job.
+        """
+        now = round(time.time())
+        try:
+            job = await jobs_db.find_item(
+                {"kind": kind, "guild": guild, "status": "running"}
+            )
+        except LookupError:
+            job = {
+                "_id": f"{kind}-{guild or 'all'}-{now}",
+                "kind": kind,
+                "guild": guild,
+                "status": "running",
+                "started": now,
+                "updated": now,
+                "total": 0,
+                "resumes": 0,
+            }
+            await jobs_db.add_item(job)
+        else:
+            await jobs_db.update_item({"_id": job["_id"]}, {"$inc": {"resumes": 1}})
+        return cls(job)
+
+    @staticmethod
+    async def unfinished() -> list["RoleUpdateJob"]:
+        """Every job that was still running when the bot stopped."""
+        return [
+            RoleUpdateJob(job)
+            async for job in jobs_db.iter_items(
+                {"status": "running"}, sort=[("started", ASCENDING)]
+            )
+        ]
+
+    async def set_total(self, total: int) -> None:
+        """Store the number of players the job covers."""
+        await jobs_db.update_item({"_id": self.job_id}, {"$set": {"total": total}})
+
+    async def finished_players(self) -> set[str]:
+        """The steam IDs of players this job doesn't need to do again.
+
+        Returns:
+            set[str]: Players that succeeded or ran out of attempts.
+        """
+        return {
+            outcome["steam"]
+            async for outcome in job_players_db.iter_items(
+                {
+                    "job": self.job_id,
+                    "$or": [
+                        {"ok": True},
+                        {"attempts": {"$gte": MAX_PLAYER_ATTEMPTS}},
+                    ],
+                },
+                {"steam": 1, "_id": 0},
+                batch_size=1000,
+            )
+        }
+
+    async def record(self, steam: str, ok: bool) -> None:
+        """Checkpoint the outcome of a player.
+
+        Args:
+            steam (str): The player's steam ID.
+            ok (bool): Whether the player was updated.
+        """
+        now = round(time.time())
+        await job_players_db.update_item(
+            {"job": self.job_id, "steam": steam},
+            {"$set": {"ok": ok, "at": now}, "$inc": {"attempts": 1}},
+        )
+        await jobs_db.update_item({"_id": self.job_id}, {"$set": {"updated": now}})
+
+    async def counts(self) -> tuple[int, int]:
+        """The number of players updated and failed so far."""
+        done = await job_players_db.count({"job": self.job_id, "ok": True})
+        failed = await job_players_db.count({"job": self.job_id, "ok": False})
+        return done, failed
+
+    async def finish(self, status: str = "done") -> None:
+        """Mark the job as finished, it won't be resumed again.
+
+        The per player outcomes are only needed to resume, so they're dropped and
+        the final counts are kept on the job.
+
+        Args:
+            status (str): The final status of the job.
+        """
+        now = round(time.time())
+        done, failed = await self.counts()
+        await jobs_db.update_item(
+            {"_id": self.job_id},
+            {
+                "$set": {
+                    "status": status,
+                    "updated": now,
+                    "finished": now,
+                    "done": done,
+                    "failed": failed,
+                }
+            },
+        )
+        await job_players_db.database.delete_many({"job": self.job_id})
+
+
+def is_fresh(player: dict) -> bool:
+    """Check if a player was checked against RGL recently, by any job or command.
+
+    Args:
+        player (dict): The player's document from players.data.
+    """
+    checked = player.get("rgl_sync", {}).get("checked", 0)
+    return checked > time.time() - FRESH_WINDOW
+
+
+async def job_status(limit: int = 5) -> list[dict]:
+    """The most recent jobs with their progress and throughput.
+
+    Args:
+        limit (int): The number of jobs to return.
+
+    Returns:
+        list[dict]: Each job, newest first.
+    """
+    jobs: list[dict] = []
+    async for job in jobs_db.iter_items(
+        sort=[("started", DESCENDING)], batch_size=limit
+    ):
+        if len(jobs) == limit:
+            break
+        if job["status"] == "running":
+            done, failed = await RoleUpdateJob(job).counts()
+        else:
+            done, failed = job.get("done", 0), job.get("failed", 0)
+        elapsed = max(job.get("finished", job["updated"]) - job["started"], 1)
+        jobs.append(
+            {
+                "id": job["_id"],
+                "kind": job["kind"],
+                "guild": job["guild"],
+                "status": job["status"],
+                "started": job["started"],
+                "updated": job["updated"],
+                "total": job["total"],
+                "done": done,
+                "failed": failed,
+                "resumes": job.get("resumes", 0),
+                "per_hour": round((done + failed) / elapsed * 3600, 1),
+            }
+        )
+    return jobs
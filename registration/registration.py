@@ -23,8 +23,8 @@ from database import (
     get_player_from_discord,
     BotCollection,
 )
-from registration import RegistrationSettings
-from registration.update_roles import LoadedRegSettings, update_guild_player
+from registration import LoadedRegSettings, RegistrationSettings
+from registration.update_roles import update_guild_player
 from rglapi import RglApi
 
 RGL: RglApi = RglApi()
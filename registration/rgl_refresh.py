@@ -0,0 +1,258 @@
+"""Rate limited, concurrent refresh of registered players' RGL data."""
+import asyncio
+from dataclasses import dataclass, field
+import logging
+import time
+from typing import Any, Awaitable, Callable, Iterable
+
+from database import BotCollection
+from logs.logstf_api import TokenBucket
+from rglapi import RateLimitException
+
+# Most requests per second ever sent to RGL, halved on every 429 down to RGL_MIN_RATE
+RGL_MAX_RATE: float = 1.5
+# Slowest rate requests are sent at, both as a target and while rate limited
+RGL_MIN_RATE: float = 0.5
+RGL_BURST: int = 3
+# Rate added back after every successful request, until the target rate is reached
+RGL_RATE_RECOVERY: float = 0.01
+# Seconds to wait after being rate limited, and attempts before giving up on a request
+RATE_LIMIT_BACKOFF: float = 60
+MAX_ATTEMPTS: int = 3
+
+# The daily refresh is paced to finish within this window rather than as fast as possible
+REFRESH_WINDOW: float = 20 * 3600
+REFRESH_WORKERS: int = 4
+
+# How often a player's divisions are checked, bans are checked on every daily run
+DAY: int = 86400
+# Players whose divisions or ban changed recently, or who are banned
+RECENT_CHANGE_WINDOW: int = 14 * DAY
+RECENT_INTERVAL: int = DAY
+# Players on a current team
+ACTIVE_INTERVAL: int = 3 * DAY
+# Dormant players wait a quarter of the time since they last changed, up to MAX_STALENESS
+DORMANT_FACTOR: int = 4
+MAX_STALENESS: int = 14 * DAY
+
+player_db: BotCollection = BotCollection("players", "data")
+
+
+class RglScheduler:
+    """Shares one RGL request budget between everything that calls the RGL API.
+
+    Requests wait for a token from a shared bucket. A 429 halves the rate, never below
+    RGL_MIN_RATE, and each successful request adds a little back until the target rate
+    is reached again.
+
+    Attributes:
+        target_rate (float): The rate requests are sent at while RGL isn't limiting us.
+        rate_limited (int): The number of 429s received since startup.
+    """
+
+    def __init__(self, rate: float = RGL_MAX_RATE, burst: int = RGL_BURST) -> None:
+        self.target_rate: float = rate
+        self.bucket: TokenBucket = TokenBucket(rate, burst)
+        self.rate_limited: int = 0
+
+    @property
+    def rate(self) -> float:
+        """The current request rate, in requests per second."""
+        return self.bucket.rate
+
+    def set_target(self, rate: float) -> None:
+        """Change the target rate, clamped to the RGL limits.
+
+        Args:
+            rate (float): The new target rate in requests per second.
+        """
+        self.target_rate = min(max(rate, RGL_MIN_RATE), RGL_MAX_RATE)
+        self.bucket.rate = min(self.bucket.rate, self.target_rate)
+
+    async def call(self, func: Callable[..., Awaitable[Any]], *args: Any) -> Any:
+        """Call an RGL API method once a token is available, retrying if rate limited.
+
+        Args:
+            func (Callable[..., Awaitable[Any]]): The RglApi method to call.
+            *args (Any): The arguments to call it with.
+
+        Raises:
+            RateLimitException: Still rate limited after MAX_ATTEMPTS.
+
+        Returns:
+            Any: Whatever the method returned.
+        """
+        for _attempt in range(MAX_ATTEMPTS):
+            await self.bucket.acquire()
+            try:
+                result = await func(*args)
+            except RateLimitException:
+                self.rate_limited += 1
+                self.bucket.rate = max(self.bucket.rate / 2, RGL_MIN_RATE)
+                logging.info(
+                    "Rate limited by RGL, slowing down to %.2f requests/s",
+                    self.bucket.rate,
+                )
+                await asyncio.sleep(RATE_LIMIT_BACKOFF)
+                continue
+            self.bucket.rate = min(
+                self.bucket.rate + RGL_RATE_RECOVERY, self.target_rate
+            )
+            return result
+        raise RateLimitException(
+            f"Still rate limited by RGL after {MAX_ATTEMPTS} tries"
+        )
+
+
+rgl_scheduler: RglScheduler = RglScheduler()
+
+
+def refresh_rate(requests: int) -> float:
+    """The request rate that spreads a refresh over REFRESH_WINDOW.
+
+    Args:
+        requests (int): The number of RGL requests the refresh needs.
+
+    Returns:
+        float: The rate in requests per second, clamped to the RGL limits.
+    """
+    rate = requests / REFRESH_WINDOW
+    return min(max(rate, RGL_MIN_RATE), RGL_MAX_RATE)
+
+
+def is_active(core_teams: dict) -> bool:
+    """Check if a player is on a current 6s or HL team.
+
+    Args:
+        core_teams (dict): The player's teams, from RglApi.get_core_teams.
+    """
+    return any(
+        team["leftAt"] is None for team in core_teams["sixes"] + core_teams["hl"]
+    )
+
+
+def divisions_due(player: dict, before: float) -> bool:
+    """Check if a player's divisions are due to be checked.
+
+    Args:
+        player (dict): The player's document from players.data.
+        before (float): Unix time, checks due before this are due now.
+    """
+    return player.get("rgl_sync", {}).get("next", 0) <= before
+
+
+def next_division_check(now: int, changed: int, active: bool, banned: bool) -> int:
+    """When a player's divisions should next be checked.
+
+    Args:
+        now (int): Unix time of this check.
+        changed (int): Unix time the player's divisions or ban last changed, 0 if never.
+        active (bool): Whether the player is on a current team.
+        banned (bool): Whether the player is banned.
+
+    Returns:
+        int: Unix time of the next check, at most MAX_STALENESS away.
+    """
+    if banned or now - changed < RECENT_CHANGE_WINDOW:
+        interval = RECENT_INTERVAL
+    elif active:
+        interval = ACTIVE_INTERVAL
+    else:
+        interval = (now - changed) // DORMANT_FACTOR
+    return now + min(max(interval, RECENT_INTERVAL), MAX_STALENESS)
+
+
+async def record_sync(
+    steam_id: int,
+    current: dict,
+    divisions: dict | None,
+    active: bool | None,
+    banned: bool | None,
+) -> None:
+    """Store what a player check found, and schedule their next division check.
+
+    Args:
+        steam_id (int): The player's steam ID.
+        current (dict): The player's document before the check.
+        divisions (dict | None): The divisions from RGL, None if they weren't checked.
+        active (bool | None): Whether the player is on a current team, None if unknown.
+        banned (bool | None): The ban status from RGL, None if it wasn't checked.
+    """
+    now = round(time.time())
+    sync: dict = current.get("rgl_sync", {})
+    update: dict = {"rgl_sync.checked": now}
+    changed = (
+        divisions is not None
+        and divisions["hl"]["highest"] != -1
+        and divisions != current.get("divison")
+    ) or (banned is not None and "rgl_ban" in current and banned != current["rgl_ban"])
+    if changed:
+        update["rgl_sync.changed"] = now
+    if banned is not None:
+        update["rgl_ban"] = banned
+    if divisions is not None:
+        update["rgl_sync.active"] = active
+        update["rgl_sync.next"] = next_division_check(
+            now,
+            now if changed else sync.get("changed", 0),
+            bool(active),
+            bool(banned if banned is not None else current.get("rgl_ban")),
+        )
+    await player_db.update_item({"steam": str(steam_id)}, {"$set": update})
+
+
+@dataclass
+class RefreshProgress:
+    """Progress of a refresh run."""
+
+    total: int
+    done: int = 0
+    failed: int = 0
+    started: float = field(default_factory=time.time)
+
+    @property
+    def eta(self) -> float | None:
+        """Unix time the refresh is expected to finish at, None before any progress."""
+        if self.done == 0:
+            return None
+        elapsed = time.time() - self.started
+        return time.time() + elapsed / self.done * (self.total - self.done)
+
+
+async def refresh_all(
+    players: Iterable[dict],
+    refresh: Callable[[dict], Awaitable[bool]],
+    progress: RefreshProgress,
+    workers: int = REFRESH_WORKERS,
+) -> RefreshProgress:
+    """Refresh every player using several workers, paced by the shared RGL scheduler.
+
+    Args:
+        players (Iterable[dict]): The player documents to refresh.
+        refresh (Callable[[dict], Awaitable[bool]]): Refreshes a player, False on failure.
+        progress (RefreshProgress): Updated as players are refreshed.
+        workers (int): The number of players refreshed at once.
+
+    Returns:
+        RefreshProgress: The finished progress.
+    """
+    queue: asyncio.Queue[dict] = asyncio.Queue()
+    for player in players:
+        queue.put_nowait(player)
+
+    async def worker() -> None:
+        while True:
+            try:
+                player = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                if not await refresh(player):
+                    progress.failed += 1
+            except Exception:  # pylint: disable=broad-except
+                logging.exception("Error refreshing player %s", player)
+                progress.failed += 1
+            progress.done += 1
+
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    return progress
@@ -1,6 +1,5 @@
 """Contains the cog to update users roles over time."""
 
-import asyncio
 import datetime
 import logging
 import traceback
@@ -10,7 +9,10 @@ from nextcord.ext import commands, tasks
 
 import database as db
 from constants import BOT_COLOR, DEV_CONTRIBUTOR_ROLE, DEV_UPDATE_LOGS
-from registration import RegistrationSettings
+from registration import LoadedRegSettings, RegistrationSettings
+from registration.job_runner import RoleJobRunner
+from registration.jobs import job_status
+from registration.rgl_refresh import is_active, record_sync, rgl_scheduler
 from rglapi import RateLimitException, RglApi
 from test_cog import TestCog
 
@@ -19,93 +21,6 @@ RGL: RglApi = RglApi()
 update_time = datetime.time(hour=8, minute=0, tzinfo=datetime.timezone.utc)
 
 
-class LoadedRegSettings:
-    """
-    Stores the loaded registration settings for a guild.
-    This is different from the normal RegistrationSettings class which just gives the ids for everything.
-    Catches a lot of the errors that can happen when trying to load roles/channels.
-    """
-
-    def __init__(self, bot: nextcord.Client, settings: RegistrationSettings) -> None:
-        guild: nextcord.Guild | None = bot.get_guild(settings.guild_id)
-        if guild is None:
-            raise ValueError(
-                settings.guild_id, "Guild could not be found. Is the bot in the guild?"
-            )
-        self.guild: nextcord.Guild = guild
-        self.gamemode: str = settings.gamemode
-        self.mode: str = settings.mode
-
-        # Load sixes roles
-        self.sixes: list[nextcord.Role | None] = []
-        for role_id in settings.roles.sixes.get_div_list():
-            if role_id is None:
-                self.sixes.append(None)
-            else:
-                role = guild.get_role(role_id)
-                if role is None:
-                    raise AttributeError(role_id, "Role could not be found.")
-                self.sixes.append(role)
-
-        # Load highlander roles
-        self.highlander: list[nextcord.Role | None] = []
-        for role_id in settings.roles.highlander.get_div_list():
-            if role_id is None:
-                self.highlander.append(None)
-            else:
-                role = guild.get_role(role_id)
-                if role is None:
-                    raise AttributeError(role_id, "Role could not be found.")
-                self.highlander.append(role)
-
-        # Load generic roles
-        self.bypass: nextcord.Role | None = None
-        self.ban: nextcord.Role | None = None
-        self.registered: nextcord.Role | None = None
-        if settings.roles.bypass is not None:
-            if guild.get_role(settings.roles.bypass) is None:
-                raise AttributeError(settings.roles.bypass, "Role could not be found.")
-            self.bypass = guild.get_role(settings.roles.bypass)
-        if settings.roles.ban is not None:
-            if guild.get_role(settings.roles.ban) is None:
-                raise AttributeError(settings.roles.ban, "Role could not be found.")
-            self.ban = guild.get_role(settings.roles.ban)
-        if settings.roles.registered is not None:
-            if guild.get_role(settings.roles.registered) is None:
-                raise AttributeError(
-                    settings.roles.registered, "Role could not be found."
-                )
-            self.registered = guild.get_role(settings.roles.registered)
-
-        # Load channels
-        self.registration: nextcord.TextChannel | None
-        self.logs: nextcord.TextChannel | None
-        if settings.channels.registration is not None:
-            reg_channel: nextcord.abc.GuildChannel | None = guild.get_channel(
-                settings.channels.registration
-            )
-            if not isinstance(reg_channel, nextcord.TextChannel):
-                raise AttributeError(
-                    settings.channels.registration,
-                    "Channel could not be found or is not a text channel.",
-                )
-            self.registration = reg_channel
-        else:
-            self.registration = None
-        if settings.channels.logs is not None:
-            log_channel: nextcord.abc.GuildChannel | None = guild.get_channel(
-                settings.channels.logs
-            )
-            if not isinstance(log_channel, nextcord.TextChannel):
-                raise AttributeError(
-                    settings.channels.logs,
-                    "Channel could not be found or is not a text channel.",
-                )
-            self.logs = log_channel
-        else:
-            self.logs = None
-
-
 async def guild_log_failed(settings: LoadedRegSettings, reason: str, data: str) -> None:
     """Send a message to the guild or guild owner about a failed action
 
@@ -496,13 +411,13 @@ async def update_guild_player(
         await update_player(settings, member, steam_id, current_roles, new_roles)
 
 
-class UpdateRolesCog(commands.Cog):
+class UpdateRolesCog(RoleJobRunner):
     """Contains the cog to update users roles over time."""
 
     def __init__(self, bot: nextcord.Client):
-        self.bot: nextcord.Client = bot
+        super().__init__(bot)
         self.update_rgl.start()  # pylint: disable=no-member
-        self.admin_log_channel: nextcord.TextChannel | None = None
+        self.bot.loop.create_task(self.resume_jobs())
         log_channel = bot.get_channel(DEV_UPDATE_LOGS)
         if isinstance(log_channel, nextcord.TextChannel):
             self.admin_log_channel = log_channel
@@ -538,25 +453,7 @@ class UpdateRolesCog(commands.Cog):
     @tasks.loop(time=update_time)
     async def update_rgl(self) -> None:
         """Updates RGL divisions and roles for all registered players in all guilds."""
-        # Get all players and servers from DB
-        player_cursor = db.get_all_players()
-        all_players = []
-
-        # Gather all information before cursors timeout
-        async for player in player_cursor:
-            all_players.append(player)
-
-        # Go through all servers and add to list if registration is enabled
-        guilds: list[LoadedRegSettings] = await self._get_loaded_servers()
-
-        # Run the update function for each player
-        for player in all_players:
-            result: bool = await self.check_player_data(player, guilds)
-            if not result:
-                await self.admin_log_failed(
-                    "Skipping player, update failed.", str(player)
-                )
-            await asyncio.sleep(3)
+        await self.run_rgl_update()
 
     @update_rgl.error
     async def error_handler(self, _exception: BaseException) -> None:
@@ -575,7 +472,11 @@ class UpdateRolesCog(commands.Cog):
         )
 
     async def check_player_data(
-        self, player: dict, guilds: list[LoadedRegSettings]
+        self,
+        player: dict,
+        guilds: list[LoadedRegSettings],
+        check_divisions: bool = True,
+        check_ban: bool = True,
     ) -> bool:
         """Checks the player data and updates their roles in all guilds they are in.
 
@@ -585,13 +486,16 @@ class UpdateRolesCog(commands.Cog):
             Player data from the database
         guilds : list[LoadedRegSettings]
             List of guild settings to update the player in
+        check_divisions : bool
+            Whether to get divisions from RGL, or use the stored ones
+        check_ban : bool
+            Whether to get the ban status from RGL, or use the stored one
 
         Returns
         -------
         bool
             Whether the player was successfully updated
         """
-        attempts: int = 0
         try:
             steam_id = int(player["steam"])
             discord_id = int(player["discord"])
@@ -610,25 +514,28 @@ class UpdateRolesCog(commands.Cog):
 
         # Get updated information from RGL
         player_divs: dict[str, dict[str, int]] = {}
-        while not player_divs and attempts < 3:
+        active: bool | None = None
+        check_divisions = check_divisions or "divison" not in current_player
+        if check_divisions:
             try:
-                player_divs = await RGL.get_div_data(steam_id)
+                core_teams = await rgl_scheduler.call(RGL.get_core_teams, steam_id)
+                player_divs = RGL.parse_div_data(core_teams)
+                active = is_active(core_teams)
             except RateLimitException as err:
-                print(err, ", waiting and trying again...")
-                await asyncio.sleep(60)
-                attempts += 1
+                print(err)
             except LookupError:
                 await self.admin_log_failed(
                     "Player not found in RGL database.", str(player)
                 )
                 return False
-        if player_divs == {}:
-            if current_player:
+        if not player_divs:
+            if "divison" in current_player:
                 # Fall back on current data
-                await self.admin_log_failed(
-                    "Fell back on current db data for player.", str(player)
-                )
-                player_divs = current_player
+                if check_divisions:
+                    await self.admin_log_failed(
+                        "Fell back on current db data for player.", str(player)
+                    )
+                player_divs = current_player["divison"]
             else:
                 await self.admin_log_failed(
                     "Player not found in RGL database and no current player data.",
@@ -641,21 +548,19 @@ class UpdateRolesCog(commands.Cog):
 
         ban_check: bool = False
         new_ban: bool = False
-        while not ban_check and attempts < 3:
+        if check_ban or "rgl_ban" not in current_player:
             try:
-                new_ban = await RGL.check_banned(steam_id)
+                new_ban = await rgl_scheduler.call(RGL.check_banned, steam_id)
                 ban_check = True
             except RateLimitException as err:
-                print(err, ", waiting and trying again...")
-                await asyncio.sleep(60)
-                attempts += 1
-            except LookupError as err:
+                print(err)
+            except LookupError:
                 await self.admin_log_failed(
                     "Player not found in RGL database during ban check.", str(player)
                 )
                 return False
         if not ban_check:
-            if current_player:
+            if "rgl_ban" in current_player:
                 new_ban = current_player["rgl_ban"]
             else:
                 # If we can't get the ban status from RGL, we can't update the player
@@ -664,6 +569,15 @@ class UpdateRolesCog(commands.Cog):
                 )
                 return False
 
+        if current_player and (active is not None or ban_check):
+            await record_sync(
+                steam_id,
+                current_player,
+                player_divs if active is not None else None,
+                active,
+                new_ban if ban_check else None,
+            )
+
         # Attempt to update this player in every guild they are in
         for reg_settings in guilds:
             await update_guild_player(
@@ -761,28 +675,10 @@ class UpdateRolesCog(commands.Cog):
             color=BOT_COLOR,
         )
         await interaction.response.send_message(embed=progress_embed)
-        # Check each member of the guild
-        for member in guild.members:
-            if member.bot:
-                continue
-
-            try:
-                player: dict = await db.get_player_from_discord(member.id)
-            except LookupError:
-                continue
-
-            progress_embed.clear_fields()
-            progress_embed.add_field(
-                name="Currently Updating", value=f"<@{member.id}>", inline=True
-            )
+        if not await self.run_guild_job(loaded, progress_embed, interaction):
+            progress_embed.description = "An update is already running for this server."
             await interaction.edit_original_message(embed=progress_embed)
-
-            result: bool = await self.check_player_data(player, [loaded])
-            if not result:
-                await self.admin_log_failed(
-                    "Skipping player, update failed.", str(player)
-                )
-            await asyncio.sleep(3)  # Avoid rate limiting
+            return
 
         progress_embed.clear_fields()
         progress_embed.title = "Update Complete"
@@ -927,6 +823,46 @@ class UpdateRolesCog(commands.Cog):
                 "Update loop from /test updateall complete."
             )
 
+    @TestCog.test.subcommand(  # pylint: disable=no-member
+        name="jobs",
+        description="For testing/admin only. Shows the status of recent role update jobs.",
+    )
+    async def role_job_status(self, interaction: nextcord.Interaction):
+        """Shows the progress and throughput of the most recent role update jobs.
+
+        Parameters
+        ----------
+        interaction : nextcord.Interaction
+            The interaction
+        """
+        if (
+            not isinstance(interaction.user, nextcord.Member)
+            or interaction.user.get_role(DEV_CONTRIBUTOR_ROLE) is None
+        ):
+            await interaction.send(
+                "You do not have the Contributors role and cannot run this command.",
+                ephemeral=True,
+            )
+            return
+
+        status_embed: nextcord.Embed = nextcord.Embed(
+            title="Role Update Jobs", color=BOT_COLOR
+        )
+        for job in await job_status():
+            status_embed.add_field(
+                name=f"{job['id']} ({job['status']})",
+                value=(
+                    f"Players: {job['done']}/{job['total']}, {job['failed']} failed\n"
+                    f"Throughput: {job['per_hour']} players/hour\n"
+                    f"Started: <t:{job['started']}:R>, last update: <t:{job['updated']}:R>\n"
+                    f"Resumed: {job['resumes']} times"
+                ),
+                inline=False,
+            )
+        if not status_embed.fields:
+            status_embed.description = "No role update jobs have run yet."
+        await interaction.send(embed=status_embed)
+
     @TestCog.test.subcommand(  # pylint: disable=no-member
         name="update",
         description="For testing/admin only. Updates a single member's roles in ALL SERVERS.",
@@ -6,6 +6,8 @@ from pydantic import BaseModel  # pylint: disable=no-name-in-module
 
 from database import player_count, log_count
 from constants import API_PASSWORD
+from logs.searcher import LogSearcher
+from registration.jobs import job_status
 from registration.registration import RegistrationCog
 
 
@@ -33,12 +35,23 @@ class NewConnect(BaseModel):
     connectCommand: str
 
 
+class UploadedLog(BaseModel):
+    """Pydantic model for a log that was just uploaded to logs.tf
+
+    Attributes:
+        logID (int): The logs.tf ID of the uploaded log
+    """
+
+    logID: int
+
+
 class Webserver:
     """Class setting up FastAPI routes and providing a cog for bot interaction"""
 
-    def __init__(self, cog: RegistrationCog):
+    def __init__(self, cog: RegistrationCog, log_searcher: LogSearcher):
         self.app: FastAPI = FastAPI()
         self.cog: RegistrationCog = cog
+        self.log_searcher: LogSearcher = log_searcher
         self.router: APIRouter = APIRouter()
         self.router.add_api_route(
             "/api/register",
@@ -46,7 +59,14 @@ class Webserver:
             status_code=status.HTTP_201_CREATED,
             methods=["POST"],
         )
+        self.router.add_api_route(
+            "/api/logs/uploaded",
+            self.log_uploaded,
+            status_code=status.HTTP_202_ACCEPTED,
+            methods=["POST"],
+        )
         self.router.add_api_route("/api/stats", self.get_bot_stats)
+        self.router.add_api_route("/api/jobs", self.get_job_status)
         self.app.include_router(self.router)
 
     async def register(
@@ -79,8 +99,43 @@ class Webserver:
         response.status_code = status.HTTP_401_UNAUTHORIZED
         return {"error": "Wrong API password. Contact pugBot devs."}
 
+    async def log_uploaded(
+        self, uploaded: UploadedLog, request: Request, response: Response
+    ):
+        """Queues a log that was just uploaded to be matched to a pug straight away.
+
+        Args:
+            uploaded (UploadedLog): The ID of the uploaded log
+            request (Request): The request to check for the API password in the header
+
+        Returns:
+            dict: Describes success or errors
+        """
+        if request.headers.get("password") != API_PASSWORD:
+            response.status_code = status.HTTP_401_UNAUTHORIZED
+            return {"error": "Wrong API password. Contact pugBot devs."}
+        if not self.log_searcher.push_log(uploaded.logID):
+            # The searcher will still find the log by polling
+            response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+            return {"error": "Too many logs waiting, try again later."}
+        return {"message": "Queued"}
+
     async def get_bot_stats(self, response: Response):
         """Returns the number of players in the database."""
         response.headers["Access-Control-Allow-Origin"] = "*"
         stats = {"players": await player_count(), "logs": await log_count()}
         return stats
+
+    async def get_job_status(self, request: Request, response: Response):
+        """Returns the progress and throughput of the most recent role update jobs.
+
+        Args:
+            request (Request): The request to check for the API password in the header
+
+        Returns:
+            dict: The jobs, newest first, or an error
+        """
+        if request.headers.get("password") != API_PASSWORD:
+            response.status_code = status.HTTP_401_UNAUTHORIZED
+            return {"error": "Wrong API password. Contact pugBot devs."}
+        return {"jobs": await job_status()}
@@ -223,7 +223,15 @@ class RglApi:
         Args:
             steam_id (int): The steamid of the player to get.
         """
-        player = await self.get_core_teams(steam_id)
+        return self.parse_div_data(await self.get_core_teams(steam_id))
+
+    @staticmethod
+    def parse_div_data(player: dict | None) -> dict:
+        """Get both the highest div and the last div played from a player's core teams.
+
+        Args:
+            player (dict | None): The player's teams, from get_core_teams.
+        """
         player_divs = {
             "sixes": {"highest": -1, "current": -1},
             "hl": {"highest": -1, "current": -1},
@@ -0,0 +1,5 @@
+"""Shared setup for the tests, which run without a database or Discord connection."""
+import os
+
+# database.py creates its (lazy) client on import, so it needs a valid URL to import
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
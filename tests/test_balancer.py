@@ -0,0 +1,90 @@
+"""Compares the team balancer in pug.balancer against a brute force search of every team.
+
+Pools are small enough to list every team, so top_splits uses the exact solver. Each
+test runs over random pools with a fixed seed, the values are rounded to 10 so ties and
+splits without a perfect team both come up.
+"""
+from itertools import combinations
+import random
+
+from pug.balancer import top_splits
+
+POOLS: int = 200
+
+
+def split_key(team: list[int], players: int, size: int) -> frozenset:
+    """The players on one side of a split, the side with the first player in a full lobby."""
+    key = frozenset(team)
+    if players == size * 2 and 0 not in key:
+        key = frozenset(range(players)) - key
+    return key
+
+
+def brute_force(values: list[int], size: int, goal: int) -> list[int]:
+    """The distance from the goal of every distinct split, best first.
+
+    In a full lobby a team and the rest of the lobby are one split, the closer side counts.
+    """
+    diffs: dict[tuple, int] = {}
+    for team in combinations(range(len(values)), size):
+        key = split_key(list(team), len(values), size)
+        diff = abs(goal - sum(values[i] for i in team))
+        diffs[key] = min(diff, diffs.get(key, diff))
+    return sorted(diffs.values())
+
+
+def random_pool(rng: random.Random, players: int) -> list[int]:
+    """Random elo values for a pool of players."""
+    return [rng.randint(80, 180) * 10 for _ in range(players)]
+
+
+def check_splits(values: list[int], size: int, goal: int, count: int) -> None:
+    """top_splits returns valid, distinct teams as close to the goal as brute force."""
+    teams = top_splits(values, size, goal, count)
+    expected = brute_force(values, size, goal)[:count]
+    assert [abs(goal - sum(values[i] for i in team)) for team in teams] == expected
+    keys = set()
+    for team in teams:
+        assert len(team) == size
+        assert len(set(team)) == size
+        assert all(0 <= i < len(values) for i in team)
+        keys.add(split_key(team, len(values), size))
+    assert len(keys) == len(teams)
+
+
+def test_best_split() -> None:
+    """The best team of any size is as close to the goal as the best possible team."""
+    rng = random.Random(0)
+    for _ in range(POOLS):
+        values = random_pool(rng, rng.randint(2, 14))
+        size = rng.randint(1, len(values) - 1)
+        goal = rng.randint(0, sum(values))
+        check_splits(values, size, goal, 1)
+
+
+def test_ranked_splits() -> None:
+    """The next best teams, used for rerolls, match brute force in order."""
+    rng = random.Random(1)
+    for _ in range(POOLS):
+        values = random_pool(rng, rng.randint(4, 14))
+        size = rng.randint(1, len(values) - 1)
+        goal = rng.randint(0, sum(values))
+        check_splits(values, size, goal, rng.randint(2, 10))
+
+
+def test_full_lobby_mirrors() -> None:
+    """In a full lobby a team and the rest of the lobby are one split, only listed once."""
+    rng = random.Random(2)
+    for _ in range(POOLS):
+        values = random_pool(rng, rng.choice([4, 6, 8, 10, 12, 14]))
+        size = len(values) // 2
+        goal = sum(values) // 2 + rng.choice([0, 5])
+        check_splits(values, size, goal, rng.randint(1, 10))
+
+
+def test_team_as_big_as_pool() -> None:
+    """A team size that takes every player puts everyone on the team."""
+    assert top_splits([1200, 1500, 900], 3, 1000, 5) == [[0, 1, 2]]
+    assert top_splits([1200, 1500, 900], 4, 1000) == [[0, 1, 2]]
+    assert top_splits([], 0, 0) == [[]]
+    assert top_splits([1200, 1500], 0, 0) == [[]]
@@ -0,0 +1,50 @@
+"""Golden test for the batched elo engine in logs.elo.
+
+tests/fixtures/elo_golden.json was recorded by running the original elo code (one
+calculate_elo_changes call and database round trip per mode and player) over 300
+generated logs. It holds the guild categories, the elo documents before the first log,
+the logs in the order they were processed and every player's elo document after the
+last one. Guild 3 has no categories, so only its global, gamemode and server elo move.
+"""
+import json
+from pathlib import Path
+
+from logs.elo import Elo, EloLog, apply_elo_log, combine_similar_categories
+from util import get_steam64
+
+FIXTURE: Path = Path(__file__).parent / "fixtures" / "elo_golden.json"
+
+
+def test_elo_matches_recorded() -> None:
+    """Replaying the recorded logs gives the same elo documents as the original code."""
+    with open(FIXTURE, encoding="UTF-8") as fixture_file:
+        fixture = json.load(fixture_file)
+
+    elos: dict[int, Elo] = {}
+    for document in fixture["initial"]:
+        elos[document["steam"]] = Elo(document["steam"])
+        elos[document["steam"]].load(document)
+
+    for log in fixture["logs"]:
+        elo_log = EloLog(
+            log["guild"],
+            log["category"],
+            [(int(get_steam64(steam_3)), team) for steam_3, team in log["players"]],
+            log["red_score"],
+            log["blue_score"],
+            log["length"],
+        )
+        for steam, _team in elo_log.players:
+            elos.setdefault(steam, Elo(steam))
+        categories = fixture["categories"].get(str(elo_log.guild))
+        category = (
+            None
+            if categories is None
+            else combine_similar_categories(elo_log.category, categories)
+        )
+        apply_elo_log(elo_log, elos, category)
+
+    assert [elos[document["steam"]].as_dict() for document in fixture["expected"]] == (
+        fixture["expected"]
+    )
+    assert len(elos) == len(fixture["expected"])
@@ -1,13 +1,13 @@
 """Utility functions for use throughout the code."""
-import aiohttp
 import nextcord
 from steam import steamid
 from steam.steamid import SteamID
 from nextcord.ext import application_checks
 
-from database import get_server, is_server_setup, BotCollection
+from database import get_server, is_server_setup, GuildConfigCollection
+from logs.logstf_api import LogsAPI
 
-config_db = BotCollection("guilds", "config")
+config_db = GuildConfigCollection()
 
 
 class ServerNotSetupError(Exception):
@@ -188,10 +188,7 @@ async def get_log(log_id: int):
     Returns:
         log: dict of log
     """
-    async with aiohttp.ClientSession() as session:
-        async with session.get("https://logs.tf/api/v1/log/" + str(log_id)) as resp:
-            log = await resp.json()
-            return log
+    return await LogsAPI.get_single_log(log_id)
 
 
 async def get_total_logs(steam_id: str):
@@ -203,9 +200,5 @@ async def get_total_logs(steam_id: str):
     Returns:
         int: Total number of logs
     """
-    async with aiohttp.ClientSession() as session:
-        async with session.get(
-            "https://logs.tf/api/v1/log?limit=10000&player=" + str(steam_id)
-        ) as resp:
-            logs = await resp.json()
-            return logs["results"]
+    logs = await LogsAPI.search_for_log(players=[int(steam_id)], limit=10000)
+    return logs["results"]